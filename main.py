@@ -1,9 +1,18 @@
 import os
+import hmac
+import time
+import asyncio
 import pathlib
 import importlib
+import threading
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastmcp import FastMCP
+from fastmcp.tools import ToolResult
+from mcp.types import TextContent
+
+from tools.cebta import _profiler, _tracing
 
 # Create MCP server instance
 mcp = FastMCP(name="CBETA MCP Tools")
@@ -11,12 +20,34 @@ mcp = FastMCP(name="CBETA MCP Tools")
 # Export for tool registration in other modules
 __mcp_server__ = mcp
 
-# Common response structures
+mcp.add_middleware(_tracing.TracingMiddleware())
+mcp.add_middleware(_profiler.TaskTagMiddleware())
+
+# Common response structures; inside a traced call the envelope carries its trace_id
+def _with_trace(envelope: dict) -> dict:
+    _tracing.mark_result()
+    trace_id = _tracing.current_trace_id()
+    if trace_id:
+        envelope["trace_id"] = trace_id
+    return envelope
+
 def success_response(result: dict) -> dict:
-    return {"status": "success", "result": result}
+    return _with_trace({"status": "success", "result": result})
 
 def error_response(message: str) -> dict:
-    return {"status": "error", "message": message}
+    return _with_trace({"status": "error", "message": message})
+
+def raw_success_response(result_json: bytes) -> ToolResult:
+    """Wrap already-encoded JSON into the success envelope without decoding it.
+
+    Tools returning this must be registered with ``output_schema=None``,
+    since the payload is sent as text content only.
+    """
+    _tracing.mark_result()
+    trace_id = _tracing.current_trace_id()
+    tail = b',"trace_id":"' + trace_id.encode("ascii") + b'"}' if trace_id else b"}"
+    envelope = b'{"status":"success","result":' + result_json + tail
+    return ToolResult(content=[TextContent(type="text", text=envelope.decode("utf-8"))])
 
 # Track registered tool names to detect duplicates
 registered_tool_names: set[str] = set()
@@ -53,8 +84,18 @@ mcp_app = mcp.http_app(path="/", transport="streamable-http")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Combined lifespan for FastAPI app that includes MCP's lifespan."""
+    from tools.cebta._http import close_client
+    from tools.cebta._offload import shutdown as shutdown_offload
+    from tools.cebta._warm import start_warmer, stop_warmer
+
     async with mcp_app.lifespan(app):
+        await _profiler.start_monitor()
+        await start_warmer()
         yield
+        await stop_warmer()
+        await _profiler.stop_monitor()
+    await close_client()
+    shutdown_offload()
 
 
 # Initialize FastAPI & MCP Server with combined lifespan
@@ -67,6 +108,69 @@ app = FastAPI(
 # Mount MCP server to FastAPI app at /mcp path
 app.mount("/mcp", mcp_app)
 
+# Outermost HTTP span: honours incoming traceparent, returns X-Trace-Id
+app.add_middleware(_tracing.TraceASGIMiddleware)
+
+
+@app.get("/metrics")
+async def metrics() -> dict:
+    """Cache hit rates and other in-process counters."""
+    from tools.cebta._metrics import snapshot
+
+    return snapshot()
+
+
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str) -> dict:
+    """Spans of a recent trace (trace_id is returned in every tool response envelope)."""
+    spans = _tracing.recent.get(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="trace not found (not sampled or already evicted)")
+    return {"trace_id": trace_id, "spans": spans}
+
+# Admin routes are disabled unless CBETA_ADMIN_TOKEN is set; callers send it as a Bearer token
+def require_admin(request: Request) -> None:
+    token = os.getenv("CBETA_ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404)
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(seconds: float = 10.0, interval: float = 0.005) -> PlainTextResponse:
+    """Sample every thread's stack for `seconds` and return collapsed stacks (flamegraph.pl / speedscope input)."""
+    if not 0 < seconds <= _profiler.MAX_SECONDS or not 0.001 <= interval <= 1:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {_profiler.MAX_SECONDS:g}], interval in [0.001, 1]")
+    try:
+        stacks, rounds = await asyncio.to_thread(_profiler.profile, seconds, interval, threading.get_ident())
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(_profiler.collapsed(stacks), headers={
+        "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.folded"',
+        "X-Profile-Rounds": str(rounds),
+    })
+
+
+@app.get("/admin/loop", dependencies=[Depends(require_admin)])
+async def admin_loop() -> dict:
+    """Event loop lag statistics and the most recent stalls with the tool and stack that caused them."""
+    monitor = _profiler.monitor
+    if monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **monitor.stats(), "recent_stalls": list(monitor.stalls)}
+
+
+@app.post("/admin/warm", dependencies=[Depends(require_admin)])
+async def admin_warm(top_k: int | None = None, rate: float | None = None) -> dict:
+    """Prefetch the most popular upstream requests into the response cache now (rate limited)."""
+    from tools.cebta import _warm
+
+    if (top_k is not None and top_k <= 0) or (rate is not None and rate <= 0):
+        raise HTTPException(status_code=422, detail="top_k and rate must be positive")
+    return await _warm.warm(top_k or _warm.TOP_K, rate or _warm.RATE)
+
 # Start server
 if __name__ == "__main__":
     import uvicorn
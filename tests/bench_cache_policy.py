@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Response Cache Policy Simulator
+
+Replay an access trace against the response cache policies under the same
+memory budget and report hit rate, byte hit rate and peak resident bytes:
+
+  lru-entries   the previous policy: LRUCache bounded by entry count only
+  lru-bytes     plain LRU bounded by the byte budget
+  w-tinylfu     TinyLFUCache (frequency + size aware admission), the default
+
+The default trace is synthetic: Zipf-distributed small responses (work info,
+catalog nodes, TOCs) interleaved with one-off large responses (rare juan HTML,
+similar_search with k=500). --trace reads JSON lines instead, either
+{"path", "params", "size"} records or exchanges recorded with
+CBETA_HTTP_RECORD (size = response body length). Only sizes are simulated;
+no payloads are allocated.
+
+Usage:
+    python tests/bench_cache_policy.py
+    python tests/bench_cache_policy.py --budget-mb 16 --large-rate 0.2 --accesses 200000
+    python tests/bench_cache_policy.py --trace recordings/cbeta.jsonl.gz --budget-mb 64
+"""
+
+import argparse
+import json
+import pathlib
+import random
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from tools.cebta._cache import LRUCache, TinyLFUCache
+from tools.cebta._query import cache_key
+from tools.cebta._replay import load_exchanges, response_body
+
+
+class EntryLRU(LRUCache):
+    """LRUCache 另記常駐位元組數（只以項目數限制時，記憶體用量沒有上限）。"""
+
+    bytes = 0
+
+    def set(self, key, value) -> None:
+        old = self._data.get(key)
+        if old is not None:
+            self.bytes -= len(old[1])
+        self.bytes += len(value)
+        self._data[key] = (0.0, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= len(evicted)
+
+
+class ByteLRU:
+    """只以總位元組數限制的 LRU，作為同預算下的對照組。"""
+
+    def __init__(self, maxbytes: int):
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        value = self._data.get(key)
+        if value is None:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value) -> None:
+        if len(value) > self.maxbytes:
+            return
+        self.bytes += len(value)
+        self._data[key] = value
+        while self.bytes > self.maxbytes:
+            _, evicted = self._data.popitem(last=False)
+            self.bytes -= len(evicted)
+
+
+def synthetic_trace(accesses: int, small_keys: int, large_rate: float, zipf: float, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** zipf for rank in range(small_keys)]
+    small_sizes = [rng.randint(1, 16) * 1024 for _ in range(small_keys)]
+    ranks = rng.choices(range(small_keys), weights, k=accesses)
+    trace = []
+    for i, rank in enumerate(ranks):
+        if rng.random() < large_rate:
+            trace.append((("/juans", i), rng.randint(200, 2000) * 1024))
+        else:
+            trace.append((("/works", rank), small_sizes[rank]))
+    return trace
+
+
+def file_trace(path: pathlib.Path) -> list[tuple]:
+    trace = []
+    for row in load_exchanges(path):
+        if "request" in row:
+            request = row["request"]
+            params = dict(request.get("params") or [])
+            trace.append((cache_key(request["path"], params), len(response_body(row))))
+        else:
+            trace.append((cache_key(row["path"], row.get("params")), int(row["size"])))
+    return trace
+
+
+def resident_bytes(cache) -> int:
+    if isinstance(cache, TinyLFUCache):
+        return sum(cache._bytes.values())
+    return cache.bytes
+
+
+def simulate(cache, trace: list[tuple], blob: memoryview) -> dict:
+    hits = hit_bytes = total_bytes = peak = 0
+    started = time.perf_counter()
+    for key, size in trace:
+        total_bytes += size
+        if cache.get(key) is not None:
+            hits += 1
+            hit_bytes += size
+            continue
+        cache.set(key, blob[:size])
+        peak = max(peak, resident_bytes(cache))
+    elapsed = time.perf_counter() - started
+    return {
+        "hit_rate": round(hits / len(trace), 4),
+        "byte_hit_rate": round(hit_bytes / total_bytes, 4) if total_bytes else 0.0,
+        "peak_mb": round(peak / 2**20, 1),
+        "us_per_access": round(elapsed / len(trace) * 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare response cache policies on an access trace")
+    parser.add_argument("--trace", type=pathlib.Path, help="JSON lines trace (jsonl or jsonl.gz)")
+    parser.add_argument("--budget-mb", type=float, default=64, help="memory budget for byte-bounded policies")
+    parser.add_argument("--entries", type=int, default=512, help="entry limit (CBETA_RESPONSE_CACHE_SIZE)")
+    parser.add_argument("--accesses", type=int, default=100_000)
+    parser.add_argument("--small-keys", type=int, default=5000)
+    parser.add_argument("--large-rate", type=float, default=0.1, help="share of one-off large responses")
+    parser.add_argument("--zipf", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=pathlib.Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = file_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.accesses, args.small_keys, args.large_rate, args.zipf, args.seed)
+    budget = int(args.budget_mb * 2**20)
+    blob = memoryview(bytes(max(size for _, size in trace)))
+    # 以位元組限制的策略不另設項目上限，公平比較同一記憶體預算
+    policies = {
+        "lru-entries": lambda: EntryLRU(maxsize=args.entries),
+        "lru-bytes": lambda: ByteLRU(budget),
+        "w-tinylfu": lambda: TinyLFUCache(maxsize=len(trace), maxbytes=budget),
+    }
+
+    print(f"{len(trace)} accesses, {len({k for k, _ in trace})} keys, budget {args.budget_mb:g} MB")
+    print(f"{'policy':<12} {'hit rate':>9} {'byte hit':>9} {'peak MB':>9} {'us/access':>10}")
+    results = {}
+    for name, factory in policies.items():
+        row = results[name] = simulate(factory(), trace, blob)
+        print(f"{name:<12} {row['hit_rate']:>9.2%} {row['byte_hit_rate']:>9.2%} {row['peak_mb']:>9} {row['us_per_access']:>10}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
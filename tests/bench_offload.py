@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Offload Mixed-Workload Benchmark
+
+Run many small calls concurrently with a few large ones on one event loop
+and report small-call latency (p50 / p99 / max) and total time, with large
+decode + HTML parsing done inline on the loop vs offloaded (thread pool and
+process pool). Payloads are synthetic /juans-style JSON: a small search
+result and a large juan HTML document.
+
+Usage:
+    python tests/bench_offload.py
+    python tests/bench_offload.py --small 400 --large 8 --juan-kb 800
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from tools.cebta import _offload
+from tools.cebta._http import loads
+from tools.cebta._juan_text import extract_html
+
+
+def juan_payload(kb: int) -> bytes:
+    lines, i = [], 0
+    while sum(map(len, lines)) < kb * 1024:
+        lines.append(f"<span class='lb' id='T01n0001_p{i // 29 + 1:04d}a{i % 29 + 1:02d}'></span>"
+                     f"如是我聞一時佛在舍衛國祇樹給孤獨園<a class='noteAnchor' href='#n{i:04d}'></a><br/>")
+        i += 1
+    return json.dumps({"num_found": 1, "results": [{"juan": 1, "html": "<div id='body'>" + "".join(lines) + "</div>"}]},
+                      ensure_ascii=False).encode("utf-8")
+
+
+def small_payload() -> bytes:
+    return json.dumps({"num_found": 3, "results": [{"work": f"T{i:04d}", "title": "長阿含經"} for i in range(3)]},
+                      ensure_ascii=False).encode("utf-8")
+
+
+async def large_call(raw: bytes) -> None:
+    data = await _offload.run(loads, raw, size=len(raw))
+    html = data["results"][0]["html"]
+    await _offload.run(extract_html, html, size=len(html))
+
+
+async def small_call(raw: bytes, latencies: list[float]) -> None:
+    started = time.perf_counter()
+    await asyncio.sleep(0)
+    await _offload.run(loads, raw, size=len(raw))
+    latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def scenario(small: int, large: int, juan: bytes, tiny: bytes) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    started = time.perf_counter()
+
+    async def trickle():
+        for _ in range(small):
+            await small_call(tiny, latencies)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(trickle(), *(large_call(juan) for _ in range(large)))
+    return latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offloading large decode/parse jobs")
+    parser.add_argument("--small", type=int, default=200, help="Small calls (issued one per ms)")
+    parser.add_argument("--large", type=int, default=4, help="Concurrent large juan calls")
+    parser.add_argument("--juan-kb", type=int, default=500, help="Size of the large payload")
+    args = parser.parse_args()
+
+    juan, tiny = juan_payload(args.juan_kb), small_payload()
+    print(f"\n{'='*78}")
+    print(f"Offload Benchmark ({args.small} small calls mixed with {args.large} × {len(juan) / 1024:.0f} KiB juans)")
+    print(f"{'='*78}")
+    print(f"{'mode':<16}{'small p50':>12}{'small p99':>12}{'small max':>12}{'total':>10}{'offloaded':>12}")
+    for mode, threshold, kind in (("inline", 1 << 62, "thread"), ("thread pool", 64 * 1024, "thread"),
+                                  ("process pool", 64 * 1024, "process")):
+        _offload.THRESHOLD, _offload.POOL_KIND = threshold, kind
+        _offload.shutdown()
+        before = _offload.stats()["offloaded"]
+        asyncio.run(scenario(5, 1, juan, tiny))  # 暖身（建立池、行程）
+        latencies, total = asyncio.run(scenario(args.small, args.large, juan, tiny))
+        q = statistics.quantiles(latencies, n=100)
+        print(f"{mode:<16}{statistics.median(latencies):>10.2f}ms{q[98]:>10.2f}ms{max(latencies):>10.2f}ms"
+              f"{total:>9.2f}s{_offload.stats()['offloaded'] - before:>12}")
+    _offload.shutdown()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Replay Regression Benchmark
+
+Run every benchmark scenario (tests/bench_tools.py SCENARIOS) in-process with
+the shared httpx client on a ReplayTransport (tools/cebta/_replay.py), so
+upstream responses come byte-for-byte from a fixture file and no network is
+needed. Reports per-tool p50 / p95 latency; with --scale 0 (default) the
+upstream is instantaneous and the numbers measure only this service's own
+work (parameter handling, parsing, projection, serialization).
+
+  --save FILE       write the results as a baseline
+  --baseline FILE   compare against a baseline; exits 1 when a tool's p50
+                    grows beyond --tolerance (relative) plus --slack-ms,
+                    or when a call errors, so CI can fail the build
+  --record FILE     call the live CBETA API once per scenario and record the
+                    exchanges (*.jsonl.gz) for later replay
+
+The response cache is cleared before every call unless --warm is given.
+
+Usage:
+    python tests/bench_replay.py --save tests/fixtures/replay_baseline.json
+    python tests/bench_replay.py --baseline tests/fixtures/replay_baseline.json --tolerance 0.3
+    python tests/bench_replay.py --fixtures recordings/cbeta.jsonl.gz --scale 1
+    python tests/bench_replay.py --record recordings/cbeta.jsonl.gz
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import httpx
+from fastmcp import Client
+
+import main
+from tests.bench_tools import NEEDS_INDEX, SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http
+from tools.cebta._replay import RecordingTransport, ReplayTransport, load_exchanges
+
+
+def failed(result) -> bool:
+    return result.is_error or json.loads(result.content[0].text).get("status") == "error"
+
+
+async def run_tools(transport: httpx.AsyncBaseTransport, calls: int, warm: bool, tools: list[str]) -> dict:
+    _http._client = httpx.AsyncClient(transport=transport, timeout=20.0)
+    results = {}
+    async with Client(main.mcp) as client:
+        for name in tools:
+            latencies, errors = [], 0
+            for _ in range(calls):
+                if not warm:
+                    _http.response_cache.clear()
+                started = time.perf_counter()
+                result = await client.call_tool(name, SCENARIOS[name], raise_on_error=False)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += failed(result)
+            latencies.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(latencies), 3),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                "errors": errors,
+            }
+    await _http.close_client()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float) -> list[str]:
+    regressions = []
+    for name, row in results.items():
+        if row["errors"]:
+            regressions.append(f"{name}: {row['errors']} failed calls")
+        base = baseline.get(name)
+        if base and row["p50_ms"] > base["p50_ms"] * (1 + tolerance) + slack_ms:
+            regressions.append(f"{name}: p50 {row['p50_ms']:.2f}ms vs baseline {base['p50_ms']:.2f}ms")
+    return regressions
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded CBETA responses and check for perf regressions")
+    parser.add_argument("--fixtures", type=pathlib.Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--tools", help="Comma-separated tool names (default: every scenario)")
+    parser.add_argument("--calls", "-n", type=int, default=30, help="Calls per tool")
+    parser.add_argument("--scale", type=float, default=0.0, help="Replay delay as a multiple of recorded time")
+    parser.add_argument("--warm", action="store_true", help="Keep the response cache between calls")
+    parser.add_argument("--save", type=pathlib.Path, help="Write results as a baseline")
+    parser.add_argument("--baseline", type=pathlib.Path, help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p50 growth")
+    parser.add_argument("--slack-ms", type=float, default=1.0, help="Allowed absolute p50 growth")
+    parser.add_argument("--record", type=pathlib.Path, help="Record live exchanges to this file instead")
+    args = parser.parse_args()
+
+    tools = args.tools.split(",") if args.tools else [t for t in SCENARIOS if t not in NEEDS_INDEX]
+    if args.record:
+        transport = RecordingTransport(httpx.AsyncHTTPTransport(), args.record, base=_http.API_BASE)
+        results = asyncio.run(run_tools(transport, 1, False, tools))
+        print(f"recorded {transport.recorded} exchanges to {args.record}")
+        return
+
+    transport = ReplayTransport(load_exchanges(args.fixtures), scale=args.scale, base=_http.API_BASE)
+    results = asyncio.run(run_tools(transport, args.calls, args.warm, tools))
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["tools"] if args.baseline else {}
+
+    print(f"\n{'='*72}")
+    print(f"Replay Benchmark ({args.calls} calls/tool, scale {args.scale:g}, cache {'warm' if args.warm else 'cold'})")
+    print(f"{'='*72}")
+    print(f"{'tool':<32}{'p50 ms':>9}{'p95 ms':>9}{'err':>5}{'base p50':>10}{'change':>8}")
+    for name, row in results.items():
+        base = baseline.get(name, {}).get("p50_ms")
+        change = f"{(row['p50_ms'] / base - 1) * 100:>+7.0f}%" if base else f"{'-':>8}"
+        print(f"{name:<32}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['errors']:>5}"
+              f"{base if base is not None else '-':>10}{change}")
+    print()
+
+    if args.save:
+        meta = {"calls": args.calls, "scale": args.scale, "warm": args.warm,
+                "fixtures": args.fixtures.name, "python": platform.python_version()}
+        args.save.write_text(json.dumps({"meta": meta, "tools": results}, indent=2) + "\n", encoding="utf-8")
+    regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    if regressions:
+        print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_()
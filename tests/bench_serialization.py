@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tool Response Serialization Benchmark
+
+Measure serialization CPU per request for large CBETA payloads, comparing:
+  - stdlib:      json.loads → success_response → FastMCP result conversion
+  - orjson:      orjson.loads → success_response → FastMCP result conversion
+  - passthrough: upstream bytes → raw_success_response (no decode / re-encode)
+
+Each path ends with the MCP wire encoding of the CallToolResult, so the numbers
+cover everything between receiving the upstream body and writing the response.
+Payloads are synthetic but shaped like /juans and /search/all_in_one responses.
+
+Usage:
+    python tests/bench_serialization.py
+    python tests/bench_serialization.py --iterations 200 --sizes 50,500
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import orjson
+from fastmcp.tools import Tool
+from mcp.types import CallToolResult
+
+from main import success_response, raw_success_response
+
+
+def make_juan_payload(kb: int) -> bytes:
+    line = "<span class='lb' id='T01n0001_p0001a04'></span>如是我聞。一時佛在舍衛國祇樹給孤獨園<a class=\"noteAnchor\" href=\"#n0001002\"></a>"
+    reps = max(1, kb * 1024 // len(line.encode("utf-8")))
+    html = "<div id='body'>" + line * reps + "</div>"
+    return json.dumps({"num_found": 1, "results": [{"juan": 1, "html": html}]}, ensure_ascii=False).encode("utf-8")
+
+
+def make_all_in_one_payload(kb: int) -> bytes:
+    kwic = {"kwic": "擊於大<mark>法鼓</mark>吹大法螺", "lb": "0290b12", "vol": "T09"}
+    result = {"juan": 1, "canon": "T", "work": "T0270", "title": "大法鼓經", "term_hits": 31,
+              "kwics": {"num_found": 31, "results": [kwic] * 31}}
+    reps = max(1, kb * 1024 // len(json.dumps(result, ensure_ascii=False).encode("utf-8")))
+    return json.dumps({"query_string": "法鼓", "num_found": reps, "results": [result] * reps},
+                      ensure_ascii=False).encode("utf-8")
+
+
+async def _dict_tool() -> dict:
+    return {}
+
+
+async def _raw_tool() -> dict:
+    return {}
+
+
+DICT_TOOL = Tool.from_function(_dict_tool)
+RAW_TOOL = Tool.from_function(_raw_tool, output_schema=None)
+
+
+def wire_encode(tool_result) -> str:
+    return CallToolResult(
+        content=tool_result.content,
+        structured_content=tool_result.structured_content,
+    ).model_dump_json(by_alias=True, exclude_none=True)
+
+
+def path_stdlib(body: bytes) -> str:
+    return wire_encode(DICT_TOOL.convert_result(success_response(json.loads(body))))
+
+
+def path_orjson(body: bytes) -> str:
+    return wire_encode(DICT_TOOL.convert_result(success_response(orjson.loads(body))))
+
+
+def path_passthrough(body: bytes) -> str:
+    return wire_encode(RAW_TOOL.convert_result(raw_success_response(body)))
+
+
+PATHS = {"stdlib": path_stdlib, "orjson": path_orjson, "passthrough": path_passthrough}
+
+
+def bench(fn, body: bytes, iterations: int) -> float:
+    """Return CPU milliseconds per request."""
+    fn(body)  # warm-up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) * 1000 / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark tool response serialization")
+    parser.add_argument("--iterations", "-n", type=int, default=50)
+    parser.add_argument("--sizes", default="20,200,800", help="Payload sizes in KB, comma separated")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(f"\n{'='*72}")
+    print("Tool Response Serialization Benchmark (CPU ms / request)")
+    print(f"{'='*72}")
+    print(f"{'payload':<22}{'size':>10}" + "".join(f"{name:>13}" for name in PATHS))
+    for label, make in (("get_juan_html", make_juan_payload), ("cbeta_all_in_one", make_all_in_one_payload)):
+        for kb in sizes:
+            body = make(kb)
+            timings = [bench(fn, body, args.iterations) for fn in PATHS.values()]
+            print(f"{label:<22}{len(body) // 1024:>8}KB" + "".join(f"{t:>13.3f}" for t in timings))
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Suffix Array Build / Memory Benchmark
+
+Build suffix + LCP arrays for synthetic CBETA-shaped segments of increasing
+size and report:
+  - build time, split into suffix sorting and LCP (Kasai)
+  - peak Python heap during the build (tracemalloc, --heap; a separate pass
+    because tracing slows the build several times over) and on-disk size
+  - resident memory added by loading the mmap-backed arrays and running the queries
+  - count latency: suffix array binary search vs str.count over every juan
+
+Text is drawn from a Zipf-like distribution over ~3000 CJK characters with
+stock phrases mixed in, so bucket sizes and repeat lengths resemble real
+sutra text. Pass --index to run the same measurements on a real index.
+
+Usage:
+    python tests/bench_suffix_array.py
+    python tests/bench_suffix_array.py --sizes 100000,1000000 --heap
+    python tests/bench_suffix_array.py --index $CBETA_INDEX_DIR
+"""
+
+import argparse
+import pathlib
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from tools.cebta import _suffix_array
+from tools.cebta._corpus import CorpusIndex, Segment, write_segment
+
+PHRASES = ["如是我聞", "一時佛在", "舍衛國祇樹給孤獨園", "般若波羅蜜多", "善男子善女人", "阿耨多羅三藐三菩提", "。"]
+QUERIES = ["如是我聞", "般若", "阿耨多羅三藐三菩提心", "菩提", "不存在的字串"]
+
+
+def make_juans(chars: int, juan_chars: int = 8000, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    alphabet = [chr(0x4E00 + i) for i in range(3000)]
+    weights = [1 / (i + 1) for i in range(len(alphabet))]
+    juans, total = [], 0
+    while total < chars:
+        parts, n = [], 0
+        while n < juan_chars:
+            piece = rng.choice(PHRASES) if rng.random() < 0.15 else "".join(rng.choices(alphabet, weights, k=6))
+            parts.append(piece)
+            n += len(piece)
+        juans.append("".join(parts))
+        total += n
+    return juans
+
+
+def synthetic_segment(root: pathlib.Path, chars: int) -> Segment:
+    juans = make_juans(chars)
+    docs = [{"work": f"B{i // 10:04d}", "juan": i % 10 + 1} for i in range(len(juans))]
+    texts = [([f"B01n{i:04d}_p0001a01"], [t]) for i, t in enumerate(juans)]
+    write_segment(root / "seg-000001", docs, texts)
+    return Segment(root / "seg-000001")
+
+
+def rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def peak_heap(seg: Segment) -> int:
+    tracemalloc.start()
+    _suffix_array.build(seg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def measure(seg: Segment, heap: bool) -> None:
+    chars = sum(len(t) + 1 for t in seg.texts)
+    peak = f"{peak_heap(seg) / 2**20:>11.1f}MB" if heap else f"{'-':>13}"
+    stats = _suffix_array.build(seg)
+
+    _suffix_array._loaded.clear()
+    before = rss_kb()
+    sa = _suffix_array.for_segment(seg)
+
+    sa_ms, scan_ms = [], []
+    for q in QUERIES:
+        start = time.perf_counter()
+        n = sa.count(q)
+        sa_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        m = sum(t.count(q) for t in seg.texts)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+        assert n == m, (q, n, m)
+    loaded = rss_kb() - before
+
+    print(f"{chars:>12,}{stats['sort_seconds']:>10.2f}s{stats['lcp_seconds']:>9.2f}s"
+          f"{peak}{stats['bytes'] / 2**20:>10.1f}MB{loaded / 1024:>10.1f}MB"
+          f"{sum(sa_ms) / len(sa_ms):>11.3f}{sum(scan_ms) / len(scan_ms):>11.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark suffix array build time and memory")
+    parser.add_argument("--sizes", default="100000,500000,2000000", help="Synthetic corpus sizes in characters")
+    parser.add_argument("--heap", action="store_true", help="Also measure peak Python heap (slow)")
+    parser.add_argument("--index", type=pathlib.Path, help="Measure the segments of an existing index instead")
+    args = parser.parse_args()
+
+    print(f"\n{'='*86}")
+    print("Suffix Array Benchmark (build per segment; count latency averaged over queries, ms)")
+    print(f"{'='*86}")
+    print(f"{'chars':>12}{'sort':>11}{'lcp':>10}{'peak heap':>13}{'on disk':>12}{'mmap rss':>12}"
+          f"{'sa count':>11}{'str.count':>11}")
+    if args.index:
+        for seg in CorpusIndex(args.index).segments:
+            measure(seg, args.heap)
+    else:
+        for chars in (int(s) for s in args.sizes.split(",")):
+            with tempfile.TemporaryDirectory() as tmp:
+                measure(synthetic_segment(pathlib.Path(tmp), chars), args.heap)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Offline MCP Tool Benchmark
+
+Start the fake CBETA server (tests/fake_cbeta.py) on recorded responses, run
+the real service (main:app under uvicorn) in a subprocess pointed at it, and
+drive every registered tool through the streamable-http endpoint (/mcp/) at a
+fixed concurrency. For each tool it reports:
+  - p50 / p95 / p99 latency (ms) and throughput (calls/s)
+  - error count (MCP errors and {"status": "error"} envelopes)
+  - upstream requests per call (as seen by the fake server)
+  - server RSS after the tool's run and the change during it
+
+No network access is needed; numbers are reproducible for a given fixture
+file, latency/jitter/error settings and seed. --cold disables the response
+cache so every call reaches the fake upstream.
+
+Usage:
+    python tests/bench_tools.py
+    python tests/bench_tools.py --concurrency 16 --calls 400 --latency 0.05 --jitter 0.02
+    python tests/bench_tools.py --tools cbeta_all_in_one,get_juan_html --cold --json out.json
+    python tests/bench_tools.py --fixtures recordings/cbeta.jsonl.gz --replay-timing
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+from fastmcp import Client
+
+from tests.fake_cbeta import DEFAULT_FIXTURES, create_app, free_port, load_exchanges, serve_in_thread
+
+# 每個工具的基準呼叫參數（對應 fixtures 中錄製的請求）
+SCENARIOS: dict[str, dict] = {
+    "cbeta_fulltext_search": {"q": "法鼓"},
+    "extended_search": {"q": '"法鼓" "印順"'},
+    "cbeta_kwic_search": {"work": "T0001", "juan": 1, "q": "老子"},
+    "cbeta_all_in_one": {"q": "法鼓"},
+    "cbeta_search_pipeline": {"q": "法鼓", "top": 2, "kwic_rows": 2},
+    "search_cbeta_notes": {"q": '"法鼓"'},
+    "cbeta_search_sc": {"q": "四圣谛"},
+    "search_title": {"q": "妙法蓮華"},
+    "cbeta_similar_search": {"q": "如是我聞一時佛在舍衛國"},
+    "cbeta_align_translations": {"source": "T0099", "target": "T0100"},
+    "synonym_search": {"q": "文殊師利"},
+    "cbeta_facet_query": {"q": "法鼓"},
+    "search_cbeta_texts": {"q": "阿含"},
+    "get_cbeta_catalog": {"q": "root"},
+    "search_works_by_translator": {"creator": "鳩摩羅什"},
+    "search_cbeta_by_dynasty": {"dynasty": "唐"},
+    "search_buddhist_canons_by_vol": {"canon": "T", "vol_start": 1, "vol_end": 2},
+    "get_cbeta_work_info": {"work": "T0001"},
+    "get_cbeta_toc": {"work": "T0001"},
+    "get_juan_html": {"work": "T0001", "juan": 1},
+    "cbeta_export_work": {"work": "T0100"},
+    "cbeta_goto": {"linehead": "T01n0001_p0001a01"},
+    "get_cbeta_lines": {"linehead": "T01n0001_p0001a04", "after": 2},
+    "cbeta_read_passage": {"linehead": "T01n0001_p0001a04"},
+    "cbeta_substring_count": {"q": "如是我聞"},
+}
+
+# 只由本地索引回答的工具，需以 --index 指定索引才量測
+NEEDS_INDEX = {"cbeta_substring_count"}
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for row in f:
+            if row.startswith("VmRSS:"):
+                return int(row.split()[1])
+    return 0
+
+
+def percentile(samples: list[float], p: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1]
+
+
+def is_error(result) -> bool:
+    if result.is_error:
+        return True
+    text = result.content[0].text if result.content else ""
+    return text.startswith('{"status":"error"') or '"status": "error"' in text[:30]
+
+
+async def bench_tool(url: str, name: str, args: dict, calls: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = calls
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        async with Client(url) as client:
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                result = await client.call_tool(name, args, raise_on_error=False)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += is_error(result)
+
+    async with Client(url) as client:  # 暖身：建立快取、匯入延遲載入的資料
+        await client.call_tool(name, args, raise_on_error=False)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "calls_per_second": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def start_service(port: int, upstream: str, cold: bool, index: pathlib.Path | None, export_dir: str) -> subprocess.Popen:
+    env = {**os.environ, "CBETA_API_BASE": upstream, "CBETA_EXPORT_DIR": export_dir}
+    env.pop("CBETA_INDEX_DIR", None)
+    if index:
+        env["CBETA_INDEX_DIR"] = str(index)
+    if cold:
+        env["CBETA_RESPONSE_CACHE_SIZE"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("service exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("service did not start")
+
+
+async def run(args) -> list[dict]:
+    fake = create_app(load_exchanges(args.fixtures), args.latency, args.jitter, args.error_rate,
+                      args.replay_timing, args.seed)
+    fake_server = serve_in_thread(fake, free_port())
+    upstream = f"http://127.0.0.1:{fake_server.config.port}"
+    port = free_port()
+    export_dir = tempfile.TemporaryDirectory(prefix="cbeta-bench-export-")
+    proc = None
+    url = f"http://127.0.0.1:{port}/mcp/"
+    rows = []
+    try:
+        proc = start_service(port, upstream, args.cold, args.index, export_dir.name)
+        async with Client(url) as client:
+            registered = sorted(t.name for t in await client.list_tools())
+        wanted = args.tools.split(",") if args.tools else registered
+        for name in wanted:
+            if name not in SCENARIOS or (name in NEEDS_INDEX and not args.index):
+                rows.append({"tool": name, "skipped": "no scenario" if name not in SCENARIOS else "needs --index"})
+                continue
+            before_rss = rss_kb(proc.pid)
+            before_upstream = fake.state.stats["requests"]
+            row = {"tool": name, **await bench_tool(url, name, SCENARIOS[name], args.calls, args.concurrency)}
+            row["upstream_per_call"] = (fake.state.stats["requests"] - before_upstream) / (row["calls"] + 1)
+            row["rss_mb"] = rss_kb(proc.pid) / 1024
+            row["rss_delta_mb"] = (rss_kb(proc.pid) - before_rss) / 1024
+            rows.append(row)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        fake_server.should_exit = True
+        export_dir.cleanup()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark MCP tools against a fake CBETA server")
+    parser.add_argument("--fixtures", type=pathlib.Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--tools", help="Comma-separated tool names (default: all registered)")
+    parser.add_argument("--calls", "-n", type=int, default=200, help="Calls per tool")
+    parser.add_argument("--concurrency", "-c", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--replay-timing", action="store_true", help="Use recorded upstream timings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cold", action="store_true", help="Disable the response cache in the service")
+    parser.add_argument("--index", type=pathlib.Path, help="Local index for tools that need one")
+    parser.add_argument("--json", type=pathlib.Path, help="Also write results as JSON")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+
+    print(f"\n{'='*104}")
+    print(f"MCP Tool Benchmark (concurrency {args.concurrency}, {args.calls} calls/tool, "
+          f"upstream {args.latency * 1000:.0f}±{args.jitter * 1000:.0f}ms, "
+          f"errors {args.error_rate:.1%}, cache {'off' if args.cold else 'on'})")
+    print(f"{'='*104}")
+    print(f"{'tool':<32}{'p50':>9}{'p95':>9}{'p99':>9}{'calls/s':>10}{'err':>6}{'up/call':>9}{'rss MB':>10}{'ΔMB':>9}")
+    for row in rows:
+        if "skipped" in row:
+            print(f"{row['tool']:<32}  skipped ({row['skipped']})")
+            continue
+        print(f"{row['tool']:<32}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+              f"{row['calls_per_second']:>10.1f}{row['errors']:>6}{row['upstream_per_call']:>9.2f}"
+              f"{row['rss_mb']:>10.1f}{row['rss_delta_mb']:>9.1f}")
+    print()
+    if args.json:
+        args.json.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
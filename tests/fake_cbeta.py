@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Fake CBETA API Server
+
+Serve recorded CBETA API exchanges from a local ASGI app so tools can be
+exercised and benchmarked without network access. Point the MCP server at it
+with CBETA_API_BASE=http://127.0.0.1:<port>.
+
+Exchanges are JSON lines (optionally gzip-compressed, *.jsonl.gz):
+
+    {"request": {"method": "GET", "path": "/search", "params": [["q", "法鼓"], ...]},
+     "response": {"status": 200, "headers": {...}, "body": "..."},   # or "body_b64"
+     "elapsed": 0.21}
+
+This is the format written by CBETA_HTTP_RECORD (tools/cebta/_replay.py).
+A request is answered by the exchange with the same path and normalized
+parameters (the same cache key the tools use), falling back to the first
+exchange recorded for that path; unknown paths get a 404. Latency, jitter
+and an injected error rate (503) are configurable and seeded.
+
+Usage:
+    python tests/fake_cbeta.py --port 8799
+    python tests/fake_cbeta.py --port 8799 --latency 0.05 --jitter 0.02 --error-rate 0.01
+    python tests/fake_cbeta.py --fixtures recordings/cbeta.jsonl.gz --replay-timing
+"""
+
+import argparse
+import asyncio
+import pathlib
+import random
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from tools.cebta._replay import ExchangeTable, load_exchanges, response_body
+
+DEFAULT_FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures" / "cbeta_api.jsonl"
+
+
+def create_app(
+    exchanges: list[dict],
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    replay_timing: bool = False,
+    seed: int = 0,
+) -> Starlette:
+    """
+    latency/jitter 為每個回應額外的延遲（秒，jitter 為均勻分布的 ±範圍）；
+    replay_timing 時改用錄製時的 elapsed。error_rate 為回傳 503 的比例。
+    """
+    table = ExchangeTable(exchanges, strict=False)
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "unmatched": 0}
+
+    async def handle(request: Request) -> Response:
+        stats["requests"] += 1
+        exchange = table.match(request.method, request.url.path, dict(request.query_params))
+        delay = exchange.get("elapsed", 0.0) if (replay_timing and exchange) else latency
+        delay = max(0.0, delay + rng.uniform(-jitter, jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return Response(b'{"error":"injected failure"}', status_code=503, media_type="application/json")
+        if exchange is None:
+            stats["unmatched"] += 1
+            return Response(b'{"error":"no recorded exchange"}', status_code=404, media_type="application/json")
+        response = exchange["response"]
+        headers = {k: v for k, v in response.get("headers", {}).items()
+                   if k.lower() not in ("content-length", "transfer-encoding")}
+        return Response(response_body(exchange), status_code=response["status"], headers=headers)
+
+    app = Starlette(routes=[Route("/{path:path}", handle)])
+    app.state.stats = stats
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int) -> "uvicorn.Server":
+    """在背景執行緒啟動 uvicorn，回傳 server（設定 server.should_exit = True 即停止）。"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-cbeta", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake CBETA server did not start")
+        time.sleep(0.01)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve recorded CBETA API responses")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--fixtures", type=pathlib.Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform ± jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--replay-timing", action="store_true", help="Delay each response by its recorded elapsed time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(load_exchanges(args.fixtures), args.latency, args.jitter, args.error_rate,
+                     args.replay_timing, args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
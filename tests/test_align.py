@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Translation Alignment Tests
+
+Check the Smith-Waterman scorer and sentence splitter, align two recorded
+alternate translations (T0099 / T0100 juan 1) with cbeta_align_translations,
+check a repeated call is served from the alignment cache without upstream
+requests, and check the process-pool path gives the same pairs. No network
+access required.
+
+Usage:
+    python -m pytest tests/test_align.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.bench_tools import SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _align, _http, _juan_text, _offload
+from tools.cebta._juan_text import extract_html
+from tools.cebta._replay import ReplayTransport, load_exchanges
+from tools.cebta.search import align_translations
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = ReplayTransport(load_exchanges(DEFAULT_FIXTURES), scale=0, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    for cache in (_http.response_cache, _juan_text.juan_text_cache, _align.alignment_cache):
+        cache.clear()
+    yield transport
+    for cache in (_http.response_cache, _juan_text.juan_text_cache, _align.alignment_cache):
+        cache.clear()
+
+
+def align(**overrides):
+    async def go():
+        async with Client(main.mcp) as client:
+            result = await client.call_tool("cbeta_align_translations", {**SCENARIOS["cbeta_align_translations"], **overrides})
+            return json.loads(result.content[0].text)
+    return asyncio.run(go())
+
+
+def test_smith_waterman_and_split():
+    assert _align.smith_waterman("如是我聞", "如是我聞") == 8
+    assert _align.smith_waterman("一時佛住舍衛國", "一時佛在舍衛國") == 11
+    assert _align.smith_waterman("如是", "色空") == 0
+    juan = extract_html("<span class='lb' id='X01n0001_p0001a01'></span>如是我聞。"
+                        "<span class='lb' id='X01n0001_p0001a02'></span>一時，佛住舍衛國。" + "甲" * 90)
+    sentences = _align.split_sentences(juan)
+    assert [s["linehead"][-3:] for s in sentences[:2]] == ["a01", "a02"]
+    assert sentences[1]["text"] == "一時，佛住舍衛國。"
+    assert all(len(s["text"]) <= _align.MAX_SENTENCE_CHARS for s in sentences)
+
+
+def test_align_translations(transport):
+    response = align()
+    assert response["status"] == "success"
+    result = response["result"]
+    pairs = {p["source"]["text"]: p for p in result["results"]}
+    assert pairs["一時佛住舍衛國祇樹給孤獨園。"]["target"]["text"] == "一時佛在舍衛國祇樹給孤獨園。"
+    assert pairs["喜貪盡者，說心解脫。"]["target"]["linehead"] == "T02n0100_p0001a07"
+    assert pairs["我生已盡，梵行已立，所作已作，自知不受後有。"]["target"] is None
+    assert result["num_aligned"] >= 8 and 0.5 < result["mean_similarity"] <= 1
+    assert transport.replayed == 2
+
+    hits = _align.alignment_cache.hits
+    again = align(rows=2, start=1)
+    assert transport.replayed == 2 and _align.alignment_cache.hits == hits + 1
+    assert again["result"]["results"] == result["results"][1:3]
+
+
+def test_align_in_process_pool(transport, monkeypatch):
+    inline = align()["result"]["results"]
+    _align.alignment_cache.clear()
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    monkeypatch.setattr(align_translations, "_BATCH", 4)
+    before = _offload.stats()["offloaded"]
+    try:
+        pooled = align()["result"]["results"]
+    finally:
+        _offload.shutdown()
+    assert pooled == inline
+    assert _offload.stats()["offloaded"] - before == 3  # 12 句分 3 批
+
+
+def test_align_rejects_bad_ranges(transport):
+    assert align(target_juans="1-x")["status"] == "error"
+    assert align(target_juans="1-99")["status"] == "error"
+    assert transport.replayed == 0
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Response Cache Policy Tests
+
+Check TinyLFUCache (tools/cebta/_cache.py): frequently read small entries
+survive a stream of one-off large entries, the byte and entry budgets are
+never exceeded, entries larger than the main segment are not admitted,
+re-read probation entries are promoted, entries expire after ttl, and on the
+synthetic trace of tests/bench_cache_policy.py it beats a byte-bounded LRU.
+
+Usage:
+    python -m pytest tests/test_cache_policy.py
+"""
+
+import time
+
+from tests.bench_cache_policy import ByteLRU, simulate, synthetic_trace
+from tools.cebta._cache import TinyLFUCache
+
+
+def read(cache, key, size):
+    value = cache.get(key)
+    if value is None:
+        cache.set(key, bytes(size))
+    return value is not None
+
+
+def test_hot_small_entries_survive_large_one_offs():
+    cache = TinyLFUCache(maxsize=1000, maxbytes=100_000)
+    hot = [f"work{i}" for i in range(20)]
+    for _ in range(5):
+        for key in hot:
+            read(cache, key, 1000)
+    for i in range(200):
+        read(cache, f"juan{i}", 30_000)
+        assert cache.stats()["bytes"] <= cache.maxbytes
+    assert all(key in cache for key in hot)
+    assert cache.rejected >= 190
+
+
+def test_budgets_and_oversized_entries():
+    cache = TinyLFUCache(maxsize=100, maxbytes=10_000)
+    cache.set("huge", bytes(20_000))
+    assert "huge" not in cache and cache.rejected == 1
+    for i in range(500):
+        read(cache, f"k{i % 150}", 50)
+        assert len(cache) <= 100 and cache.stats()["bytes"] <= 10_000
+
+
+def test_promotion_and_ttl():
+    cache = TinyLFUCache(maxsize=100, maxbytes=10_000, ttl=0.05)
+    for key in ("a", "b"):
+        read(cache, key, 10)
+    cache.set("c", b"x")  # window 只容納 1 項，a、b 依序進入 probation
+    assert "a" in cache._segments["probation"]
+    assert cache.get("a") is not None
+    assert "a" in cache._segments["protected"]
+    time.sleep(0.06)
+    assert cache.get("a") is None and "a" not in cache
+
+
+def test_disabled_when_maxsize_is_zero():
+    cache = TinyLFUCache(maxsize=0)
+    cache.set("a", b"x")
+    assert len(cache) == 0 and cache.get("a") is None
+
+
+def test_beats_byte_lru_on_synthetic_trace():
+    trace = synthetic_trace(20_000, 2000, 0.1, 1.0, seed=1)
+    blob = memoryview(bytes(max(size for _, size in trace)))
+    budget = 8 * 2**20
+    tinylfu = simulate(TinyLFUCache(maxsize=len(trace), maxbytes=budget), trace, blob)
+    lru = simulate(ByteLRU(budget), trace, blob)
+    assert tinylfu["hit_rate"] > lru["hit_rate"] + 0.1
+    assert tinylfu["peak_mb"] <= 8
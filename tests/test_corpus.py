@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Local Corpus Index Tests
+
+Build a tiny CBETA-shaped corpus in a temp directory, index it with the
+importer and check the local search features against hand-counted results,
+including the tools that answer from the index with offloading forced on.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_corpus.py
+"""
+
+import asyncio
+import json
+import pathlib
+
+import pytest
+from fastmcp import Client
+
+import main
+from tools.cebta import _offload, _synonyms
+from tools.cebta._corpus import CorpusIndex
+from tools.cebta._facets import aggregate, parse_facets
+from tools.cebta._importer import build_index
+from tools.cebta._synonyms import SynonymGraph
+from tools.cebta.search import fulltext_search, search_sc
+
+
+WORKS = [
+    {"work": "T0270", "title": "大法鼓經", "canon": "T", "category": "法華部類", "time_dynasty": "劉宋",
+     "creators": "求那跋陀羅", "vol": "T09"},
+    {"work": "X0001", "title": "法鼓疏", "canon": "X", "category": "諸宗部類", "time_dynasty": "唐",
+     "creators": "甲,乙", "vol": "X01"},
+]
+
+JUANS = {
+    ("T0270", 1): [("T09n0270_p0290a01", "擊大法鼓吹大法螺"), ("T09n0270_p0290a02", "法鼓音聲遍至十方")],
+    ("T0270", 2): [("T09n0270_p0295a01", "如是我聞一時佛住")],
+    ("X0001", 1): [("X01n0001_p0001a01", "釋法鼓義"), ("X01n0001_p0001a02", "鼓者聲也法鼓")],
+}
+
+
+def juan_html(lines: list[tuple[str, str]]) -> str:
+    body = "".join(f"<span class='lb' id='{lh}'></span>{text}" for lh, text in lines)
+    return f"<div id='body'><p>{body}</p></div>"
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> CorpusIndex:
+    root = tmp_path_factory.mktemp("cbeta")
+    source = root / "source"
+    (source / "juans").mkdir(parents=True)
+    (source / "works.jsonl").write_text(
+        "\n".join(json.dumps(w, ensure_ascii=False) for w in WORKS), encoding="utf-8")
+    for (work, juan), lines in JUANS.items():
+        path = source / "juans" / work / f"{juan:03d}.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(juan_html(lines), encoding="utf-8")
+    build_index(source, root / "index")
+    return CorpusIndex(root / "index")
+
+
+def test_count_uses_postings_and_exact_hits(index):
+    hits = {(seg.docs[doc].work, seg.docs[doc].juan): n for seg, doc, n in index.count("法鼓")}
+    assert hits == {("T0270", 1): 2, ("X0001", 1): 2}
+    assert index.count("不存在") == []
+
+
+def test_linehead_mapping(index):
+    seg = index.segments[0]
+    doc = next(i for i, d in enumerate(seg.docs) if (d.work, d.juan) == ("T0270", 1))
+    offset = seg.texts[doc].index("法鼓音")
+    assert seg.linehead_at(doc, offset) == "T09n0270_p0290a02"
+
+
+def test_aggregate_all_facets_in_one_pass(index):
+    facets = aggregate(index, "法鼓", parse_facets("all"))
+    assert facets["canon"] == [
+        {"canon": "T", "docs": 1, "hits": 2, "canon_name": "大正藏"},
+        {"canon": "X", "docs": 1, "hits": 2, "canon_name": "新纂卍續藏"},
+    ]
+    assert {b["creator"] for b in facets["creator"]} == {"求那跋陀羅", "甲", "乙"}
+    assert facets["work"][0]["docs"] == 1
+
+
+def test_parse_facets_rejects_unknown():
+    assert parse_facets("canon, dynasty") == ["canon", "dynasty"]
+    with pytest.raises(ValueError):
+        parse_facets("canon,places")
+
+
+def test_count_any_sums_hits_across_terms(index):
+    hits = {(seg.docs[doc].work, seg.docs[doc].juan): n for seg, doc, n in index.count_any(["法鼓", "法螺"])}
+    assert hits[("T0270", 1)] == 3
+
+
+def call(name: str, args: dict) -> dict:
+    async def go():
+        async with Client(main.mcp) as client:
+            return json.loads((await client.call_tool(name, args)).content[0].text)
+    return asyncio.run(go())
+
+
+@pytest.fixture
+def offloaded(monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    before = _offload.stats()["offloaded"]
+    return lambda: _offload.stats()["offloaded"] - before
+
+
+def test_fulltext_synonyms_scan_is_offloaded(index, monkeypatch, offloaded):
+    monkeypatch.setattr(fulltext_search, "get_index", lambda: index)
+    monkeypatch.setattr(_synonyms, "get_graph", lambda: SynonymGraph([["法鼓", "法螺"]]))
+    data = call("cbeta_fulltext_search", {"q": "法鼓", "synonyms": 1, "select": "num_found,total_term_hits"})
+    assert data["result"] == {"num_found": 2, "total_term_hits": 5}
+    assert offloaded() == 1
+
+
+def test_search_sc_count_is_offloaded(index, monkeypatch, offloaded):
+    monkeypatch.setattr(search_sc, "get_index", lambda: index)
+    data = call("cbeta_search_sc", {"q": "法鼓"})
+    assert data["result"] == {"q": "法鼓", "converted": "法鼓", "hits": 4}
+    assert offloaded() == 1
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Export Tests
+
+Export a small synthetic work with tools.cebta._export against recorded
+responses: a failing juan is reported and retried on the next run, a
+partial write left after the last checkpoint is truncated on resume, a
+torn last checkpoint line is dropped so later runs resume past it,
+upstream concurrency stays within the limit, and cbeta_export_work writes
+into CBETA_EXPORT_DIR. No network access required.
+
+Usage:
+    python -m pytest tests/test_export.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tools.cebta import _export, _http
+from tools.cebta._replay import ReplayTransport
+
+WORKS = {"num_found": 1, "results": [{"work": "X9999", "title": "試驗經", "juan": 4, "juan_start": 1}]}
+
+
+def exchange(path, params, status=200, body=None):
+    return {"request": {"method": "GET", "path": path, "params": [[k, str(v)] for k, v in params.items()]},
+            "response": {"status": status, "headers": {"content-type": "application/json"},
+                         "body": json.dumps(body, ensure_ascii=False) if body is not None else ""},
+            "elapsed": 0.02}
+
+
+def exchanges(failing: set[int] = frozenset()) -> list[dict]:
+    out = [exchange("/works", {"work": "X9999"}, body=WORKS)]
+    for juan in range(1, 5):
+        html = f"<span class='lb' id='X99n9999_p000{juan}a01'></span>第{juan}卷如是我聞。"
+        out.append(exchange("/juans", {"work": "X9999", "juan": juan, "work_info": 0, "toc": 0},
+                            500 if juan in failing else 200,
+                            None if juan in failing else {"num_found": 1, "results": [{"juan": juan, "html": html}]}))
+    return out
+
+
+class CountingTransport(ReplayTransport):
+    in_flight = max_in_flight = 0
+
+    async def handle_async_request(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def use(failing: set[int] = frozenset()) -> CountingTransport:
+        transport = CountingTransport(exchanges(failing), scale=1, base=_http.API_BASE)
+        monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+        _http.response_cache.clear()
+        return transport
+    yield use
+    _http.response_cache.clear()
+
+
+def run_export(out, concurrency=8):
+    async def go():
+        jobs = await _export.list_juans("X9999")
+        return await _export.export(jobs, out, concurrency=concurrency)
+    return asyncio.run(go())
+
+
+def exported_juans(out) -> list[int]:
+    return sorted(json.loads(line)["juan"] for line in out.read_text(encoding="utf-8").splitlines())
+
+
+def test_failed_juan_is_retried_on_resume(upstream, tmp_path):
+    out = tmp_path / "X9999.jsonl"
+    upstream(failing={3})
+    first = run_export(out)
+    assert first["exported"] == 3 and [f["juan"] for f in first["failed"]] == [3]
+    assert exported_juans(out) == [1, 2, 4]
+
+    transport = upstream()
+    second = run_export(out)
+    assert second["exported"] == 1 and second["skipped"] == 3 and not second["failed"]
+    assert transport.replayed == 2  # /works + 第3卷
+    assert exported_juans(out) == [1, 2, 3, 4]
+    assert second["bytes"] == out.stat().st_size
+
+
+def test_partial_write_is_truncated(upstream, tmp_path):
+    out = tmp_path / "X9999.jsonl"
+    upstream()
+    run_export(out)
+    size = out.stat().st_size
+    with open(out, "ab") as f:
+        f.write(b'{"work": "X9999", "juan": 9, "li')  # 中斷時寫到一半
+    resumed = run_export(out)
+    assert resumed["exported"] == 0 and resumed["skipped"] == 4
+    assert out.stat().st_size == size and exported_juans(out) == [1, 2, 3, 4]
+
+
+def test_torn_checkpoint_line_is_dropped(upstream, tmp_path):
+    out = tmp_path / "X9999.jsonl"
+    ckpt = tmp_path / "X9999.jsonl.ckpt"
+    upstream(failing={3, 4})
+    run_export(out)
+    with open(ckpt, "a", encoding="utf-8") as f:
+        f.write('{"work": "X9999", "ju')  # 中斷時寫到一半
+    upstream(failing={4})
+    second = run_export(out)
+    assert second["exported"] == 1 and second["skipped"] == 2
+    assert all(json.loads(line) for line in ckpt.read_text(encoding="utf-8").splitlines())
+
+    transport = upstream()
+    third = run_export(out)
+    assert third["exported"] == 1 and third["skipped"] == 3 and transport.replayed == 2
+    assert exported_juans(out) == [1, 2, 3, 4]
+
+
+def test_concurrency_limit(upstream, tmp_path):
+    transport = upstream()
+    run_export(tmp_path / "X9999.jsonl", concurrency=2)
+    assert transport.max_in_flight == 2
+
+
+def test_export_tool_writes_to_export_dir(upstream, tmp_path, monkeypatch):
+    upstream()
+    monkeypatch.setenv("CBETA_EXPORT_DIR", str(tmp_path))
+
+    async def go():
+        async with Client(main.mcp) as client:
+            calls = [{"work": "X9999", "format": "text"}, {"work": "../etc"}]
+            return [json.loads((await client.call_tool("cbeta_export_work", args)).content[0].text) for args in calls]
+
+    text, bad = asyncio.run(go())
+    assert text["status"] == "success" and text["result"]["path"] == str(tmp_path / "X9999.txt")
+    assert (tmp_path / "X9999.txt").read_text(encoding="utf-8").count("# X9999 試驗經 卷") == 4
+    assert bad["status"] == "error"
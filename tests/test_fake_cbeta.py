@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Fake CBETA Server Tests
+
+Check request matching and error injection of the fake CBETA server, then
+run every benchmark scenario in-process against it (ASGI transport) so the
+fixture file and tests/bench_tools.py stay in step with the registered
+tools. No network access required.
+
+Usage:
+    python -m pytest tests/test_fake_cbeta.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.bench_tools import NEEDS_INDEX, SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES, create_app, load_exchanges
+from tools.cebta import _http
+
+EXCHANGES = load_exchanges(DEFAULT_FIXTURES)
+
+
+def get(app, path: str, params: dict):
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake") as client:
+            return await client.get(path, params=params)
+    return asyncio.run(go())
+
+
+def test_matches_normalized_params_and_falls_back_to_path():
+    app = create_app(EXCHANGES)
+    exact = get(app, "/search/kwic", {"q": "老子", "juan": "1", "work": "T0001"})  # 參數順序不同
+    assert exact.status_code == 200 and "老子" in exact.text
+    fallback = get(app, "/search/kwic", {"q": "沒有錄製的詞", "work": "T0001", "juan": "1"})
+    assert fallback.text == exact.text
+    assert get(app, "/no/such/api", {}).status_code == 404
+    assert app.state.stats == {"requests": 3, "errors": 0, "unmatched": 1}
+
+
+def test_error_injection_is_seeded():
+    def statuses(seed):
+        app = create_app(EXCHANGES, error_rate=0.5, seed=seed)
+        return [get(app, "/works", {"work": "T0001"}).status_code for _ in range(20)]
+
+    first = statuses(7)
+    assert first == statuses(7)
+    assert set(first) == {200, 503}
+
+
+def test_every_scenario_succeeds_against_fixtures(monkeypatch, tmp_path):
+    monkeypatch.setenv("CBETA_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_app(EXCHANGES)), base_url=_http.API_BASE))
+    _http.response_cache.clear()
+
+    async def go():
+        async with Client(main.mcp) as client:
+            registered = {t.name for t in await client.list_tools()}
+            assert registered == set(SCENARIOS)
+            for name in sorted(registered - NEEDS_INDEX):
+                result = await client.call_tool(name, SCENARIOS[name])
+                assert json.loads(result.content[0].text)["status"] == "success", name
+
+    asyncio.run(go())
+    _http.response_cache.clear()
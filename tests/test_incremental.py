@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Incremental Index Update Tests
+
+Build an index, then change / add / remove juan files and check that only
+the changed juans are re-indexed, superseded docs disappear from every
+query path, compaction preserves results, runs in the background without
+blocking updates, and readers pick up the new manifest in the background. No network access required.
+
+Usage:
+    python -m pytest tests/test_incremental.py
+"""
+
+import json
+import time
+
+import pytest
+
+from tests.test_corpus import JUANS, WORKS, juan_html
+from tools.cebta import _corpus
+from tools.cebta._corpus import CorpusIndex, read_manifest
+from tools.cebta import _importer
+from tools.cebta._importer import build_index, compact, plan_merge, update_index, wait_compaction
+
+
+def write_source(source, juans) -> None:
+    (source / "juans").mkdir(parents=True, exist_ok=True)
+    (source / "works.jsonl").write_text(
+        "\n".join(json.dumps(w, ensure_ascii=False) for w in WORKS), encoding="utf-8")
+    for (work, juan), lines in juans.items():
+        path = source / "juans" / work / f"{juan:03d}.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(juan_html(lines), encoding="utf-8")
+
+
+def hits(index: CorpusIndex, term: str) -> dict:
+    return {(seg.docs[doc].work, seg.docs[doc].juan): n for seg, doc, n in index.count(term)}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    source, root = tmp_path / "source", tmp_path / "index"
+    write_source(source, JUANS)
+    build_index(source, root)
+    return source, root
+
+
+def edit(source) -> None:
+    """改一卷、加一卷、刪一卷。"""
+    write_source(source, {
+        ("T0270", 1): [("T09n0270_p0290a01", "擊大法鼓吹大法螺"), ("T09n0270_p0290a02", "法鼓法鼓法鼓")],
+        ("X0001", 2): [("X01n0001_p0002a01", "新增法鼓卷")],
+    })
+    (source / "juans" / "T0270" / "002.html").unlink()
+
+
+def test_update_reindexes_only_changed_juans(corpus):
+    source, root = corpus
+    before = read_manifest(root)
+    edit(source)
+    stats = update_index(source, root, compact_after=False)
+    assert (stats["added"], stats["changed"], stats["removed"], stats["hashed"]) == (1, 1, 1, 2)
+
+    manifest = read_manifest(root)
+    assert manifest["generation"] == before["generation"] + 1
+    assert len(manifest["segments"]) == 2
+    assert manifest["sizes"][manifest["segments"][1]] == 2
+    index = CorpusIndex(root)
+    assert hits(index, "法鼓") == {("T0270", 1): 4, ("X0001", 1): 2, ("X0001", 2): 1}
+    assert hits(index, "如是我聞") == {}
+    assert index.num_docs == 3
+    assert [seg.docs[doc].juan for seg, doc in index.docs_for_work("T0270")] == [1]
+
+    # 沒有變動時不讀檔、不產生新 segment
+    again = update_index(source, root, compact_after=False)
+    assert (again["added"], again["changed"], again["removed"], again["hashed"]) == (0, 0, 0, 0)
+    assert read_manifest(root)["segments"] == manifest["segments"]
+
+
+def test_compaction_drops_tombstones_and_keeps_results(corpus):
+    source, root = corpus
+    edit(source)
+    update_index(source, root, compact_after=False)
+    expected = hits(CorpusIndex(root), "法鼓")
+
+    manifest = read_manifest(root)
+    assert plan_merge(manifest, max_segments=8) == [manifest["segments"][0]]  # 2/3 卷已刪除
+    assert compact(root, max_segments=1) == manifest["segments"]
+
+    merged = read_manifest(root)
+    assert len(merged["segments"]) == 1 and merged["deleted"] == {}
+    assert {e["segment"] for e in merged["juans"].values()} == set(merged["segments"])
+    index = CorpusIndex(root)
+    assert hits(index, "法鼓") == expected
+    for key, entry in merged["juans"].items():
+        d = index.segments[0].docs[entry["doc"]]
+        assert f"{d.work}/{d.juan}" == key
+    # 被合併的舊目錄留到下次寫入才刪除
+    assert (root / manifest["segments"][0]).exists()
+    stats = update_index(source, root)
+    assert not (root / manifest["segments"][0]).exists()
+    assert stats["compaction"].startswith("cbeta-compact-")
+    wait_compaction(root)
+
+
+def test_update_during_compaction_aborts_merge(corpus, monkeypatch):
+    """合併不持有寫入鎖：期間的更新照常完成，被選中的 segment 有新 tombstone 時放棄合併。"""
+    source, root = corpus
+    edit(source)
+    update_index(source, root, compact_after=False)
+    before = read_manifest(root)
+    merge = _importer.merge_segments
+
+    def merge_then_update(*args, **kwargs):
+        mappings = merge(*args, **kwargs)
+        (source / "juans" / "X0001" / "002.html").unlink()
+        (source / "juans" / "T0270" / "001.html").unlink()
+        update_index(source, root, compact_after=False)
+        return mappings
+
+    monkeypatch.setattr(_importer, "merge_segments", merge_then_update)
+    assert compact(root, max_segments=1) == []
+    after = read_manifest(root)
+    # 更新刪光了第二個 segment 的卷；合併結果未寫入 manifest
+    assert after["generation"] == before["generation"] + 1 and after["segments"] == before["segments"][:1]
+    assert not list(root.glob(".compact-*"))
+    assert hits(CorpusIndex(root), "法鼓") == {("X0001", 1): 2}
+
+
+def test_readers_reload_in_background(corpus, monkeypatch):
+    source, root = corpus
+    monkeypatch.setattr(_corpus, "INDEX_DIR", str(root))
+    monkeypatch.setattr(_corpus, "RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(_corpus, "_index", None)
+    monkeypatch.setattr(_corpus, "_index_loaded", False)
+    monkeypatch.setattr(_corpus, "_manifest_mtime", None)
+    old = _corpus.get_index()
+    assert hits(old, "如是我聞") == {("T0270", 2): 1}
+
+    edit(source)
+    update_index(source, root, compact_after=False)
+    _corpus.get_index()  # 觸發背景載入，不等待
+    deadline = time.monotonic() + 5
+    while _corpus.get_index() is old and time.monotonic() < deadline:
+        time.sleep(0.01)
+    new = _corpus.get_index()
+    assert new is not old and hits(new, "如是我聞") == {}
+    # 未變動的 segment 沿用已載入的資料
+    assert new.segments[0].texts is old.segments[0].texts
+    assert new.segments[0].deleted and not old.segments[0].deleted
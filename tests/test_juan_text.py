@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Juan HTML Extraction Tests
+
+Offline checks for the HTML → plain text / lines pipeline used by
+get_juan_html and get_cbeta_lines. No network access required.
+
+Usage:
+    python -m pytest tests/test_juan_text.py
+"""
+
+from tools.cebta._juan_text import extract_html, validate_output_options
+
+
+SAMPLE_HTML = """<div id='body'>
+<p class='juan'><span class='lb' id='T01n0001_p0001a01'>T01n0001_p0001a01</span>長阿含經序</p>
+<p><span class='lb' id='T01n0001_p0001a04'></span><a class="noteAnchor" href="#n0001002"></a>長安釋僧肇述
+<span class='lb' id='T01n0001_p0001a05'></span>夫宗極絕於稱謂。</p>
+</div>
+<div id='back'><span class='footnote' id='n0001002'>〔長安〕－【宋】</span></div>"""
+
+
+def test_lines_keep_lineheads_and_drop_markup():
+    lines = extract_html(SAMPLE_HTML).render("lines", "none")["lines"]
+    assert [line["linehead"] for line in lines] == [
+        "T01n0001_p0001a01", "T01n0001_p0001a04", "T01n0001_p0001a05",
+    ]
+    assert lines[0]["text"] == "長阿含經序"
+    assert "<" not in "".join(line["text"] for line in lines)
+
+
+def test_note_modes():
+    juan_text = extract_html(SAMPLE_HTML)
+    separate = juan_text.render("text", "separate")
+    assert separate["notes"] == {"0001002": "〔長安〕－【宋】"}
+    assert "〔長安〕" not in separate["text"]
+
+    inline = juan_text.render("text", "inline")
+    assert "（注：〔長安〕－【宋】）長安釋僧肇述" in inline["text"]
+    assert "notes" not in inline
+
+
+def test_paragraphs_join_lines():
+    paragraphs = extract_html(SAMPLE_HTML).render("paragraphs", "none")["paragraphs"]
+    assert paragraphs[1] == {"linehead": "T01n0001_p0001a04", "text": "長安釋僧肇述夫宗極絕於稱謂。"}
+
+
+def test_lines_api_notes_are_merged():
+    line_text = extract_html(
+        '<a class="noteAnchor" href="#n0001003"></a>述',
+        notes={"0001003": "〔述〕－【宋】"},
+        linehead="T01n0001_p0001a04",
+    )
+    assert line_text.render("lines", "separate")["lines"][0] == {
+        "linehead": "T01n0001_p0001a04", "text": "述", "notes": ["0001003"],
+    }
+
+
+def test_validate_output_options():
+    assert validate_output_options("text", "inline") is None
+    assert validate_output_options("markdown", "inline")
+    assert validate_output_options("text", "footnote")
+
+
+def test_window_slices_whole_lines_and_returns_cursor():
+    juan_text = extract_html(SAMPLE_HTML)
+    texts, offsets = juan_text.line_index("none")
+    assert offsets[-1] == sum(len(t) for t in texts)
+
+    start, end, next_cursor = juan_text.window("none", max_chars=12)
+    assert (start, end) == (0, 2)
+    assert next_cursor == offsets[2]
+
+    start, end, next_cursor = juan_text.window("none", max_chars=12, cursor=next_cursor)
+    assert (start, end, next_cursor) == (2, 3, None)
+    assert juan_text.render("text", "none", start, end)["text"] == "夫宗極絕於稱謂。"
+
+
+def test_window_from_linehead_always_advances():
+    juan_text = extract_html(SAMPLE_HTML)
+    start, end, _ = juan_text.window("none", max_chars=1, linehead="T01n0001_p0001a04")
+    assert (start, end) == (1, 2)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Local KWIC Engine Tests
+
+Index a two-juan work (one juan with an inline note) and check multi-juan
+KWIC extraction, f/b/location ordering, juan ranges and the note switch;
+check cbeta_kwic_search answers from the index with offloading forced on and
+caps remote batches at works × juans. No network access required.
+
+Usage:
+    python -m pytest tests/test_kwic.py
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastmcp import Client
+
+import main
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex
+from tools.cebta._importer import build_index
+from tools.cebta._kwic import find_hits, iter_kwic, parse_juan_ranges
+from tools.cebta.search import kwic_search
+
+
+JUANS = {
+    1: "<p><span class='lb' id='T08n0220_p0001a01'></span>般若甲乙般若丙丁"
+       "<span class='lb' id='T08n0220_p0001a02'></span>戊般若己<span class='doube-line-note'>（般若注）</span>庚</p>",
+    2: "<p><span class='lb' id='T08n0220_p0005b07'></span>子般若丑</p>",
+}
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> CorpusIndex:
+    root = tmp_path_factory.mktemp("cbeta-kwic")
+    source = root / "source"
+    (source / "juans" / "T0220").mkdir(parents=True)
+    (source / "works.jsonl").write_text(json.dumps({"work": "T0220", "vol": "T08"}), encoding="utf-8")
+    for juan, html in JUANS.items():
+        (source / "juans" / "T0220" / f"{juan:03d}.html").write_text(html, encoding="utf-8")
+    build_index(source, root / "index")
+    return CorpusIndex(root / "index")
+
+
+def kwics(index, **kwargs):
+    return [r["kwic"] for r in iter_kwic(index, ["T0220"], "般若", around=1, **kwargs)]
+
+
+def test_location_order_spans_juans(index):
+    lines = list(iter_kwic(index, ["T0220"], "般若", sort="location", around=1))
+    assert [(r["juan"], r["lb"]) for r in lines] == [
+        (1, "0001a01"), (1, "0001a01"), (1, "0001a02"), (1, "0001a02"), (2, "0005b07"),
+    ]
+    assert lines[0]["vol"] == "T08"
+
+
+def test_front_and_back_sorting(index):
+    # 依關鍵詞後文（丑 < 丙 < 己 < 注 < 甲）
+    assert kwics(index, sort="f") == ["子般若丑", "乙般若丙", "戊般若己", "（般若注", "般若甲"]
+    # 依關鍵詞前文反向（卷首的空前文最小，其次 乙 < 子 < 戊 < （）
+    assert kwics(index, sort="b") == ["般若甲", "乙般若丙", "子般若丑", "戊般若己", "（般若注"]
+
+
+def test_note_switch_excludes_inline_notes(index):
+    assert len(find_hits(index, ["T0220"], None, "般若", note=False)) == 4
+    lines = list(iter_kwic(index, ["T0220"], "般若", sort="location", around=2, note=False))
+    assert lines[2]["kwic"] == "丁戊般若己庚"
+    assert lines[2]["linehead"] == "T08n0220_p0001a02"
+
+
+def test_juan_ranges_and_mark(index):
+    assert parse_juan_ranges("2, 5-3") == [(2, 2), (3, 5)]
+    with pytest.raises(ValueError):
+        parse_juan_ranges("1-")
+    lines = list(iter_kwic(index, ["T0220"], "般若", ranges=[(2, 2)], mark=True, around=1))
+    assert [r["kwic"] for r in lines] == ["子<mark>般若</mark>丑"]
+
+
+def call_kwic(**args) -> dict:
+    async def go():
+        async with Client(main.mcp) as client:
+            return json.loads((await client.call_tool("cbeta_kwic_search", args)).content[0].text)
+    return asyncio.run(go())
+
+
+def test_tool_offloads_local_scan(index, monkeypatch):
+    monkeypatch.setattr(kwic_search, "get_index", lambda: index)
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    before = _offload.stats()["offloaded"]
+    data = call_kwic(work="T0220", q="般若", sort="location", rows=2, select="num_found,results.juan")
+    assert data["result"] == {"num_found": 5, "results": [{"juan": 1}, {"juan": 1}]}
+    assert _offload.stats()["offloaded"] == before + 1
+
+
+def test_remote_batch_is_capped(monkeypatch):
+    monkeypatch.setattr(kwic_search, "get_index", lambda: None)
+    data = call_kwic(work="T0220,T0223", juans="1-30", q="般若")
+    assert data["status"] == "error" and "50" in data["message"]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Local Notes Index Tests
+
+Index a tiny juan with footnotes and inline notes, then check the local
+search_cbeta_notes engine (query syntax, highlight, paging, facets) and the
+per-line notes lookup used by get_cbeta_lines; check the tool runs the
+local scan through _offload and that live notes follow tombstones.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_notes.py
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastmcp import Client
+
+import main
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex
+from tools.cebta._importer import build_index
+from tools.cebta._notes import highlight, search_notes
+from tools.cebta._query import QuerySyntaxError
+from tools.cebta.search import search_notes as search_notes_tool
+
+
+JUAN_HTML = """<div id='body'><p>
+<span class='lb' id='T09n0270_p0290a01'></span>擊大法鼓<a class='noteAnchor' href='#n0290001'></a>吹大法螺
+<span class='lb' id='T09n0270_p0290a02'></span>法鼓音聲<span class='doube-line-note'>（法鼓喻說法也）</span>遍至十方<a class='noteAnchor' href='#n0290002'></a>
+</p></div>
+<div id='back'>
+<span class='footnote' id='n0290001'>鼓＝皷【宋】【元】【明】</span>
+<span class='footnote' id='n0290002'>方＋（界）【宮】</span>
+</div>"""
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> CorpusIndex:
+    root = tmp_path_factory.mktemp("cbeta-notes")
+    source = root / "source"
+    (source / "juans" / "T0270").mkdir(parents=True)
+    (source / "works.jsonl").write_text(json.dumps(
+        {"work": "T0270", "title": "大法鼓經", "canon": "T", "category": "法華部類", "creators": "求那跋陀羅"},
+        ensure_ascii=False), encoding="utf-8")
+    (source / "juans" / "T0270" / "001.html").write_text(JUAN_HTML, encoding="utf-8")
+    stats = build_index(source, root / "index")
+    assert stats["notes"] == 3
+    return CorpusIndex(root / "index")
+
+
+def test_footnotes_and_inline_notes_are_indexed(index):
+    docs = search_notes(index, '"【宋】" | "說法"')["response"]["docs"]
+    assert {(d["note_place"], d["note_id"], d["linehead"]) for d in docs} == {
+        ("foot", "0290001", "T09n0270_p0290a01"),
+        ("inline", None, "T09n0270_p0290a02"),
+    }
+
+
+def test_not_near_and_paging(index):
+    assert search_notes(index, '"【元】" !"【明】"')["response"]["numFound"] == 0
+    assert search_notes(index, '"皷" NEAR/3 "【元】"')["response"]["numFound"] == 1
+    page = search_notes(index, '"】"', rows=1, start=1)["response"]
+    assert (page["numFound"], len(page["docs"]), page["start"]) == (2, 1, 1)
+    with pytest.raises(QuerySyntaxError):
+        search_notes(index, '"法鼓"~3')
+
+
+def test_facets_count_notes(index):
+    facets = search_notes(index, '"】"', facet=1)["facets"]
+    assert facets["work"] == [{"value": "T0270", "count": 2}]
+    assert facets["creator"] == [{"value": "求那跋陀羅", "count": 2}]
+
+
+def test_highlight_window():
+    assert highlight("一二三四法鼓五六七八", ["法鼓"], 2) == "...三四<mark>法鼓</mark>五六..."
+
+
+def test_notes_for_line(index):
+    assert index.notes_for_line("T09n0270_p0290a02") == {"0290002": "方＋（界）【宮】"}
+    assert index.notes_for_line("T09n0270_p0290a03") is None
+
+
+def test_tool_offloads_local_scan(index, monkeypatch):
+    monkeypatch.setattr(search_notes_tool, "get_index", lambda: index)
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    before = _offload.stats()["offloaded"]
+
+    async def go():
+        async with Client(main.mcp) as client:
+            result = await client.call_tool("search_cbeta_notes", {"q": '"】"', "select": "response.numFound"})
+            return json.loads(result.content[0].text)
+
+    assert asyncio.run(go())["result"] == {"response": {"numFound": 2}}
+    assert _offload.stats()["offloaded"] == before + 1
+
+
+def test_live_notes_follow_tombstones(index):
+    seg = index.segments[0]
+    assert seg.live_notes() is seg.live_notes() and len(seg.live_notes()) == 3
+    assert seg.with_deleted(frozenset({0})).live_notes() == []
+    assert len(seg.live_notes()) == 3
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Offload Tests
+
+Check small jobs stay on the event loop and large ones move to the pool,
+the loop keeps ticking while a large CPU-bound job runs, queue depth is
+reported when the pool is saturated, the process pool variant works,
+local=True jobs stay in a thread even with the process pool, and
+get_juan_html / extended_search still answer with offloading forced on.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_offload.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.bench_tools import SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http, _offload
+from tools.cebta._replay import ReplayTransport, load_exchanges
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(_offload, "_pool", None)
+    monkeypatch.setattr(_offload, "max_queued", 0)
+    yield
+    _offload.shutdown()
+
+
+def thread_name(_: bytes) -> str:
+    return threading.current_thread().name
+
+
+def burn(seconds: float) -> int:
+    deadline, n = time.perf_counter() + seconds, 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+def test_threshold_picks_inline_or_pool(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 1000)
+    small = asyncio.run(_offload.run(thread_name, b"x", size=10))
+    large = asyncio.run(_offload.run(thread_name, b"x" * 2000, size=2000))
+    assert small == "MainThread" and large.startswith("cbeta-offload")
+
+
+def test_loop_keeps_ticking_during_large_job(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+
+    async def go():
+        gaps, stop = [], asyncio.Event()
+
+        async def ticker():
+            last = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        task = asyncio.create_task(ticker())
+        await _offload.run(burn, 0.3, size=1)
+        stop.set()
+        await task
+        return gaps
+
+    gaps = asyncio.run(go())
+    assert len(gaps) > 10 and max(gaps) < 0.1
+
+
+def test_queue_depth_when_saturated(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    monkeypatch.setattr(_offload, "WORKERS", 1)
+
+    async def go():
+        jobs = [asyncio.create_task(_offload.run(time.sleep, 0.1, size=1)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        depth = _offload.stats()["queue_depth"]
+        await asyncio.gather(*jobs)
+        return depth
+
+    assert asyncio.run(go()) == 2
+    stats = _offload.stats()
+    assert stats["max_queue_depth"] == 2 and stats["queue_depth"] == 0
+    assert stats["wait_p99_ms"] >= 150
+
+
+def test_process_pool(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    monkeypatch.setattr(_offload, "POOL_KIND", "process")
+    payload = json.dumps({"results": list(range(1000))}).encode()
+    assert asyncio.run(_offload.run(_http.loads, payload, size=len(payload))) == {"results": list(range(1000))}
+
+
+def test_local_jobs_stay_in_threads(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    monkeypatch.setattr(_offload, "POOL_KIND", "process")
+    unpicklable = threading.Lock()
+    assert asyncio.run(_offload.run(thread_name, unpicklable, size=1, local=True)).startswith("cbeta-offload")
+
+
+def test_tools_with_offload_forced(pool, monkeypatch):
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    transport = ReplayTransport(load_exchanges(DEFAULT_FIXTURES), scale=0, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    _http.response_cache.clear()
+    before = _offload.stats()["offloaded"]
+
+    async def go():
+        async with Client(main.mcp) as client:
+            calls = [("extended_search", {**SCENARIOS["extended_search"], "select": "total"}),
+                     ("get_juan_html", {**SCENARIOS["get_juan_html"], "format": "lines", "select": "num_found"})]
+            return [json.loads((await client.call_tool(name, args)).content[0].text) for name, args in calls]
+
+    extended, juan = asyncio.run(go())
+    _http.response_cache.clear()
+    assert extended["status"] == juan["status"] == "success"
+    assert set(extended["result"]) == {"total"} and juan["result"] == {"num_found": 1}
+    assert _offload.stats()["offloaded"] - before >= 3  # extended 解碼 + juan 解碼 + HTML 解析
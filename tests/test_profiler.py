@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Sampling Profiler / Event Loop Monitor Tests
+
+Profile a busy worker thread and check its frames show up in the collapsed
+stacks, block the event loop inside a tagged tool task and check the stall
+is recorded with the tool name and the blocking frame, and check the admin
+routes stay hidden without CBETA_ADMIN_TOKEN. No network access required.
+
+Usage:
+    python -m pytest tests/test_profiler.py
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+
+import main
+from tools.cebta import _profiler
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def block_loop_for(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def test_profile_samples_worker_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        stacks, rounds = _profiler.profile(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert rounds > 5
+    busy = [s for s in stacks if s.startswith("busy-worker;")]
+    assert busy and all("tests.test_profiler:spin" in s.split(";") for s in busy)
+    line = _profiler.collapsed(stacks).splitlines()[0]
+    assert int(line.rsplit(" ", 1)[1]) >= 1
+
+
+def test_loop_stall_is_attributed_to_tool(capsys):
+    async def go():
+        monitor = _profiler.LoopMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+
+        async def tool_call(context):
+            await asyncio.sleep(0.03)
+            block_loop_for(0.3)
+
+        middleware = _profiler.TaskTagMiddleware()
+        await asyncio.create_task(middleware.on_call_tool(SimpleNamespace(message=SimpleNamespace(name="slow_tool")), tool_call))
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(go())
+    (stall,) = monitor.stalls
+    assert stall["tool"] == "slow_tool" and stall["lag_ms"] >= 200
+    assert stall["stack"].endswith("tests.test_profiler:block_loop_for")
+    assert "slow_tool" in capsys.readouterr().out
+    assert monitor.stats()["lag_max_ms"] >= 200
+
+
+def test_admin_routes_require_token(monkeypatch):
+    async def get(path, headers=None):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    monkeypatch.delenv("CBETA_ADMIN_TOKEN", raising=False)
+    assert asyncio.run(get("/admin/profile?seconds=0.05")).status_code == 404
+    monkeypatch.setenv("CBETA_ADMIN_TOKEN", "secret")
+    assert asyncio.run(get("/admin/profile?seconds=0.05")).status_code == 401
+    response = asyncio.run(get("/admin/profile?seconds=0.1", {"Authorization": "Bearer secret"}))
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.folded"')
+    assert "MainThread;" in response.text
+    assert asyncio.run(get("/admin/profile?seconds=999", {"Authorization": "Bearer secret"})).status_code == 422
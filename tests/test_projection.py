@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Response Projection Tests
+
+Offline checks for the field selector applied by every tool's `select`
+parameter. No network access required.
+
+Usage:
+    python -m pytest tests/test_projection.py
+"""
+
+import pytest
+
+from tools.cebta._projection import project
+
+
+SAMPLE = {
+    "num_found": 2,
+    "results": [
+        {"work": "T0270", "title": "大法鼓經", "kwics": {"num_found": 31, "results": [{"kwic": "..."}]},
+         "places": [{"name": "長安"}]},
+        {"work": "T0001", "title": "長阿含經", "kwics": {"num_found": 2, "results": []}},
+    ],
+}
+
+
+def test_include_paths_descend_into_lists():
+    assert project(SAMPLE, "num_found,results.work") == {
+        "num_found": 2,
+        "results": [{"work": "T0270"}, {"work": "T0001"}],
+    }
+
+
+def test_exclude_paths_drop_subtrees():
+    out = project(SAMPLE, "-results.kwics,-results.places")
+    assert out["results"][0] == {"work": "T0270", "title": "大法鼓經"}
+    assert out["num_found"] == 2
+
+
+def test_jsonpath_style_and_wildcard():
+    assert project(SAMPLE, "$.results[*].kwics.num_found") == {
+        "results": [{"kwics": {"num_found": 31}}, {"kwics": {"num_found": 2}}],
+    }
+    assert project({"facet": {"canon": [1], "dynasty": [2]}}, "facet.*") == {"facet": {"canon": [1], "dynasty": [2]}}
+
+
+def test_fill_missing_and_empty_selector():
+    assert project({"a": 1}, "a,b", fill_missing=True) == {"a": 1, "b": None}
+    assert project(SAMPLE, None) is SAMPLE
+
+
+def test_invalid_path():
+    with pytest.raises(ValueError):
+        project(SAMPLE, "results..work")
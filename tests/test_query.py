@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Query Canonicalization Tests
+
+Offline checks that equivalent queries share one cache key and that smaller
+pages are served from an already-cached larger page; single_term picks out
+queries the local engines can answer.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_query.py
+"""
+
+import asyncio
+
+import httpx
+
+from tools.cebta import _http, _metrics
+from tools.cebta._query import cache_key, canonical_query, page_key, single_term
+
+
+def test_and_or_terms_are_sorted_and_deduplicated():
+    assert canonical_query('"聖嚴"   "法鼓"') == canonical_query('"法鼓" "聖嚴" "法鼓"') == '"法鼓" "聖嚴"'
+    assert canonical_query('"波羅蜜"|"波羅密"') == '"波羅密" | "波羅蜜"'
+    assert canonical_query('-"A" "B"') == '"B" !"A"'
+
+
+def test_or_binds_tighter_than_and():
+    assert canonical_query('"c" "b" | "a"') == '"a" | "b" "c"'
+    assert canonical_query('"a" | ("c" "b")') == '"a" | ("b" "c")'
+    assert canonical_query('"法鼓" NEAR/7 "迦葉"') == '"法鼓" NEAR/7 "迦葉"'
+
+
+def test_unparsable_query_is_only_trimmed():
+    assert canonical_query(' "unterminated ') == '"unterminated'
+
+
+def test_single_term():
+    assert single_term("法鼓") == single_term('"法鼓"') == "法鼓"
+    assert single_term('"法鼓" "聖嚴"') is None
+    assert single_term('"法鼓"~3') is None and single_term('"unterminated') is None
+
+
+def test_defaults_and_blank_params_are_dropped():
+    assert cache_key("/search", {"q": "法鼓", "start": 0, "rows": 20, "order": None}) == \
+        cache_key("/search", {"rows": "20", "q": " 法鼓 "})
+    assert page_key("/search/kwic", {"q": "法鼓", "rows": 10}) is None
+
+
+def test_literal_queries_are_not_reordered():
+    # 一般全文檢索不解析擴充語法，字面不同的查詢不可共用快取
+    assert cache_key("/search", {"q": '"聖嚴" "法鼓"'}) != cache_key("/search", {"q": '"法鼓" "聖嚴"'})
+    assert cache_key("/search/extended", {"q": '"聖嚴"  "法鼓"'}) == cache_key("/search/extended", {"q": '"法鼓" "聖嚴"'})
+
+
+def test_smaller_page_served_from_larger_page():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        start = int(request.url.params.get("start", 0))
+        rows = int(request.url.params["rows"])
+        results = [{"id": i} for i in range(start, min(start + rows, 25))]
+        return httpx.Response(200, json={"num_found": 25, "results": results})
+
+    async def run():
+        _http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        _http.response_cache.clear()
+        _metrics.counters.clear()
+        try:
+            await _http.get_json("/search/extended", {"q": '"法鼓" "聖嚴"', "start": 0, "rows": 20})
+            inner = await _http.get_json("/search/extended", {"q": '"聖嚴"  "法鼓"', "start": 5, "rows": 10})
+            await _http.get_json("/search/extended", {"q": '"法鼓" "聖嚴"', "start": 20, "rows": 20})
+            tail = await _http.get_json("/search/extended", {"q": '"法鼓" "聖嚴"', "start": 22, "rows": 5})
+            outside = await _http.get_json("/search/extended", {"q": '"法鼓" "聖嚴"', "start": 15, "rows": 10})
+        finally:
+            await _http.close_client()
+        return inner, tail, outside
+
+    inner, tail, outside = asyncio.run(run())
+    assert [r["id"] for r in inner["results"]] == list(range(5, 15))
+    assert [r["id"] for r in tail["results"]] == [22, 23, 24]
+    assert [r["id"] for r in outside["results"]] == list(range(15, 25))
+    assert len(requests) == 3
+    stats = _http.cache_stats()
+    assert (stats["page_hits"], stats["misses"]) == (2, 3)
+    assert stats["hit_rate"] > stats["baseline_hit_rate"]
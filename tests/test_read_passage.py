@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Read Passage Tests
+
+Check cbeta_read_passage answers a citation with title, byline, the
+surrounding lines and notes, issues its upstream lookups concurrently
+(wall time close to one round trip, not two), shares the response cache
+with get_cbeta_work_info, and rejects malformed lineheads. Runs against
+recorded responses; no network access required.
+
+Usage:
+    python -m pytest tests/test_read_passage.py
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http
+from tools.cebta._replay import ReplayTransport, load_exchanges
+from tools.cebta.work.read_passage import work_of_linehead
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = ReplayTransport(load_exchanges(DEFAULT_FIXTURES), scale=4, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    _http.response_cache.clear()
+    yield transport
+    _http.response_cache.clear()
+
+
+def call(*calls):
+    async def go():
+        async with Client(main.mcp) as client:
+            return [json.loads((await client.call_tool(name, args)).content[0].text) for name, args in calls]
+    return asyncio.run(go())
+
+
+def test_work_of_linehead():
+    assert work_of_linehead("T01n0001_p0066c25") == "T0001"
+    assert work_of_linehead("T03n0150A_p0875a01") == "T0150A"
+    assert work_of_linehead("J01nA042_p0793a01") == "JA042"
+    assert work_of_linehead("X0600") is None
+
+
+def test_read_passage_in_one_call(transport):
+    started = time.perf_counter()
+    (passage,) = call(("cbeta_read_passage", {"linehead": "T01n0001_p0001a04"}))
+    elapsed = time.perf_counter() - started
+    result = passage["result"]
+    assert result["title"] == "長阿含經" and result["byline"] == "後秦 佛陀耶舍共竺佛念譯"
+    assert result["url"] == "https://cbetaonline.cn/zh/T01n0001_p0001a04"
+    assert [line["linehead"][-3:] for line in result["lines"]] == ["a02", "a03", "a04", "a05", "a06"]
+    assert [line.get("target", False) for line in result["lines"]] == [False, False, True, False, False]
+    assert result["notes"]["0001000"] == "〔長安〕－【宋】"
+    assert transport.replayed == 2
+    assert elapsed < 0.35  # 兩個查詢各 0.2 秒，同時進行
+
+    (info,) = call(("get_cbeta_work_info", {"work": "T0001", "select": "title"}))
+    assert info["result"] == {"title": "長阿含經"} and transport.replayed == 2
+
+
+def test_read_passage_rejects_bad_input(transport):
+    bad, wide = call(("cbeta_read_passage", {"linehead": "T0001"}),
+                     ("cbeta_read_passage", {"linehead": "T01n0001_p0001a04", "after": 500}))
+    assert bad["status"] == wide["status"] == "error"
+    assert transport.replayed == 0
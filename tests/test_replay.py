@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Record / Replay Transport Tests
+
+Record exchanges from a mock upstream (plain JSON and a gzip-encoded body)
+to a compressed fixture file, replay them without the upstream and check
+the bodies come back byte-for-byte, repeated requests replay in order,
+misses raise in strict mode and delays follow the time scale; every
+benchmark scenario must replay strictly from tests/fixtures. No network
+access required.
+
+Usage:
+    python -m pytest tests/test_replay.py
+"""
+
+import asyncio
+import gzip
+import json
+import time
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.bench_tools import NEEDS_INDEX, SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http, _replay
+from tools.cebta._replay import RecordingTransport, ReplayMiss, ReplayTransport, load_exchanges
+
+BASE = "https://api.example.org/v1"
+PAGE = gzip.compress("<div>如是我聞</div>".encode("utf-8"), mtime=0)
+
+
+def upstream(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/juans":
+        return httpx.Response(200, headers={"content-encoding": "gzip", "content-type": "text/html"}, content=PAGE)
+    hits = upstream.calls = getattr(upstream, "calls", 0) + 1
+    return httpx.Response(200, json={"q": request.url.params["q"], "call": hits})
+
+
+def fetch_all(transport: httpx.AsyncBaseTransport, requests: list[tuple[str, dict]]) -> list[httpx.Response]:
+    async def go():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return [await client.get(f"{BASE}{path}", params=params) for path, params in requests]
+    return asyncio.run(go())
+
+
+REQUESTS = [("/search", {"q": "法鼓", "rows": 20}), ("/juans", {"work": "T0001", "juan": 1}),
+            ("/search", {"rows": 20, "q": "法鼓"})]
+
+
+def test_replay_is_byte_exact(tmp_path):
+    fixture = tmp_path / "rec.jsonl.gz"
+    upstream.calls = 0
+    recording = RecordingTransport(httpx.MockTransport(upstream), fixture, base=BASE)
+    live = fetch_all(recording, REQUESTS)
+    assert recording.recorded == 3
+
+    exchanges = load_exchanges(fixture)
+    assert [e["request"]["path"] for e in exchanges] == ["/search", "/juans", "/search"]
+    assert "body_b64" in exchanges[1]["response"] and "body" in exchanges[0]["response"]
+
+    replay = ReplayTransport(exchanges, scale=0, base=BASE)
+    replayed = fetch_all(replay, REQUESTS)
+    for a, b in zip(live, replayed):
+        assert (a.status_code, a.content, a.headers.get("content-type")) == \
+               (b.status_code, b.content, b.headers.get("content-type"))
+    assert replayed[1].text == "<div>如是我聞</div>"
+    # 同一請求依錄製順序重播，之後重複最後一筆
+    assert [replayed[0].json()["call"], replayed[2].json()["call"]] == [1, 2]
+    assert fetch_all(ReplayTransport(exchanges, scale=0, base=BASE), REQUESTS[:1] * 3)[-1].json()["call"] == 2
+
+
+def test_strict_miss_and_path_fallback():
+    exchanges = [{"request": {"method": "GET", "path": "/search", "params": [["q", "法鼓"]]},
+                  "response": {"status": 200, "headers": {}, "body": "{}"}, "elapsed": 0}]
+    with pytest.raises(ReplayMiss):
+        fetch_all(ReplayTransport(exchanges, base=BASE), [("/search", {"q": "般若"})])
+    assert fetch_all(ReplayTransport(exchanges, strict=False, base=BASE), [("/search", {"q": "般若"})])[0].text == "{}"
+
+
+def test_time_scale():
+    exchanges = [{"request": {"method": "GET", "path": "/works", "params": []},
+                  "response": {"status": 200, "headers": {}, "body": "{}"}, "elapsed": 0.2}]
+
+    def timed(scale):
+        started = time.perf_counter()
+        fetch_all(ReplayTransport(exchanges, scale=scale, base=BASE), [("/works", {})])
+        return time.perf_counter() - started
+
+    assert timed(0.5) >= 0.1
+    assert timed(0) < 0.1
+
+
+def test_shared_client_uses_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("CBETA_HTTP_REPLAY", str(tmp_path / "x.jsonl"))
+    (tmp_path / "x.jsonl").write_text("", encoding="utf-8")
+    monkeypatch.setattr(_http, "_client", None)
+    client = _http.get_client()
+    assert isinstance(client._transport, ReplayTransport)
+    monkeypatch.delenv("CBETA_HTTP_REPLAY")
+    monkeypatch.setenv("CBETA_HTTP_RECORD", str(tmp_path / "y.jsonl.gz"))
+    assert isinstance(_replay.transport_from_env(_http.API_BASE, httpx.Limits()), RecordingTransport)
+
+
+def test_every_scenario_replays_strictly(monkeypatch, tmp_path):
+    monkeypatch.setenv("CBETA_EXPORT_DIR", str(tmp_path))
+    transport = ReplayTransport(load_exchanges(DEFAULT_FIXTURES), scale=0, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    _http.response_cache.clear()
+
+    async def go():
+        async with Client(main.mcp) as client:
+            for name in sorted(set(SCENARIOS) - NEEDS_INDEX):
+                result = await client.call_tool(name, SCENARIOS[name])
+                assert json.loads(result.content[0].text)["status"] == "success", name
+
+    asyncio.run(go())
+    _http.response_cache.clear()
+    assert transport.replayed >= len(SCENARIOS) - len(NEEDS_INDEX)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cache Revalidation Tests
+
+Serve /works/toc from an httpx.MockTransport that honours If-None-Match and
+If-Modified-Since, let the cached response expire, and check that get_raw
+revalidates with the stored ETag / Last-Modified: a 304 refreshes the cache
+with the old body, a 200 replaces it, a failed revalidation keeps the stale
+body for the next attempt, and responses without validators are refetched
+unconditionally. No network access required.
+
+Usage:
+    python -m pytest tests/test_revalidation.py
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tools.cebta import _http, _metrics
+
+PARAMS = {"work": "T0001"}
+
+
+class Upstream:
+    def __init__(self, etag: str | None = '"v1"', last_modified: str | None = None):
+        self.etag, self.last_modified = etag, last_modified
+        self.body = b'{"results": ["toc v1"]}'
+        self.requests: list[httpx.Request] = []
+        self.fail = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fail:
+            return httpx.Response(503)
+        headers = {k: v for k, v in (("ETag", self.etag), ("Last-Modified", self.last_modified)) if v}
+        if self.etag and request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(304, headers=headers)
+        if not self.etag and self.last_modified and request.headers.get("if-modified-since") == self.last_modified:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, headers=headers, content=self.body)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def use(**validators) -> Upstream:
+        server = Upstream(**validators)
+        monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(server.handle)))
+        monkeypatch.setattr(_http.response_cache, "ttl", 0.01)
+        return server
+    _http.response_cache.clear()
+    yield use
+    _http.response_cache.clear()
+
+
+def get_after_expiry() -> bytes:
+    async def go():
+        first = await _http.get_raw("/works/toc", PARAMS)
+        await _http.get_raw("/works/toc", PARAMS)  # 未過期：快取命中
+        await asyncio.sleep(0.02)
+        return first, await _http.get_raw("/works/toc", PARAMS)
+    return asyncio.run(go())
+
+
+def test_not_modified_reuses_cached_body(upstream):
+    server = upstream()
+    before = _metrics.counters["response_cache.revalidated"]
+    first, second = get_after_expiry()
+    assert second == first == server.body
+    assert len(server.requests) == 2
+    assert "if-none-match" not in server.requests[0].headers
+    assert server.requests[1].headers["if-none-match"] == '"v1"'
+    assert _metrics.counters["response_cache.revalidated"] == before + 1
+    assert _http.cache_key("/works/toc", PARAMS) in _http.response_cache
+    assert asyncio.run(_http.get_raw("/works/toc", PARAMS)) == first and len(server.requests) == 2
+
+
+def test_last_modified_only(upstream):
+    server = upstream(etag=None, last_modified="Wed, 01 Oct 2025 00:00:00 GMT")
+    get_after_expiry()
+    assert server.requests[1].headers["if-modified-since"] == server.last_modified
+    assert "if-none-match" not in server.requests[1].headers
+
+
+def test_changed_body_replaces_cache(upstream):
+    server = upstream()
+
+    async def go():
+        await _http.get_raw("/works/toc", PARAMS)
+        server.etag, server.body = '"v2"', b'{"results": ["toc v2"]}'
+        await asyncio.sleep(0.02)
+        return await _http.get_raw("/works/toc", PARAMS)
+
+    assert asyncio.run(go()) == server.body
+    assert server.requests[1].headers["if-none-match"] == '"v1"'
+    time.sleep(0.02)
+    asyncio.run(_http.get_raw("/works/toc", PARAMS))
+    assert server.requests[2].headers["if-none-match"] == '"v2"'
+
+
+def test_failed_revalidation_keeps_stale_entry(upstream):
+    server = upstream()
+
+    async def go():
+        first = await _http.get_raw("/works/toc", PARAMS)
+        await asyncio.sleep(0.02)
+        server.fail = True
+        with pytest.raises(httpx.HTTPStatusError):
+            await _http.get_raw("/works/toc", PARAMS)
+        server.fail = False
+        return first, await _http.get_raw("/works/toc", PARAMS)
+
+    first, second = asyncio.run(go())
+    assert second == first
+    assert server.requests[2].headers["if-none-match"] == '"v1"'
+    assert len(server.requests) == 3
+
+
+def test_without_validators_refetches(upstream):
+    server = upstream(etag=None)
+    get_after_expiry()
+    assert len(server.requests) == 2
+    assert not {"if-none-match", "if-modified-since"} & set(server.requests[1].headers)
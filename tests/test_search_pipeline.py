@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Search Pipeline Tests
+
+Check cbeta_search_pipeline ranks the top juans by term_hits, attaches KWIC
+and line context to each, streams one progress notification per finished
+juan, keeps concurrent upstream requests within the concurrency budget,
+range-checks kwic_rows and takes KWIC from the local index when it covers
+the juan. Runs against recorded responses; no network access required.
+
+Usage:
+    python -m pytest tests/test_search_pipeline.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastmcp import Client
+
+import main
+from tests.bench_tools import SCENARIOS
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http, _offload
+from tools.cebta._corpus import CorpusIndex
+from tools.cebta._importer import build_index
+from tools.cebta._replay import ReplayTransport, load_exchanges
+from tools.cebta.search import search_pipeline
+from tools.cebta.search.search_pipeline import kwic_linehead
+
+
+class CountingTransport(ReplayTransport):
+    """記錄同時進行中的最大請求數。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = self.max_in_flight = 0
+
+    async def handle_async_request(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = CountingTransport(load_exchanges(DEFAULT_FIXTURES), scale=0.2, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    _http.response_cache.clear()
+    yield transport
+    _http.response_cache.clear()
+
+
+def run_pipeline(**overrides):
+    progress = []
+
+    async def on_progress(done, total, message):
+        progress.append((done, total, json.loads(message)))
+
+    async def go():
+        async with Client(main.mcp) as client:
+            result = await client.call_tool("cbeta_search_pipeline", {**SCENARIOS["cbeta_search_pipeline"], **overrides},
+                                            progress_handler=on_progress)
+            return json.loads(result.content[0].text)
+
+    return asyncio.run(go()), progress
+
+
+def test_kwic_linehead():
+    assert kwic_linehead("T0270", "T09", "0290a05") == "T09n0270_p0290a05"
+    assert kwic_linehead("T0150A", "T03", "0875a01") == "T03n0150A_p0875a01"
+    assert kwic_linehead("T0270", None, "0290a05") is None
+
+
+def test_pipeline_streams_ranked_juans(transport):
+    response, progress = run_pipeline()
+    assert response["status"] == "success"
+    results = response["result"]["results"]
+    assert [(r["work"], r["term_hits"]) for r in results] == [("T0270", 31), ("T0271", 30)]
+    first = results[0]["kwics"][0]
+    assert first["linehead"] == "T09n0270_p0290a05"
+    assert [line["linehead"] for line in first["lines"]] == ["T09n0270_p0290a04", "T09n0270_p0290a05", "T09n0270_p0290a06"]
+    assert [(done, total) for done, total, _ in progress] == [(1, 2), (2, 2)]
+    assert sorted(item["work"] for _, _, item in progress) == ["T0270", "T0271"]
+    assert transport.replayed == 1 + 2 + 4
+
+
+def test_pipeline_respects_concurrency_budget(transport):
+    response, _ = run_pipeline(concurrency=1)
+    assert response["status"] == "success" and transport.max_in_flight == 1
+    _http.response_cache.clear()
+    transport.max_in_flight = 0
+    response, _ = run_pipeline(concurrency=4)
+    assert response["status"] == "success" and transport.max_in_flight > 1
+
+
+def test_pipeline_rejects_bad_budget(transport):
+    response, _ = run_pipeline(concurrency=0)
+    assert response["status"] == "error" and transport.replayed == 0
+
+
+def test_pipeline_rejects_bad_kwic_rows(transport):
+    for kwic_rows in (0, 51):
+        response, _ = run_pipeline(kwic_rows=kwic_rows)
+        assert response["status"] == "error" and "kwic_rows" in response["message"]
+    assert transport.replayed == 0
+
+
+def test_pipeline_uses_local_kwic(transport, tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    (source / "juans" / "T0270").mkdir(parents=True)
+    (source / "works.jsonl").write_text(json.dumps({"work": "T0270", "title": "大法鼓經", "vol": "T09"}), encoding="utf-8")
+    (source / "juans" / "T0270" / "001.html").write_text(
+        "<p><span class='lb' id='T09n0270_p0290a05'></span>擊大法鼓吹大法螺"
+        "<span class='lb' id='T09n0270_p0290a06'></span>法鼓音聲</p>", encoding="utf-8")
+    build_index(source, tmp_path / "index")
+    index = CorpusIndex(tmp_path / "index")
+    monkeypatch.setattr(search_pipeline, "get_index", lambda: index)
+    monkeypatch.setattr(_offload, "THRESHOLD", 0)
+    before = _offload.stats()["offloaded"]
+
+    response, _ = run_pipeline(context=0)
+    assert response["status"] == "success" and transport.replayed == 0
+    assert _offload.stats()["offloaded"] - before == 2  # 前 N 卷 + 一卷 KWIC
+    kwics = response["result"]["results"][0]["kwics"]
+    assert [k["linehead"] for k in kwics] == ["T09n0270_p0290a05", "T09n0270_p0290a06"]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Suffix Array Tests
+
+Check the suffix/LCP construction against brute force on texts with long
+repeats, and exact substring counts and linehead mapping on the tiny
+test_corpus index; location order merges segments by work, juan and
+offset, cbeta_substring_count runs the sort through _offload, and mmaps
+of segments no longer in the manifest are released. No network access
+required.
+
+Usage:
+    python -m pytest tests/test_suffix_array.py
+"""
+
+import random
+
+import pytest
+
+from tests.test_corpus import JUANS, call, index, offloaded  # noqa: F401  (fixtures)
+from tests.test_incremental import edit, write_source
+from tools.cebta import _suffix_array
+from tools.cebta._corpus import CorpusIndex
+from tools.cebta._importer import build_index, update_index
+from tools.cebta.search import substring_count
+from tools.cebta._suffix_array import SEPARATOR, available, count, lcp_array, occurrences, suffix_array
+
+
+def brute_lcp(text: str, a: int, b: int) -> int:
+    n = 0
+    while a + n < len(text) and b + n < len(text) and text[a + n] == text[b + n] != SEPARATOR:
+        n += 1
+    return n
+
+
+@pytest.mark.parametrize("text", [
+    "如是我聞如是我聞如是我聞" + SEPARATOR + "如是我聞" + SEPARATOR,
+    "。" * 200 + SEPARATOR + "。" * 70 + "法" + SEPARATOR,
+    "".join(random.Random(7).choice("法鼓般若") for _ in range(500)) + SEPARATOR,
+])
+def test_suffix_and_lcp_arrays_match_brute_force(text):
+    expected = sorted((p for p in range(len(text)) if text[p] != SEPARATOR), key=lambda p: text[p:])
+    sa = suffix_array(text)
+    assert list(sa) == expected
+    lcp = lcp_array(text, sa)
+    assert list(lcp) == [0] + [brute_lcp(text, a, b) for a, b in zip(expected, expected[1:])]
+
+
+@pytest.fixture(scope="module")
+def built(index):  # noqa: F811
+    for seg in index.segments:
+        _suffix_array.build(seg)
+    _suffix_array._loaded.clear()
+    return index
+
+
+def test_counts_equal_str_count_for_every_substring(built):
+    texts = [t for seg in built.segments for t in seg.texts]
+    assert available(built)
+    for text in texts:
+        for i in range(len(text)):
+            for j in range(i + 1, min(len(text), i + 6) + 1):
+                term = text[i:j]
+                assert count(built, term) == sum(t.count(term) for t in texts), term
+    assert count(built, "不存在") == 0
+
+
+def test_occurrences_map_back_to_lineheads(built):
+    found = [
+        (occ.seg.docs[occ.doc].work, occ.seg.linehead_at(occ.doc, occ.offset), occ.offset)
+        for occ in occurrences(built, "法鼓", order="location")
+    ]
+    assert found == [
+        ("T0270", "T09n0270_p0290a01", 2),
+        ("T0270", "T09n0270_p0290a02", 8),
+        ("X0001", "X01n0001_p0001a01", 1),
+        ("X0001", "X01n0001_p0001a02", 8),
+    ]
+    # suffix 順序依其後文字排序
+    after = [occ.seg.texts[occ.doc][occ.offset + 2:occ.offset + 4] for occ in occurrences(built, "法鼓")]
+    assert after == sorted(after)
+
+
+def test_location_order_merges_segments(tmp_path):
+    source, root = tmp_path / "source", tmp_path / "index"
+    write_source(source, JUANS)
+    build_index(source, root, suffix_array=True)
+    edit(source)  # 改寫的 T0270 卷 1 與新增的 X0001 卷 2 寫入第二個 segment
+    update_index(source, root, compact_after=False)
+    index = CorpusIndex(root)
+    assert len(index.segments) == 2 and available(index)
+    found = [(occ.seg.docs[occ.doc].work, occ.seg.docs[occ.doc].juan, occ.offset)
+             for occ in occurrences(index, "法鼓", order="location")]
+    assert found == [("T0270", 1, 2), ("T0270", 1, 8), ("T0270", 1, 10), ("T0270", 1, 12),
+                     ("X0001", 1, 1), ("X0001", 1, 8), ("X0001", 2, 2)]
+
+
+def test_tool_offloads_location_sort(built, monkeypatch, offloaded):
+    monkeypatch.setattr(substring_count, "get_index", lambda: built)
+    data = call("cbeta_substring_count", {"q": "法鼓", "order": "location", "rows": 2, "start": 1,
+                                          "select": "num_found,results.linehead"})
+    assert data["result"] == {"num_found": 4, "results": [{"linehead": "T09n0270_p0290a02"},
+                                                          {"linehead": "X01n0001_p0001a01"}]}
+    assert offloaded() == 1
+
+
+def test_stale_suffix_array_is_ignored(built):
+    seg = built.segments[0]
+    meta = (seg.path / "suffix.json").read_text(encoding="utf-8")
+    try:
+        (seg.path / "suffix.json").write_text(meta.replace('"length": ', '"length": 1'), encoding="utf-8")
+        _suffix_array._loaded.clear()
+        assert _suffix_array.for_segment(seg) is None
+    finally:
+        (seg.path / "suffix.json").write_text(meta, encoding="utf-8")
+        _suffix_array._loaded.clear()
+
+
+def test_segments_dropped_from_manifest_are_released(built):
+    assert available(built)
+    gone = str(built.root / "seg-999999")  # 已被合併移除的 segment
+    other = "/elsewhere/seg-000001"  # 其他索引的 segment 不受影響
+    _suffix_array._loaded.update({gone: None, other: None})
+    _suffix_array._synced.clear()
+    assert available(built)
+    assert gone not in _suffix_array._loaded and other in _suffix_array._loaded
+    assert all(str(seg.path) in _suffix_array._loaded for seg in built.segments)
+    del _suffix_array._loaded[other]
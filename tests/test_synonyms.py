@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Synonym Graph Tests
+
+Offline checks for union-find clustering and query expansion, and that
+cbeta_fulltext_search sends synonym-expanded queries to /search/extended.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_synonyms.py
+"""
+
+import asyncio
+
+import httpx
+from fastmcp import Client
+
+import main
+from tools.cebta import _http, _synonyms
+from tools.cebta._synonyms import SynonymGraph, expand_query, query_terms
+from tools.cebta.search import fulltext_search
+
+
+def test_clusters_are_transitive(tmp_path):
+    table = tmp_path / "synonyms.tsv"
+    table.write_text("文殊師利\t曼殊室利\n曼殊室利,妙吉祥\n觀世音 觀自在\n", encoding="utf-8")
+    graph = SynonymGraph.load(table)
+    assert sorted(graph.synonyms("文殊師利")) == ["妙吉祥", "曼殊室利"]
+    assert graph.expand("觀自在") == ["觀自在", "觀世音"]
+    assert "般若" not in graph
+
+
+def test_jsonl_table(tmp_path):
+    table = tmp_path / "synonyms.jsonl"
+    table.write_text('{"q": "文殊師利", "results": ["曼殊室利", "妙德"]}\n', encoding="utf-8")
+    assert sorted(SynonymGraph.load(table).synonyms("妙德")) == ["文殊師利", "曼殊室利"]
+
+
+def test_expand_query_leaves_not_and_near_terms():
+    q = '"文殊" !"文殊師利菩薩" "般若" NEAR/5 "波羅蜜"'
+    assert query_terms(q) == ["文殊"]
+    assert expand_query(q, {"文殊": ["文殊", "曼殊"]}) == '("文殊" | "曼殊") !"文殊師利菩薩" "般若" NEAR/5 "波羅蜜"'
+
+
+def test_expand_plain_keyword():
+    assert expand_query("觀世音", {"觀世音": ["觀世音", "觀自在"]}) == '("觀世音" | "觀自在")'
+
+
+def test_multi_term_and_or_queries_expand_each_term():
+    assert query_terms("法鼓 聖嚴") == ["法鼓", "聖嚴"]
+    assert expand_query("法鼓 聖嚴", {"法鼓": ["法鼓"], "聖嚴": ["聖嚴"]}) == "法鼓 聖嚴"
+    assert expand_query("法鼓 | 聖嚴", {}) == "法鼓 | 聖嚴"
+    assert expand_query("法鼓 | 聖嚴", {"法鼓": ["法鼓", "大法鼓"]}) == '("法鼓" | "大法鼓") | 聖嚴'
+    assert expand_query('文殊 "般若"', {"文殊": ["文殊", "曼殊"]}) == '("文殊" | "曼殊") "般若"'
+
+
+def test_negated_terms_are_not_expanded():
+    q = '"般若" -"法鼓"'
+    assert query_terms(q) == ["般若"]
+    assert expand_query(q, {"法鼓": ["法鼓", "大法鼓"]}) == q
+    assert expand_query(q, {"般若": ["般若", "般若波羅蜜"], "法鼓": ["法鼓", "大法鼓"]}) == '("般若" | "般若波羅蜜") !"法鼓"'
+
+
+def test_remote_expansion_uses_extended_search(monkeypatch):
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"num_found": 0, "results": []})
+
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+    monkeypatch.setattr(_synonyms, "get_graph", lambda: SynonymGraph([["文殊師利", "曼殊室利"]]))
+    monkeypatch.setattr(fulltext_search, "get_index", lambda: None)
+    _http.response_cache.clear()
+
+    async def go():
+        async with Client(main.mcp) as client:
+            for q in ("文殊師利", "般若"):
+                await client.call_tool("cbeta_fulltext_search", {"q": q, "synonyms": 1})
+
+    asyncio.run(go())
+    _http.response_cache.clear()
+    expanded, plain = [r for r in requests if not r.url.path.endswith("/search/synonym")]
+    assert expanded.url.path.endswith("/search/extended")
+    assert expanded.url.params["q"] == '("文殊師利" | "曼殊室利")'
+    assert plain.url.path.endswith("/search") and plain.url.params["q"] == "般若"
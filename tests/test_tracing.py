@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Request Tracing Tests
+
+Call tools on replayed upstream responses and check the envelope carries a
+trace_id whose spans cover tool dispatch, cache lookup, upstream HTTP, JSON
+decoding and encoding; check the HTTP middleware continues an incoming W3C
+traceparent, that traces export as OTLP/JSON lines and that traces whose
+root span never ends are bounded. No network access required.
+
+Usage:
+    python -m pytest tests/test_tracing.py
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastmcp import Client
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import main
+from tests.fake_cbeta import DEFAULT_FIXTURES
+from tools.cebta import _http, _tracing
+from tools.cebta._replay import ReplayTransport, load_exchanges
+
+
+def call(name: str, args: dict) -> dict:
+    async def go():
+        async with Client(main.mcp) as client:
+            return json.loads((await client.call_tool(name, args)).content[0].text)
+    return asyncio.run(go())
+
+
+def test_tool_call_spans(monkeypatch):
+    transport = ReplayTransport(load_exchanges(DEFAULT_FIXTURES), scale=0, base=_http.API_BASE)
+    monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+    _http.response_cache.clear()
+
+    envelope = call("get_cbeta_toc", {"work": "T0001"})
+    assert envelope["status"] == "success"
+    spans = _tracing.recent[envelope["trace_id"]]
+    names = [s["name"] for s in spans]
+    assert names[0] == "tool get_cbeta_toc" and spans[0]["parent_id"] is None
+    assert {"cache.lookup", "upstream GET /works/toc", "json.decode", "encode"} <= set(names)
+    assert all(s["trace_id"] == envelope["trace_id"] for s in spans)
+    by_name = {s["name"]: s for s in spans}
+    assert by_name["cache.lookup"]["attributes"]["result"] == "miss"
+    assert by_name["upstream GET /works/toc"]["attributes"]["http.status_code"] == 200
+
+    again = call("get_cbeta_toc", {"work": "T0001"})
+    names = [s["name"] for s in _tracing.recent[again["trace_id"]]]
+    assert again["trace_id"] != envelope["trace_id"] and "upstream GET /works/toc" not in names
+    _http.response_cache.clear()
+
+    # 工具以外的呼叫不建立 trace，回應也不帶 trace_id
+    assert "trace_id" not in main.success_response({})
+
+
+def test_http_middleware_continues_traceparent():
+    app = _tracing.TraceASGIMiddleware(Starlette(routes=[Route("/ping", lambda r: PlainTextResponse("pong"))]))
+    trace_id, parent = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/ping", headers={"traceparent": f"00-{trace_id}-{parent}-01"})
+
+    response = asyncio.run(go())
+    assert response.headers["x-trace-id"] == trace_id
+    (root,) = _tracing.recent[trace_id]
+    assert (root["name"], root["parent_id"], root["attributes"]["http.status_code"]) == ("GET /ping", parent, 200)
+    assert _tracing.parse_traceparent("00-short-00f067aa0ba902b7-01") is None
+
+
+def test_file_export_is_otlp_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(_tracing, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    with _tracing.span("outside a trace"):
+        pass
+    root = _tracing.Span("root", sampled=True)
+    token = _tracing._current.set(root)
+    with _tracing.span("child", rows=20) as s:
+        s.event("page", start=0)
+    _tracing._current.reset(token)
+    root.end()
+
+    (line,) = (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["root", "child"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"] and "parentSpanId" not in spans[0]
+    assert spans[1]["attributes"] == [{"key": "rows", "value": {"intValue": "20"}}]
+    assert spans[1]["events"][0]["name"] == "page" and spans[0]["status"] == {"code": 1}
+
+
+def test_unfinished_traces_are_bounded(monkeypatch):
+    monkeypatch.setattr(_tracing, "MAX_OPEN", 4)
+    monkeypatch.setattr(_tracing, "_open", type(_tracing._open)())
+    before = _tracing.stats()["dropped"]
+    roots = [_tracing.Span("never ends", sampled=True) for _ in range(10)]
+    for root in roots:
+        _tracing.child(root, "orphan", root.start_ns, root.start_ns + 1)
+    assert list(_tracing._open) == [root.trace_id for root in roots[-4:]]
+    assert _tracing.stats()["dropped"] == before + 6
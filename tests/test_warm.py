@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Cache Warming Tests
+
+Check the count-min sketch (never underestimates, ages by halving, survives a
+save/load round trip) and tools.cebta._warm against recorded responses:
+requests made through get_raw are counted, warm() prefetches the most popular
+keys into the response cache at the configured rate, skips keys that are
+already cached (but not expired ones), keeps the most popular keys when the
+candidate list is full, and stops the round on HTTP 429. No network access
+required.
+
+Usage:
+    python -m pytest tests/test_warm.py
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from tools.cebta import _http, _warm
+from tools.cebta._cache import CountMinSketch
+from tools.cebta._replay import ReplayTransport
+
+WORKS = [f"T{n:04d}" for n in range(1, 7)]
+
+
+def exchange(path, params, status=200):
+    body = json.dumps({"num_found": 1, "results": [params]}) if status == 200 else ""
+    return {"request": {"method": "GET", "path": path, "params": [[k, str(v)] for k, v in params.items()]},
+            "response": {"status": status, "headers": {"content-type": "application/json"}, "body": body},
+            "elapsed": 0.0}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(_warm, "popularity", _warm.Popularity())
+
+    def use(throttled: set[str] = frozenset()) -> ReplayTransport:
+        exchanges = [exchange("/works", {"work": w}, 429 if w in throttled else 200) for w in WORKS]
+        exchanges.append(exchange("/juans", {"work": "T0001", "juan": 1}))
+        transport = ReplayTransport(exchanges, scale=0, base=_http.API_BASE)
+        monkeypatch.setattr(_http, "_client", httpx.AsyncClient(transport=transport))
+        _http.response_cache.clear()
+        return transport
+    yield use
+    _http.response_cache.clear()
+
+
+def visit(counts: dict[str, int]) -> None:
+    """依 counts 次數透過 get_raw 存取各佛典（第一次之後都是快取命中）。"""
+    async def go():
+        for work, n in counts.items():
+            for _ in range(n):
+                await _http.get_raw("/works", {"work": work})
+    asyncio.run(go())
+
+
+def test_sketch_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=4, sample_size=10**9)
+    truth = {f"key{i}": i % 7 + 1 for i in range(200)}
+    for key, n in truth.items():
+        for _ in range(n):
+            sketch.add(key)
+    assert all(sketch.estimate(key) >= n for key, n in truth.items())
+    assert sketch.estimate("key6") <= truth["key6"] + 10
+
+
+def test_sketch_halves_and_round_trips():
+    sketch = CountMinSketch(width=256, depth=3, sample_size=40)
+    for _ in range(39):
+        sketch.add("hot")
+    assert sketch.estimate("hot") == 39
+    sketch.add("hot")
+    assert sketch.estimate("hot") == 20 and sketch.additions == 20
+    restored = CountMinSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.estimate("hot") == 20 and restored.additions == 20
+
+
+def test_access_is_counted_and_persisted(upstream, tmp_path):
+    upstream()
+    visit({"T0001": 3, "T0002": 1})
+    asyncio.run(_http.get_raw("/juans", {"work": "T0001", "juan": 1}))  # 卷文不預熱，不計入
+    ranked = _warm.popularity.ranked(10)
+    assert [(p, params["work"], n) for p, params, n in ranked] == [("/works", "T0001", 3), ("/works", "T0002", 1)]
+
+    path = tmp_path / "warm.json"
+    _warm.popularity.save(path)
+    assert _warm.Popularity.load(path).ranked(10) == ranked
+
+
+def test_warm_prefetches_top_keys_at_rate(upstream):
+    upstream()
+    visit({"T0001": 5, "T0002": 4, "T0003": 3, "T0004": 2, "T0005": 1})
+    _http.response_cache.clear()
+    transport = upstream()
+    visit({"T0002": 1})  # 已在快取中，預熱時略過
+
+    started = time.perf_counter()
+    result = asyncio.run(_warm.warm(top_k=4, rate=20))
+    assert time.perf_counter() - started >= 2 / 20  # 3 個請求：第一個立即，之後間隔 1/20 秒
+    assert result["candidates"] == 4 and result["cached"] == 1 and result["warmed"] == 3
+    assert transport.replayed == 1 + 3
+    assert all(_http.cache_key("/works", {"work": w}) in _http.response_cache for w in WORKS[:4])
+    assert _http.cache_key("/works", {"work": "T0005"}) not in _http.response_cache
+    # 預熱的請求不計入熱度
+    assert _warm.popularity.ranked(1)[0][2] == 5
+
+
+def test_warm_refetches_expired_entries(upstream, monkeypatch):
+    transport = upstream()
+    visit({"T0001": 2})
+    monkeypatch.setattr(_http.response_cache, "ttl", 0.01)
+    time.sleep(0.02)
+    key = _http.cache_key("/works", {"work": "T0001"})
+    assert key not in _http.response_cache
+    result = asyncio.run(_warm.warm(top_k=1, rate=1000))
+    assert result["cached"] == 0 and result["warmed"] == 1 and transport.replayed == 2
+
+
+def test_candidates_keep_the_most_popular_keys():
+    popularity = _warm.Popularity(capacity=3)
+    for i, n in enumerate([5, 1, 4, 2, 6, 3]):
+        for _ in range(n):
+            popularity.record("/works", {"work": f"T{i:04d}"})
+    assert [params["work"] for _, params, _ in popularity.ranked(3)] == ["T0004", "T0000", "T0002"]
+    assert len(popularity._heap) <= 2 * popularity.capacity
+
+
+def test_warm_stops_on_throttling(upstream, capsys):
+    upstream()
+    visit({w: 10 - i for i, w in enumerate(WORKS)})
+    _http.response_cache.clear()
+    transport = upstream(throttled={"T0002"})
+
+    result = asyncio.run(_warm.warm(top_k=6, rate=1000, concurrency=1))
+    assert result["throttled"] and result["warmed"] == 1 and result["failed"] == 1
+    assert transport.replayed == 2
+    assert "429" in capsys.readouterr().out
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Simplified → Traditional Conversion Tests
+
+Offline checks for the phrase/char conversion tables and for the shared
+response cache keying on the converted query.
+No network access required.
+
+Usage:
+    python -m pytest tests/test_zhconv.py
+"""
+
+import asyncio
+
+import httpx
+
+from tools.cebta import _http
+from tools.cebta._zhconv import _CHARS, _PHRASES, Converter, to_traditional
+
+
+def test_tables_are_well_formed():
+    chars = _CHARS.split()
+    assert all(len(word) == 2 for word in chars)
+    assert len({word[0] for word in chars}) == len(chars)
+    assert all(len(word) % 2 == 0 for word in _PHRASES.split())
+
+
+def test_char_and_phrase_conversion():
+    assert to_traditional("四圣谛") == "四聖諦"
+    assert to_traditional("发菩提心剃除须发") == "發菩提心剃除鬚髮"
+    assert to_traditional("于一切法无所执着") == "於一切法無所執著"
+    assert to_traditional("干闼婆") == "乾闥婆"
+
+
+def test_ambiguous_chars_are_left_alone():
+    for text in ("云何應住", "舍利弗", "尸羅波羅蜜", "四聖諦", "T01", '"法鼓" NEAR/7 "迦葉"'):
+        assert to_traditional(text) == text
+
+
+def test_ambiguous_simplified_chars_convert_only_in_phrases():
+    # 无、胜、叶、价、虫、体 … 在 CBETA 中也是原字用例，單字不轉
+    for text in ("无", "胜", "叶", "价", "虫", "体", "弥", "适"):
+        assert to_traditional(text) == text
+    assert to_traditional("诸行无常") == "諸行無常"
+    assert to_traditional("摩诃迦叶") == "摩訶迦葉"
+    assert to_traditional("殊胜身体") == "殊勝身體"
+    assert to_traditional("南无阿弥陀佛") == "南無阿彌陀佛"
+
+
+def test_longest_phrase_wins():
+    converter = Converter({}, {"后": "後", "后有": "後有", "皇后": "皇后"})
+    assert converter.convert("皇后不受后有") == "皇后不受後有"
+
+
+def test_simplified_and_traditional_share_cache_entry():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"hits": 41})
+
+    async def run():
+        _http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        _http.response_cache.clear()
+        try:
+            a = await _http.get_json("/search/sc", {"q": to_traditional("四圣谛")})
+            b = await _http.get_json("/search/sc", {"q": to_traditional("四聖諦")})
+        finally:
+            await _http.close_client()
+        return a, b
+
+    assert asyncio.run(run()) == ({"hits": 41}, {"hits": 41})
+    assert len(requests) == 1
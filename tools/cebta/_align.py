@@ -0,0 +1,115 @@
+"""
+異譯本對齊引擎：把來源卷切成句子，只在目標佛典的指定卷中找最相近的句子。
+
+- split_sentences()：依句末標點（。！？；：）切句，過長的句子再依逗號或固定字數切開；
+  每句記下起始行首，供回到原文。
+- align_batch()：先以 bigram 重疊數從目標句中挑出少數候選，再用 Smith-Waterman 局部比對
+  （gain/penalty 與 cbeta_similar_search 相同）計分取最高者。為純函式，
+  可整批送進行程池（_offload.run(..., process=True)）平行處理。
+- 對齊結果依 (來源, 卷, 目標, 卷範圍, 參數) 快取於 alignment_cache。
+"""
+
+import re
+from bisect import bisect_right
+from collections import Counter
+
+from tools.cebta import _metrics
+from tools.cebta._cache import LRUCache
+from tools.cebta._juan_text import JuanText
+
+MAX_SENTENCE_CHARS = 40
+MIN_SENTENCE_CHARS = 2
+
+_SENTENCE_END = re.compile(r"(?<=[。！？；：])")
+_CLAUSE_END = re.compile(r"(?<=[，、])")
+_PUNCTUATION = re.compile(r"[\s，、。！？；：「」『』（）《》〈〉…—．·]")
+
+alignment_cache = LRUCache(maxsize=64, ttl=3600)
+_metrics.register("alignment_cache", alignment_cache.stats)
+
+
+def _chunks(text: str) -> list[str]:
+    """過長的句子先依逗號、再依固定字數切開。"""
+    if len(text) <= MAX_SENTENCE_CHARS:
+        return [text]
+    out, buf = [], ""
+    for clause in _CLAUSE_END.split(text):
+        if buf and len(buf) + len(clause) > MAX_SENTENCE_CHARS:
+            out.append(buf)
+            buf = ""
+        buf += clause
+    if buf:
+        out.append(buf)
+    return [piece[i:i + MAX_SENTENCE_CHARS] for piece in out for i in range(0, len(piece), MAX_SENTENCE_CHARS)]
+
+
+def split_sentences(juan_text: JuanText) -> list[dict]:
+    """全卷純文字（不含註解）切成 [{"linehead", "text"}]，text 保留原標點。"""
+    texts, offsets = juan_text.line_index("none")
+    full = "".join(texts)
+    sentences, pos = [], 0
+    for sentence in _SENTENCE_END.split(full):
+        for piece in _chunks(sentence):
+            start, pos = pos, pos + len(piece)
+            if len(_PUNCTUATION.sub("", piece)) < MIN_SENTENCE_CHARS:
+                continue
+            line = min(bisect_right(offsets, start) - 1, len(texts) - 1)
+            sentences.append({"linehead": juan_text.lines[line].linehead, "text": piece})
+    return sentences
+
+
+def normalize(text: str) -> str:
+    return _PUNCTUATION.sub("", text)
+
+
+def smith_waterman(a: str, b: str, gain: int = 2, penalty: int = -1) -> int:
+    """局部比對最高分；錯配與缺口同樣扣 penalty。"""
+    if not a or not b:
+        return 0
+    best = 0
+    prev = [0] * (len(b) + 1)
+    for ca in a:
+        cur = [0]
+        for j, cb in enumerate(b, 1):
+            score = max(0, prev[j - 1] + (gain if ca == cb else penalty), prev[j] + penalty, cur[j - 1] + penalty)
+            cur.append(score)
+            if score > best:
+                best = score
+        prev = cur
+    return best
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def align_batch(
+    sources: list[str],
+    targets: list[str],
+    gain: int = 2,
+    penalty: int = -1,
+    min_similarity: float = 0.5,
+    candidates: int = 5,
+) -> list[tuple[int | None, int]]:
+    """
+    sources / targets 為已去標點的句子；回傳每個來源句的 (最佳目標句編號, 分數)。
+    分數未達該句滿分（gain × 句長）的 min_similarity 倍、或少於兩字相符時，編號為 None。
+    """
+    postings: dict[str, list[int]] = {}
+    for i, target in enumerate(targets):
+        for gram in _bigrams(target):
+            postings.setdefault(gram, []).append(i)
+
+    out: list[tuple[int | None, int]] = []
+    for source in sources:
+        shared: Counter[int] = Counter()
+        for gram in _bigrams(source):
+            shared.update(postings.get(gram, ()))
+        best, best_score = None, 0
+        for i, _ in shared.most_common(candidates):
+            score = smith_waterman(source, targets[i], gain, penalty)
+            if score > best_score:
+                best, best_score = i, score
+        threshold = max(2 * gain, min_similarity * gain * len(source))
+        out.append((best, best_score) if best_score >= threshold else (None, best_score))
+    return out
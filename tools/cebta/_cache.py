@@ -0,0 +1,295 @@
+"""
+CBETA 工具共用的記憶體快取。
+
+檔名以底線開頭，不會被 main.recursive_import_tools 當成工具模組匯入。
+"""
+
+import hashlib
+import struct
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    固定容量的 LRU 快取，可選擇性設定存活秒數（ttl）。
+    on_expire(key, value) 在 get 發現項目過期、將其移除時呼叫（例如留下內容供條件式請求重新驗證）。
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float | None = None,
+                 on_expire: Callable[[Hashable, Any], None] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        stored_at, value = item
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            if self.on_expire is not None:
+                self.on_expire(key, value)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """已過期的項目視為不存在（不移除、不計入命中率）。"""
+        item = self._data.get(key)
+        return item is not None and (self.ttl is None or time.monotonic() - item[0] <= self.ttl)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch：depth 列 × width 個計數器，以固定記憶體估計各鍵的出現次數（只會高估）。
+
+    鍵為字串，以 blake2b 雜湊（跨行程穩定，可存檔後重新載入）；採保守更新，只增加目前最小的計數器。
+    累計加入 sample_size 次後所有計數減半（老化），過去的熱門鍵會逐漸退場。
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: int | None = None):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or 10 * width
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+        self.additions = 0
+        self._words = struct.Struct(f"<{depth}I")
+
+    def _indexes(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4 * self.depth).digest()
+        return [h % self.width for h in self._words.unpack(digest)]
+
+    def add(self, key: str) -> int:
+        """加一次並回傳新的估計值。"""
+        indexes = self._indexes(key)
+        estimate = min(row[i] for row, i in zip(self.rows, indexes)) + 1
+        for row, i in zip(self.rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.halve()
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def halve(self) -> None:
+        for row in self.rows:
+            for i, n in enumerate(row):
+                if n:
+                    row[i] = n >> 1
+        self.additions //= 2
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "depth": self.depth, "sample_size": self.sample_size,
+                "additions": self.additions, "rows": [row.tolist() for row in self.rows]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CountMinSketch":
+        sketch = cls(data["width"], data["depth"], data.get("sample_size"))
+        sketch.rows = [array("I", row) for row in data["rows"]]
+        sketch.additions = data.get("additions", 0)
+        return sketch
+
+
+def sizeof(value: Any) -> int:
+    """快取項目佔用的位元組數（bytes / str 以長度計，其餘以 sys.getsizeof 粗估）。"""
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class TinyLFUCache:
+    """
+    W-TinyLFU 快取：同時限制項目數（maxsize）與總位元組數（maxbytes），介面（含 on_expire）與 LRUCache 相同。
+
+    - 每次 get（命中或未命中）都把鍵記入 CountMinSketch，作為存取頻率。
+    - 新項目先進入約佔 1% 容量的 window（LRU），被擠出 window 時才申請進入主快取。
+    - 主快取為分段 LRU：新進項目在 probation，再次命中時升到 protected（約佔主快取 80%）。
+    - 准入依大小計價：為騰出空間須淘汰的 probation（不足時再加上 protected）尾端項目，
+      其頻率總和必須小於新項目的頻率才准入，否則丟棄新項目。
+      一次性的大回應（冷門卷文、k=500 的相似搜尋）因此擠不掉常用的小項目（佛典資訊、目錄節點）。
+    """
+
+    WINDOW = 0.01
+    PROTECTED = 0.8
+
+    def __init__(self, maxsize: int = 256, maxbytes: int = 64 * 2**20, ttl: float | None = None,
+                 on_expire: Callable[[Hashable, Any], None] | None = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.window_size = max(1, int(maxsize * self.WINDOW))
+        self.window_bytes = max(1, int(maxbytes * self.WINDOW))
+        self.main_size = maxsize - self.window_size
+        self.main_bytes = maxbytes - self.window_bytes
+        self.protected_bytes = int(self.main_bytes * self.PROTECTED)
+        self.sketch = CountMinSketch(width=max(4096, 4 * maxsize))
+        # 各段：鍵 → (存入時間, 值, 位元組數)
+        self._segments: dict[str, OrderedDict[Hashable, tuple[float, Any, int]]] = {
+            "window": OrderedDict(), "probation": OrderedDict(), "protected": OrderedDict(),
+        }
+        self._bytes = dict.fromkeys(self._segments, 0)
+        self.hits = 0
+        self.misses = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def _find(self, key: Hashable) -> str | None:
+        for name, segment in self._segments.items():
+            if key in segment:
+                return name
+        return None
+
+    def _pop(self, name: str, key: Hashable) -> tuple[float, Any, int]:
+        item = self._segments[name].pop(key)
+        self._bytes[name] -= item[2]
+        return item
+
+    def _push(self, name: str, key: Hashable, item: tuple[float, Any, int]) -> None:
+        self._segments[name][key] = item
+        self._bytes[name] += item[2]
+
+    def _main_len(self) -> int:
+        return len(self._segments["probation"]) + len(self._segments["protected"])
+
+    def _main_used(self) -> int:
+        return self._bytes["probation"] + self._bytes["protected"]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self.sketch.add(repr(key))
+        name = self._find(key)
+        if name is None:
+            self.misses += 1
+            return default
+        item = self._segments[name][key]
+        if self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+            self._pop(name, key)
+            if self.on_expire is not None:
+                self.on_expire(key, item[1])
+            self.misses += 1
+            return default
+        if name == "probation":
+            self._push("protected", key, self._pop(name, key))
+            protected = self._segments["protected"]
+            while self._bytes["protected"] > self.protected_bytes and len(protected) > 1:
+                demoted = next(iter(protected))
+                self._push("probation", demoted, self._pop("protected", demoted))
+        else:
+            self._segments[name].move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        item = (time.monotonic(), value, sizeof(value))
+        name = self._find(key)
+        if name is not None:
+            self._pop(name, key)
+        if name in ("probation", "protected"):
+            # 已在主快取中的鍵直接重新申請准入，不經 window
+            self._admit(key, item)
+            return
+        self._push("window", key, item)
+        window = self._segments["window"]
+        while window and (len(window) > self.window_size or self._bytes["window"] > self.window_bytes):
+            candidate = next(iter(window))
+            self._admit(candidate, self._pop("window", candidate))
+
+    def _evict(self, key: Hashable) -> None:
+        self._pop(self._find(key), key)
+        self.evicted += 1
+
+    def _admit(self, key: Hashable, item: tuple[float, Any, int]) -> None:
+        """
+        依 probation、protected 的 LRU 順序挑出須淘汰的項目；一旦其頻率總和不小於新項目的頻率就放棄，
+        大項目不必逐一檢查所有小項目。
+        """
+        size = item[2]
+        if size > self.main_bytes or self.main_size <= 0:
+            self.rejected += 1
+            return
+        segments = self._segments
+        order = chain(segments["probation"].items(), segments["protected"].items())
+        used, count = self._main_used() + size, self._main_len() + 1
+        victims, victim_frequency, frequency = [], 0, None
+        while used > self.main_bytes or count > self.main_size:
+            victim, (_, _, victim_size) = next(order)
+            if frequency is None:
+                frequency = self.sketch.estimate(repr(key))
+            victim_frequency += self.sketch.estimate(repr(victim))
+            if victim_frequency >= frequency:
+                self.rejected += 1
+                return
+            victims.append(victim)
+            used -= victim_size
+            count -= 1
+        for victim in victims:
+            self._evict(victim)
+        self._push("probation", key, item)
+        self.admitted += 1
+
+    def clear(self) -> None:
+        for segment in self._segments.values():
+            segment.clear()
+        self._bytes = dict.fromkeys(self._segments, 0)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """已過期的項目視為不存在（不移除、不計入頻率與命中率）。"""
+        name = self._find(key)
+        if name is None:
+            return False
+        return self.ttl is None or time.monotonic() - self._segments[name][key][0] <= self.ttl
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments.values())
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "bytes": sum(self._bytes.values()),
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "segments": {name: {"size": len(segment), "bytes": self._bytes[name]}
+                         for name, segment in self._segments.items()},
+        }
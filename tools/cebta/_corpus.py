@@ -0,0 +1,527 @@
+"""
+CBETA 本地語料索引。
+
+索引目錄結構（由 tools/cebta/_importer.py 建立）：
+
+    <CBETA_INDEX_DIR>/
+      manifest.json          {"version": 2, "generation", "segments": ["seg-000001", ...],
+                              "sizes": {segment: 卷數}, "deleted": {segment: [doc, ...]},
+                              "juans": {"T0001/1": {hash, size, mtime_ns, segment, doc}}}
+      seg-000001/
+        docs.json            每卷（doc）的中繼資料與 facet 欄式陣列
+        text.jsonl           每行一卷：{"lineheads": [...], "texts": [...]}
+        postings.json        二字組（bigram）→ 含該字組的 doc 編號（遞增）
+        notes.json           校勘註解（腳註與夾注），欄式：docs / ids / lineheads / places / contents / offsets
+        note_postings.json   註解內容的 bigram → 註解編號
+
+每個 segment 載入後：
+- facet 欄位（canon / category / dynasty / work）為 array('I') 的標籤代碼，
+  creator 為多值欄位，以 offsets + codes 兩個陣列表示（CSR）。
+- 全文以卷為單位串接，另存每行起始位移，可由命中位置換回 linehead。
+- 註解另成一個 NoteStore，以所屬 doc 編號連回卷的 facet 欄位。
+
+segment 寫出後不再修改。增量更新（_importer --update）把有變動的卷寫進新的 segment，
+舊 segment 中的對應卷記入 manifest 的 deleted（tombstone），查詢時略過；
+manifest 以 os.replace 原子替換，讀取端永遠看到完整的某一版。
+
+未設定 CBETA_INDEX_DIR 或載入失敗時 get_index() 回傳 None，工具改走遠端 API。
+get_index() 每 RELOAD_INTERVAL 秒檢查 manifest 是否更新，有則在背景執行緒載入新版
+（沿用未變動的 segment），載入完成前查詢繼續使用舊版，不會被阻塞。
+"""
+
+import copy
+import heapq
+import json
+import os
+import pathlib
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import chain
+
+from tools.cebta._http import dumps, loads
+
+INDEX_DIR = os.getenv("CBETA_INDEX_DIR")
+RELOAD_INTERVAL = float(os.getenv("CBETA_INDEX_RELOAD_INTERVAL", "5"))
+
+FACETS = ("canon", "category", "dynasty", "creator", "work")
+SINGLE_VALUED_FACETS = ("canon", "category", "dynasty", "work")
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class Doc:
+    work: str
+    juan: int
+    vol: str | None = None
+    title: str | None = None
+
+
+def bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def candidates_from_postings(postings: dict[str, array], term: str) -> set[int] | None:
+    """以 bigram 倒排表取交集求候選編號；單字詞無法用 bigram 過濾，回傳 None（表示全部）。"""
+    if len(term) < 2:
+        return None
+    result: set[int] | None = None
+    for gram in sorted(bigrams(term), key=lambda g: len(postings.get(g, ()))):
+        ids = postings.get(gram)
+        if not ids:
+            return set()
+        result = set(ids) if result is None else result.intersection(ids)
+        if not result:
+            return set()
+    return result
+
+
+class NoteStore:
+    """一個 segment 的校勘註解。place 為 'foot'（腳註）或 'inline'（夾注）；夾注沒有 id。"""
+
+    def __init__(self, data: dict, postings: dict[str, list[int]]):
+        self.docs = array("I", data["docs"])
+        self.ids: list[str | None] = data["ids"]
+        self.lineheads: list[str | None] = data["lineheads"]
+        self.places: list[str] = data["places"]
+        self.contents: list[str] = data["contents"]
+        # 夾注在全卷文字中的起始位移（腳註為 None）
+        self.offsets: list[int | None] = data.get("offsets") or [None] * len(self.contents)
+        self.postings: dict[str, array] = {k: array("I", v) for k, v in postings.items()}
+        self._inline_spans: dict[int, list[tuple[int, int]]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def inline_spans(self, doc: int) -> list[tuple[int, int]]:
+        """該卷夾注在全卷文字中的 [起點, 終點) 區間，依起點排序。"""
+        if self._inline_spans is None:
+            spans: dict[int, list[tuple[int, int]]] = {}
+            for i, offset in enumerate(self.offsets):
+                if offset is not None:
+                    spans.setdefault(self.docs[i], []).append((offset, offset + len(self.contents[i])))
+            self._inline_spans = {d: sorted(v) for d, v in spans.items()}
+        return self._inline_spans.get(doc, [])
+
+    @classmethod
+    def empty(cls) -> "NoteStore":
+        return cls({"docs": [], "ids": [], "lineheads": [], "places": [], "contents": []}, {})
+
+
+class Segment:
+    """索引中的一個不可變片段；docs 編號為片段內的區域編號，deleted 為已被取代的卷。"""
+
+    def __init__(self, path: pathlib.Path, deleted: frozenset[int] = frozenset()):
+        self.path = path
+        self.deleted = deleted
+        meta = json.loads((path / "docs.json").read_text(encoding="utf-8"))
+        self.docs = [Doc(**d) for d in meta["docs"]]
+        self.labels: dict[str, list[str]] = meta["labels"]
+        self.columns: dict[str, array] = {
+            name: array("I", meta["columns"][name]) for name in SINGLE_VALUED_FACETS
+        }
+        self.creator_offsets = array("I", meta["creator"]["offsets"])
+        self.creator_codes = array("I", meta["creator"]["codes"])
+
+        self.texts: list[str] = []
+        self.lineheads: list[list[str]] = []
+        self.line_starts: list[array] = []
+        with open(path / "text.jsonl", encoding="utf-8") as f:
+            for row in f:
+                record = json.loads(row)
+                starts = array("I")
+                pos = 0
+                for text in record["texts"]:
+                    starts.append(pos)
+                    pos += len(text)
+                self.texts.append("".join(record["texts"]))
+                self.lineheads.append(record["lineheads"])
+                self.line_starts.append(starts)
+
+        raw_postings = loads((path / "postings.json").read_bytes())
+        self.postings: dict[str, array] = {k: array("I", v) for k, v in raw_postings.items()}
+
+        if (path / "notes.json").exists():
+            self.notes = NoteStore(
+                json.loads((path / "notes.json").read_text(encoding="utf-8")),
+                loads((path / "note_postings.json").read_bytes()),
+            )
+        else:  # 舊版索引沒有註解
+            self.notes = NoteStore.empty()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def num_live(self) -> int:
+        return len(self.docs) - len(self.deleted)
+
+    def with_deleted(self, deleted: frozenset[int]) -> "Segment":
+        """同一份資料、不同 tombstone 的淺複本（供新版索引沿用已載入的 segment）。"""
+        if deleted == self.deleted:
+            return self
+        seg = copy.copy(self)
+        seg.deleted = deleted
+        seg.__dict__.pop("_live_notes", None)
+        return seg
+
+    def live_notes(self) -> range | list[int]:
+        """未被刪除的卷的註解編號（依 tombstone 快取）。"""
+        live = self.__dict__.get("_live_notes")
+        if live is None:
+            if not self.deleted:
+                live = range(len(self.notes))
+            else:
+                live = [i for i, doc in enumerate(self.notes.docs) if doc not in self.deleted]
+            self._live_notes = live
+        return live
+
+    def candidates(self, term: str) -> list[int]:
+        """以 bigram 倒排表取交集求候選卷；單字詞無法用 bigram 過濾，回傳全部。"""
+        result = candidates_from_postings(self.postings, term)
+        return list(range(len(self.docs))) if result is None else sorted(result)
+
+    def count(self, term: str) -> list[tuple[int, int]]:
+        """回傳 [(doc, 命中次數)]，只含命中次數 > 0 的卷。"""
+        out = []
+        for doc in self.candidates(term):
+            if doc in self.deleted:
+                continue
+            hits = self.texts[doc].count(term)
+            if hits:
+                out.append((doc, hits))
+        return out
+
+    def linehead_at(self, doc: int, offset: int) -> str | None:
+        starts = self.line_starts[doc]
+        i = bisect_right(starts, offset) - 1
+        return self.lineheads[doc][i] if i >= 0 else None
+
+    def creators(self, doc: int) -> array:
+        return self.creator_codes[self.creator_offsets[doc]:self.creator_offsets[doc + 1]]
+
+
+class CorpusIndex:
+    def __init__(self, root: pathlib.Path, previous: "CorpusIndex | None" = None):
+        """previous 為目前使用中的版本；名稱相同的 segment 直接沿用，不重新讀檔。"""
+        self.root = root
+        manifest = read_manifest(root)
+        self.generation: int = manifest.get("generation", 0)
+        deleted = manifest.get("deleted", {})
+        loaded = {seg.name: seg for seg in previous.segments} if previous is not None else {}
+        self.segments = []
+        for name in manifest["segments"]:
+            dead = frozenset(deleted.get(name, ()))
+            seg = loaded[name].with_deleted(dead) if name in loaded else Segment(root / name, dead)
+            self.segments.append(seg)
+        self._line_notes: dict[str, dict[str, str]] | None = None
+        self._work_docs: dict[str, list[tuple[Segment, int]]] | None = None
+
+    @property
+    def scan_size(self) -> int:
+        """掃描全索引的工作量估計（每卷約 1 KiB），供 _offload.run(size=...) 判斷是否移出事件迴圈。"""
+        return self.num_docs * 1024
+
+    @property
+    def num_docs(self) -> int:
+        return sum(seg.num_live for seg in self.segments)
+
+    @property
+    def num_notes(self) -> int:
+        return sum(len(seg.live_notes()) for seg in self.segments)
+
+    def count(self, term: str) -> list[tuple[Segment, int, int]]:
+        """在所有 segment 中計算詞頻：[(segment, doc, hits)]，即命中卷的 posting list。"""
+        return [(seg, doc, hits) for seg in self.segments for doc, hits in seg.count(term)]
+
+    def count_any(self, terms: list[str]) -> list[tuple[Segment, int, int]]:
+        """OR 查詢：任一詞命中即算，hits 為各詞命中次數總和。"""
+        if len(terms) == 1:
+            return self.count(terms[0])
+        out = []
+        for seg in self.segments:
+            merged: dict[int, int] = {}
+            for term in dict.fromkeys(terms):
+                for doc, hits in seg.count(term):
+                    merged[doc] = merged.get(doc, 0) + hits
+            out.extend((seg, doc, merged[doc]) for doc in sorted(merged))
+        return out
+
+    def docs_for_work(self, work: str) -> list[tuple[Segment, int]]:
+        """該佛典在索引中的各卷 [(segment, doc)]，依卷號排序。"""
+        if self._work_docs is None:
+            work_docs: dict[str, list[tuple[Segment, int]]] = {}
+            for seg in self.segments:
+                for doc, d in enumerate(seg.docs):
+                    if doc in seg.deleted:
+                        continue
+                    work_docs.setdefault(d.work, []).append((seg, doc))
+            for docs in work_docs.values():
+                docs.sort(key=lambda sd: sd[0].docs[sd[1]].juan)
+            self._work_docs = work_docs
+        return self._work_docs.get(work, [])
+
+    def notes_for_line(self, linehead: str) -> dict[str, str] | None:
+        """該行錨點對應的腳註 {id: 內容}；本地索引沒有該行的註解時回傳 None。"""
+        if self._line_notes is None:
+            line_notes: dict[str, dict[str, str]] = {}
+            for seg in self.segments:
+                store = seg.notes
+                for i in seg.live_notes():
+                    if store.ids[i] is not None and store.lineheads[i]:
+                        line_notes.setdefault(store.lineheads[i], {})[store.ids[i]] = store.contents[i]
+            self._line_notes = line_notes
+        return self._line_notes.get(linehead)
+
+    @staticmethod
+    def doc_record(seg: Segment, doc: int) -> dict:
+        """組出與 /search 結果相近的卷資料。"""
+        d = seg.docs[doc]
+        return {
+            "work": d.work,
+            "juan": d.juan,
+            "vol": d.vol,
+            "title": d.title,
+            "canon": seg.labels["canon"][seg.columns["canon"][doc]] or None,
+            "category": seg.labels["category"][seg.columns["category"][doc]] or None,
+            "creators": ",".join(seg.labels["creator"][c] for c in seg.creators(doc)) or None,
+        }
+
+
+class _Labels:
+    """facet 標籤表：值 → 代碼，依首次出現的順序編號（空值為 ""）。"""
+
+    def __init__(self):
+        self.labels: dict[str, list[str]] = {name: [] for name in FACETS}
+        self.codes: dict[str, dict[str, int]] = {name: {} for name in FACETS}
+
+    def code(self, facet: str, value: str | None) -> int:
+        value = value or ""
+        table = self.codes[facet]
+        if value not in table:
+            table[value] = len(self.labels[facet])
+            self.labels[facet].append(value)
+        return table[value]
+
+
+def write_segment(
+    path: pathlib.Path,
+    docs: list[dict],
+    texts: list[tuple[list[str], list[str]]],
+    notes: list[list[dict]] | None = None,
+) -> None:
+    """
+    寫出一個 segment。
+
+    docs[i] 需含 work、juan，可含 vol、title、canon、category、dynasty、creators（list[str]）；
+    texts[i] 為 (lineheads, 每行文字)；notes[i] 為該卷的註解 [{id, linehead, place, content}]。
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    labels = _Labels()
+    code = labels.code
+
+    columns: dict[str, list[int]] = {name: [] for name in SINGLE_VALUED_FACETS}
+    creator_offsets = [0]
+    creator_codes: list[int] = []
+    postings: dict[str, list[int]] = {}
+    for i, (doc, (lineheads, line_texts)) in enumerate(zip(docs, texts)):
+        for name in SINGLE_VALUED_FACETS:
+            columns[name].append(code(name, doc.get(name)))
+        creator_codes.extend(code("creator", c) for c in doc.get("creators") or [])
+        creator_offsets.append(len(creator_codes))
+        for gram in bigrams("".join(line_texts)):
+            postings.setdefault(gram, []).append(i)
+
+    meta = {
+        "docs": [{k: d.get(k) for k in ("work", "juan", "vol", "title")} for d in docs],
+        "labels": labels.labels,
+        "columns": columns,
+        "creator": {"offsets": creator_offsets, "codes": creator_codes},
+    }
+    (path / "docs.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    with open(path / "text.jsonl", "w", encoding="utf-8") as f:
+        for lineheads, line_texts in texts:
+            f.write(json.dumps({"lineheads": lineheads, "texts": line_texts}, ensure_ascii=False) + "\n")
+    (path / "postings.json").write_bytes(dumps(postings))
+
+    note_columns: dict[str, list] = {
+        "docs": [], "ids": [], "lineheads": [], "places": [], "contents": [], "offsets": [],
+    }
+    note_postings: dict[str, list[int]] = {}
+    for doc, doc_notes in enumerate(notes or []):
+        for note in doc_notes:
+            ordinal = len(note_columns["contents"])
+            note_columns["docs"].append(doc)
+            note_columns["ids"].append(note.get("id"))
+            note_columns["lineheads"].append(note.get("linehead"))
+            note_columns["places"].append(note["place"])
+            note_columns["contents"].append(note["content"])
+            note_columns["offsets"].append(note.get("offset"))
+            for gram in bigrams(note["content"]):
+                note_postings.setdefault(gram, []).append(ordinal)
+    (path / "notes.json").write_text(json.dumps(note_columns, ensure_ascii=False), encoding="utf-8")
+    (path / "note_postings.json").write_bytes(dumps(note_postings))
+
+
+def merge_segments(
+    inputs: list[pathlib.Path],
+    out: pathlib.Path,
+    deleted: list[frozenset[int]] | None = None,
+) -> list[dict[int, int]]:
+    """
+    k 路合併多個 segment（各自依 (work, juan) 排序）成一個，直接搬移已算好的資料：
+    卷依 (work, juan) 以 heapq.merge 交錯、文字逐行串流複製、facet 標籤表重新編碼，
+    bigram 倒排表逐字組把各輸入重新編號後的遞增串列合併，不需重新解析或重算 bigram。
+
+    deleted[i] 中的卷不搬移。回傳每個輸入的 {原 doc: 新 doc}。
+    """
+    deleted = deleted or [frozenset()] * len(inputs)
+    metas = [json.loads((p / "docs.json").read_text(encoding="utf-8")) for p in inputs]
+    order = heapq.merge(*(
+        [(d["work"], d["juan"], i, doc) for doc, d in enumerate(meta["docs"]) if doc not in deleted[i]]
+        for i, meta in enumerate(metas)
+    ))
+
+    out.mkdir(parents=True, exist_ok=True)
+    labels = _Labels()
+    docs: list[dict] = []
+    columns: dict[str, list[int]] = {name: [] for name in SINGLE_VALUED_FACETS}
+    creator_offsets = [0]
+    creator_codes: list[int] = []
+    mappings: list[dict[int, int]] = [{} for _ in inputs]
+    note_columns: dict[str, list] = {
+        "docs": [], "ids": [], "lineheads": [], "places": [], "contents": [], "offsets": [],
+    }
+    note_mappings: list[dict[int, int]] = [{} for _ in inputs]
+    notes = [
+        json.loads((p / "notes.json").read_text(encoding="utf-8")) if (p / "notes.json").exists() else None
+        for p in inputs
+    ]
+    for store in notes:
+        if store is not None and not store.get("offsets"):  # 舊版 segment 沒有夾注位移
+            store["offsets"] = [None] * len(store["docs"])
+    readers = [open(p / "text.jsonl", encoding="utf-8") for p in inputs]
+    cursors = [0] * len(inputs)
+    try:
+        with open(out / "text.jsonl", "w", encoding="utf-8") as text_out:
+            for _, _, i, doc in order:
+                new_doc = len(docs)
+                mappings[i][doc] = new_doc
+                meta = metas[i]
+                docs.append(meta["docs"][doc])
+                for name in SINGLE_VALUED_FACETS:
+                    columns[name].append(labels.code(name, meta["labels"][name][meta["columns"][name][doc]]))
+                creators = meta["creator"]
+                for c in creators["codes"][creators["offsets"][doc]:creators["offsets"][doc + 1]]:
+                    creator_codes.append(labels.code("creator", meta["labels"]["creator"][c]))
+                creator_offsets.append(len(creator_codes))
+
+                while cursors[i] < doc:  # 跳過已刪除的卷
+                    readers[i].readline()
+                    cursors[i] += 1
+                text_out.write(readers[i].readline())
+                cursors[i] += 1
+
+                store = notes[i]
+                if store:
+                    lo, hi = bisect_left(store["docs"], doc), bisect_right(store["docs"], doc)
+                    for ordinal in range(lo, hi):
+                        note_mappings[i][ordinal] = len(note_columns["docs"])
+                        note_columns["docs"].append(new_doc)
+                        for name in ("ids", "lineheads", "places", "contents", "offsets"):
+                            note_columns[name].append(store[name][ordinal])
+    finally:
+        for f in readers:
+            f.close()
+
+    def merge_postings(name: str, maps: list[dict[int, int]]) -> dict[str, list[int]]:
+        runs: dict[str, list[list[int]]] = {}
+        for p, mapping in zip(inputs, maps):
+            if not (p / name).exists():
+                continue
+            for gram, ids in loads((p / name).read_bytes()).items():
+                remapped = [x for x in map(mapping.get, ids) if x is not None]
+                if remapped:
+                    runs.setdefault(gram, []).append(remapped)
+        # 各輸入重新編號後仍為遞增串列；只出現在一個輸入的字組直接沿用，
+        # 其餘交給 timsort，k 段已排序串列的合併為線性
+        return {gram: r[0] if len(r) == 1 else sorted(chain.from_iterable(r)) for gram, r in runs.items()}
+
+    meta = {
+        "docs": docs,
+        "labels": labels.labels,
+        "columns": columns,
+        "creator": {"offsets": creator_offsets, "codes": creator_codes},
+    }
+    (out / "docs.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    (out / "postings.json").write_bytes(dumps(merge_postings("postings.json", mappings)))
+    (out / "notes.json").write_text(json.dumps(note_columns, ensure_ascii=False), encoding="utf-8")
+    (out / "note_postings.json").write_bytes(dumps(merge_postings("note_postings.json", note_mappings)))
+    return mappings
+
+
+def read_manifest(root: pathlib.Path) -> dict:
+    return json.loads((root / MANIFEST).read_text(encoding="utf-8"))
+
+
+def write_manifest(root: pathlib.Path, manifest: dict) -> None:
+    """寫入暫存檔後以 os.replace 原子替換，讀取端不會讀到寫到一半的 manifest。"""
+    manifest = {**manifest, "version": 2, "generation": manifest.get("generation", 0) + 1}
+    tmp = root / f"{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, root / MANIFEST)
+
+
+_index: CorpusIndex | None = None
+_index_loaded = False
+_manifest_mtime: int | None = None
+_checked_at = 0.0
+_reloading = threading.Lock()
+
+
+def _manifest_stat() -> int | None:
+    try:
+        return (pathlib.Path(INDEX_DIR) / MANIFEST).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _reload(mtime: int) -> None:
+    global _index, _manifest_mtime
+    try:
+        _index = CorpusIndex(pathlib.Path(INDEX_DIR), previous=_index)
+        _manifest_mtime = mtime
+    except Exception as e:
+        print(f"❌ 本地索引重新載入失敗：{INDEX_DIR}, error: {e}")
+    finally:
+        _reloading.release()
+
+
+def get_index() -> CorpusIndex | None:
+    """
+    載入（並快取）CBETA_INDEX_DIR 指定的本地索引；未設定或失敗時回傳 None。
+
+    之後每 RELOAD_INTERVAL 秒檢查 manifest，更新時在背景執行緒載入新版後替換，期間回傳舊版。
+    """
+    global _index, _index_loaded, _manifest_mtime, _checked_at
+    if not _index_loaded:
+        _index_loaded = True
+        _checked_at = time.monotonic()
+        _manifest_mtime = _manifest_stat() if INDEX_DIR else None
+        if _manifest_mtime is not None:
+            try:
+                _index = CorpusIndex(pathlib.Path(INDEX_DIR))
+            except Exception as e:
+                print(f"❌ 本地索引載入失敗：{INDEX_DIR}, error: {e}")
+    elif INDEX_DIR and time.monotonic() - _checked_at >= RELOAD_INTERVAL:
+        _checked_at = time.monotonic()
+        mtime = _manifest_stat()
+        if mtime is not None and mtime != _manifest_mtime and _reloading.acquire(blocking=False):
+            threading.Thread(target=_reload, args=(mtime,), name="cbeta-index-reload", daemon=True).start()
+    return _index
@@ -0,0 +1,210 @@
+"""
+整部佛典匯出：並行取得各卷，串流寫入 JSONL 或純文字檔，中斷後可續傳。
+
+- 範圍：單部佛典（work），或藏經冊數範圍（canon + vol_start/vol_end，與 search_buddhist_canons_by_vol
+  同一個 /works 查詢）。卷號取自 /works 的 juan_start 與 juan（卷數）。
+- 各卷以 concurrency 個並行請求直接向上游取 /juans，不經 response_cache / juan_text_cache，
+  避免大量匯出擠掉服務常用的快取；解碼與 HTML 解析經 _offload 移出事件迴圈。
+- 輸出依完成順序寫入（每筆都帶 work / juan）。每卷寫完後在「輸出檔.ckpt」追加 {"work", "juan", "offset"}；
+  續傳時把輸出檔截到最後一個檢查點的位移（丟掉寫到一半的卷）、把檢查點檔截到最後一行完整的紀錄，
+  並跳過已完成的卷。
+  失敗的卷不寫入檢查點，重跑即重試；輸出格式或註解模式與檢查點不同時從頭匯出。
+- 命令列：python -m tools.cebta._export T0001 T0001.jsonl，進度與吞吐（juans/s、MB/s）輸出到 stderr。
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import pathlib
+import sys
+import time
+from typing import Any, Callable
+
+from tools.cebta import _offload
+from tools.cebta._http import close_client, dumps, fetch, get_json, loads
+from tools.cebta._juan_text import NOTE_MODES, JuanText, extract_html
+
+FORMATS = ("jsonl", "text")
+PROGRESS_INTERVAL = 1.0
+
+
+async def list_juans(work: str | None = None, canon: str | None = None,
+                     vol_start: int | None = None, vol_end: int | None = None) -> list[tuple[str, int, str | None]]:
+    """要匯出的 [(work, juan, title)]，依佛典與卷號排序。"""
+    if work:
+        data = await get_json("/works", {"work": work})
+    else:
+        data = await get_json("/works", {"canon": canon, "vol_start": vol_start, "vol_end": vol_end})
+    jobs = []
+    for info in data.get("results", []):
+        first = int(info.get("juan_start") or 1)
+        jobs.extend((info["work"], juan, info.get("title")) for juan in range(first, first + int(info.get("juan") or 0)))
+    return jobs
+
+
+async def fetch_juan(work: str, juan: int) -> JuanText:
+    response = await fetch("/juans", {"work": work, "juan": juan, "work_info": 0, "toc": 0}, timeout=30.0)
+    data = await _offload.run(loads, response.content, size=len(response.content))
+    results = data.get("results") or []
+    if not results:
+        raise LookupError(f"查無 {work} 第 {juan} 卷")
+    item = results[0]
+    html = item.get("html", "") if isinstance(item, dict) else str(item)
+    return await _offload.run(extract_html, html, size=len(html))
+
+
+def render_record(work: str, juan: int, title: str | None, juan_text: JuanText, fmt: str, note_mode: str) -> bytes:
+    if fmt == "jsonl":
+        return dumps({"work": work, "juan": juan, "title": title, **juan_text.render("lines", note_mode)}) + b"\n"
+    body = juan_text.render("text", note_mode)
+    notes = "".join(f"[{k}] {v}\n" for k, v in (body.get("notes") or {}).items())
+    return f"# {work} {title or ''} 卷{juan}\n{body['text']}\n{notes}\n".encode("utf-8")
+
+
+def _resume(out: pathlib.Path, ckpt: pathlib.Path, meta: dict) -> tuple[set[tuple[str, int]], int]:
+    """讀取檢查點，回傳 (已完成的卷, 輸出檔有效長度)；無法續傳時回傳 (空集合, 0)。"""
+    if not (out.exists() and ckpt.exists()):
+        return set(), 0
+    text = ckpt.read_text(encoding="utf-8")
+    lines = text.splitlines()
+    try:
+        if json.loads(lines[0]) != meta:
+            return set(), 0
+    except (IndexError, ValueError):
+        return set(), 0
+    done, offset, valid = set(), 0, 1
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:  # 中斷時寫到一半的檢查點
+            break
+        done.add((entry["work"], entry["juan"]))
+        offset = entry["offset"]
+        valid += 1
+    if offset > out.stat().st_size:
+        return set(), 0
+    if valid < len(lines) or not text.endswith("\n"):
+        # 截掉寫到一半的檢查點，之後以 "a" 模式追加時才不會接在殘行後面
+        ckpt.write_text("".join(line + "\n" for line in lines[:valid]), encoding="utf-8")
+    return done, offset
+
+
+async def export(
+    jobs: list[tuple[str, int, str | None]],
+    out: pathlib.Path,
+    fmt: str = "jsonl",
+    note_mode: str = "separate",
+    concurrency: int = 8,
+    progress: Callable[[dict], Any] | None = None,
+) -> dict:
+    """匯出 jobs 中尚未完成的卷到 out；progress 約每秒與結束時各呼叫一次（可為 async 函式）。"""
+    meta = {"format": fmt, "notes": note_mode}
+    ckpt = out.with_name(out.name + ".ckpt")
+    done, offset = _resume(out, ckpt, meta)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if not done:
+        ckpt.write_text(json.dumps(meta) + "\n", encoding="utf-8")
+        out.write_bytes(b"")
+        offset = 0
+    todo = [job for job in jobs if job[:2] not in done]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(work: str, juan: int, title: str | None) -> tuple[str, int, bytes | Exception]:
+        try:
+            async with semaphore:
+                juan_text = await fetch_juan(work, juan)
+            return work, juan, render_record(work, juan, title, juan_text, fmt, note_mode)
+        except Exception as e:
+            return work, juan, e
+
+    started = last_report = time.perf_counter()
+    exported, written, failed = 0, 0, []
+
+    def report() -> dict:
+        elapsed = time.perf_counter() - started
+        return {
+            "done": exported + len(failed),
+            "total": len(todo),
+            "elapsed": elapsed,
+            "juans_per_second": exported / elapsed if elapsed else 0.0,
+            "mb_per_second": written / 1e6 / elapsed if elapsed else 0.0,
+        }
+
+    async def notify(stats: dict) -> None:
+        if progress is not None:
+            result = progress(stats)
+            if inspect.isawaitable(result):
+                await result
+
+    with open(out, "r+b") as f, open(ckpt, "a", encoding="utf-8") as checkpoint:
+        f.truncate(offset)
+        f.seek(offset)
+        for job in asyncio.as_completed([one(*job) for job in todo]):
+            work, juan, record = await job
+            if isinstance(record, Exception):
+                failed.append({"work": work, "juan": juan, "error": str(record)})
+            else:
+                f.write(record)
+                f.flush()
+                offset += len(record)
+                written += len(record)
+                exported += 1
+                checkpoint.write(json.dumps({"work": work, "juan": juan, "offset": offset}) + "\n")
+                checkpoint.flush()
+            if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.perf_counter()
+                await notify(report())
+
+    stats = report()
+    await notify(stats)
+    return {
+        "path": str(out),
+        "format": fmt,
+        "juans": len(jobs),
+        "exported": exported,
+        "skipped": len(jobs) - len(todo),
+        "failed": failed,
+        "bytes": offset,
+        "elapsed": stats["elapsed"],
+        "juans_per_second": stats["juans_per_second"],
+        "mb_per_second": stats["mb_per_second"],
+    }
+
+
+def print_progress(p: dict) -> None:
+    print(f"{p['done']}/{p['total']} juans, {p['juans_per_second']:.1f} juans/s, "
+          f"{p['mb_per_second']:.2f} MB/s, {p['elapsed']:.1f}s", file=sys.stderr, flush=True)
+
+
+async def _main(args) -> dict:
+    try:
+        jobs = await list_juans(args.work, args.canon, args.vol_start, args.vol_end)
+        if not jobs:
+            raise SystemExit("找不到可匯出的卷")
+        return await export(jobs, args.output, args.format, args.notes, args.concurrency, print_progress)
+    finally:
+        await close_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export whole CBETA works juan by juan")
+    parser.add_argument("work", nargs="?", help="佛典編號，如 T0001；省略時以 --canon/--vol-start/--vol-end 指定範圍")
+    parser.add_argument("output", type=pathlib.Path, help="輸出檔（同目錄另存 .ckpt 檢查點）")
+    parser.add_argument("--canon", help="藏經 ID，如 T")
+    parser.add_argument("--vol-start", type=int, help="開始冊數")
+    parser.add_argument("--vol-end", type=int, help="結束冊數")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--notes", choices=NOTE_MODES, default="separate")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時進行的上游請求數")
+    args = parser.parse_args()
+    if not args.work and not (args.canon and args.vol_start and args.vol_end):
+        parser.error("需指定 work，或 --canon、--vol-start、--vol-end")
+    summary = asyncio.run(_main(args))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+本地 facet 聚合：一次走訪命中卷的 posting list，同時計算多個 facet 的 docs / hits。
+
+每個 segment 內以 facet 標籤代碼為索引累加（bincount 式計數），
+最後再依標籤字串合併各 segment 的結果。canon 另附 canon_name（與 CBETA API 相同）。
+"""
+
+from tools.cebta._corpus import FACETS, SINGLE_VALUED_FACETS, CorpusIndex
+
+# 藏經 ID → 名稱（CBETA facet API 的 canon_name）
+CANON_NAMES = {
+    "A": "金藏", "B": "補編", "C": "中華藏", "D": "國圖善本", "F": "房山石經", "G": "佛教大藏經",
+    "GA": "中國佛寺史志彙刊", "GB": "中國佛寺志叢刊", "I": "佛教石刻拓片百品", "J": "嘉興藏", "K": "高麗藏",
+    "L": "乾隆藏", "LC": "呂澂佛學著作集", "M": "卍正藏", "N": "南傳大藏經", "P": "永樂北藏", "S": "宋藏遺珍",
+    "T": "大正藏", "TX": "太虛大師全書", "U": "洪武南藏", "X": "新纂卍續藏", "Y": "印順法師佛學著作集",
+    "ZS": "正史佛教資料類編", "ZW": "藏外佛教文獻",
+}
+
+
+def aggregate(index: CorpusIndex, term: str, facets: list[str]) -> dict[str, list[dict]]:
+    """回傳 {facet: [{facet: 值, "docs": 卷數, "hits": 命中數}, ...]}，依 docs 由多到少排序。"""
+    return aggregate_matches(((seg, seg.count(term)) for seg in index.segments), facets)
+
+
+def aggregate_matches(matches_by_segment, facets: list[str]) -> dict[str, list[dict]]:
+    """同 aggregate，但命中卷由呼叫端提供：[(segment, [(doc, hits), ...]), ...]。"""
+    totals: dict[str, dict[str, list[int]]] = {name: {} for name in facets}
+    for seg, matches in matches_by_segment:
+        if not matches:
+            continue
+        docs_bins = {name: [0] * len(seg.labels[name]) for name in facets}
+        hits_bins = {name: [0] * len(seg.labels[name]) for name in facets}
+        columns = [(name, seg.columns[name]) for name in facets if name in SINGLE_VALUED_FACETS]
+        with_creator = "creator" in facets
+        for doc, hits in matches:
+            for name, column in columns:
+                code = column[doc]
+                docs_bins[name][code] += 1
+                hits_bins[name][code] += hits
+            if with_creator:
+                for code in seg.creators(doc):
+                    docs_bins["creator"][code] += 1
+                    hits_bins["creator"][code] += hits
+        for name in facets:
+            labels = seg.labels[name]
+            merged = totals[name]
+            for code, docs in enumerate(docs_bins[name]):
+                if docs:
+                    bucket = merged.setdefault(labels[code], [0, 0])
+                    bucket[0] += docs
+                    bucket[1] += hits_bins[name][code]
+
+    out = {
+        name: [
+            {name: label, "docs": docs, "hits": hits}
+            for label, (docs, hits) in sorted(buckets.items(), key=lambda kv: (-kv[1][0], kv[0]))
+            if label
+        ]
+        for name, buckets in totals.items()
+    }
+    for bucket in out.get("canon", []):
+        bucket["canon_name"] = CANON_NAMES.get(bucket["canon"])
+    return out
+
+
+def parse_facets(f: str) -> list[str]:
+    """解析 f 參數：'canon'、'canon,dynasty' 或 'all'；有未知 facet 時拋出 ValueError。"""
+    names = list(FACETS) if f.strip() == "all" else [n.strip() for n in f.split(",") if n.strip()]
+    unknown = [n for n in names if n not in FACETS]
+    if unknown or not names:
+        raise ValueError(f"不支援的 facet 類型：{', '.join(unknown) or f}，可用 {'/'.join(FACETS)}")
+    return list(dict.fromkeys(names))
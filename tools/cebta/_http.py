@@ -0,0 +1,272 @@
+"""
+CBETA API 共用 HTTP 用戶端與 JSON 編解碼。
+
+- 所有工具共用同一個 httpx.AsyncClient（連線池、keep-alive），不再每次呼叫重建連線。
+- JSON 解碼優先使用 orjson，未安裝時退回標準庫 json。
+- get_json(select=...) 在解碼後立即套用欄位投影，不需要的子樹不會傳到後續序列化；
+  transform 為解碼後的後處理，與解碼一起在回應夠大時移出事件迴圈（見 _offload）。
+- get_raw() 取得上游原始位元組，可搭配 main.raw_success_response() 直接包進回應，
+  省去 decode → encode 的來回。
+- get_json() / get_raw() 共用回應快取（response_cache），以正規化後的 (path, 參數) 為鍵（見 _query）
+  保存上游原始位元組；查詢字串應先經 _zhconv.to_traditional() 轉換，簡繁兩種寫法才會命中同一筆。
+  分頁 API 的小頁面若落在已快取的大頁面範圍內，直接從大頁面切出。
+- 命中率（含「只用原始參數當鍵」時的基準命中率）輸出於 /metrics 的 response_cache。
+  容量由 CBETA_RESPONSE_CACHE_SIZE 設定（預設 512；0 表示不快取，供量測上游延遲用）。
+- 回應快取預設為 W-TinyLFU（_cache.TinyLFUCache），另以 CBETA_RESPONSE_CACHE_BYTES（預設 64 MiB）限制總位元組數，
+  依存取頻率與大小決定准入，一次性的大回應不會擠掉常用的小回應；CBETA_RESPONSE_CACHE_POLICY=lru 改回單純 LRU。
+- 上游回應帶 ETag / Last-Modified 時記下驗證資訊；快取項目過期後先以 If-None-Match / If-Modified-Since
+  條件式請求，304 時沿用舊內容並重新計時，不必重新下載與解碼卷文、目次。
+- access_hooks 內的函式在每次 get_raw() 時以 (path, params) 呼叫（含快取命中），供 _warm 統計熱度。
+- 設定 CBETA_HTTP_RECORD / CBETA_HTTP_REPLAY 時改用錄製／重播傳輸層（見 _replay）。
+"""
+
+import json
+import os
+from typing import Any, Callable
+
+import httpx
+
+from tools.cebta import _metrics, _offload, _replay, _tracing
+from tools.cebta._cache import LRUCache, TinyLFUCache
+from tools.cebta._projection import project
+from tools.cebta._query import cache_key, page_key
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用相依
+    orjson = None
+
+API_BASE = os.getenv("CBETA_API_BASE", "https://api.cbetaonline.cn").rstrip("/")
+
+_client: httpx.AsyncClient | None = None
+
+# CBETA 資料幾乎不變動，快取上游回應的原始位元組（解碼後的物件可能被呼叫端修改，故不快取）
+_CACHE_SIZE = int(os.getenv("CBETA_RESPONSE_CACHE_SIZE", "512"))
+if os.getenv("CBETA_RESPONSE_CACHE_POLICY", "tinylfu") == "lru":
+    response_cache = LRUCache(maxsize=_CACHE_SIZE, ttl=600, on_expire=lambda key, content: _keep_stale(key, content))
+else:
+    response_cache = TinyLFUCache(
+        maxsize=_CACHE_SIZE, maxbytes=int(os.getenv("CBETA_RESPONSE_CACHE_BYTES", str(64 * 2**20))), ttl=600,
+        on_expire=lambda key, content: _keep_stale(key, content),
+    )
+
+# 分頁 API：不含 start/rows 的鍵 → 已快取的頁面 [(start, rows, 快取鍵)]
+_pages = LRUCache(maxsize=512, ttl=600)
+
+# 原始（未正規化）參數鍵，只用來估算不做正規化時的基準命中率
+_raw_keys = LRUCache(maxsize=512, ttl=600)
+
+# 快取鍵 → (ETag, Last-Modified)，只記上游有提供驗證資訊的回應
+_validators = LRUCache(maxsize=4096)
+
+# 已過期、等待條件式請求重新驗證的內容：快取鍵 → (內容, ETag, Last-Modified)
+_stale = LRUCache(maxsize=64)
+
+
+def _keep_stale(key: tuple, content: bytes) -> None:
+    validators = _validators.get(key)
+    if validators is not None:
+        _stale.set(key, (content, *validators))
+
+
+# get_raw() 每次存取時呼叫的 hook(path, params)
+access_hooks: list[Callable[[str, dict | None], None]] = []
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def get_client() -> httpx.AsyncClient:
+    """取得共用的 AsyncClient，首次使用或被關閉後自動建立。"""
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        _client = httpx.AsyncClient(
+            timeout=20.0,
+            limits=limits,
+            transport=_replay.transport_from_env(API_BASE, limits),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+async def fetch(
+    path: str,
+    params: dict | None = None,
+    timeout: float = 20.0,
+    follow_redirects: bool = True,
+    headers: dict | None = None,
+) -> httpx.Response:
+    """
+    以 GET 呼叫 CBETA API（path 如 '/search'），非 2xx 時拋出 httpx.HTTPStatusError；
+    follow_redirects=False 時 3xx 原樣回傳，由呼叫端讀取 location；條件式請求的 304 也原樣回傳。
+    """
+    with _tracing.span(f"upstream GET {path}", **{"http.url": f"{API_BASE}{path}"}) as s:
+        resp = await get_client().get(
+            f"{API_BASE}{path}",
+            params=params,
+            timeout=timeout,
+            follow_redirects=follow_redirects,
+            headers=headers,
+            extensions={"trace": _tracing.http_trace_hook(s)} if s.sampled else None,
+        )
+        s.set(**{"http.status_code": resp.status_code, "http.response_bytes": len(resp.content)})
+    if not (resp.is_redirect and not follow_redirects) and resp.status_code != 304:
+        resp.raise_for_status()
+    return resp
+
+
+def _decode(content: bytes, select: str | None, transform: Callable[[Any], Any] | None) -> Any:
+    data = project(loads(content), select)
+    return transform(data) if transform is not None else data
+
+
+async def get_json(
+    path: str,
+    params: dict | None = None,
+    timeout: float = 20.0,
+    select: str | None = None,
+    transform: Callable[[Any], Any] | None = None,
+) -> Any:
+    """
+    取得並解碼 JSON；select 為欄位選擇器（見 _projection），解碼後立即裁剪，
+    transform(data) 再做後處理（須為不依賴事件迴圈的純函式）。
+    """
+    content = await get_raw(path, params, timeout)
+    with _tracing.span("json.decode", bytes=len(content)):
+        return await _offload.run(_decode, content, select, transform, size=len(content))
+
+
+def _raw_key(path: str, params: dict | None) -> tuple:
+    return path, tuple(sorted((k, repr(v)) for k, v in (params or {}).items()))
+
+
+def _remember_page(path: str, params: dict | None, key: tuple) -> None:
+    page = page_key(path, params)
+    if page is None:
+        return
+    base, start, rows = page
+    pages = [p for p in _pages.get(base) or () if p[2] in response_cache and p[2] != key]
+    _pages.set(base, [*pages[-7:], (start, rows, key)])
+
+
+def _from_larger_page(path: str, params: dict | None) -> bytes | None:
+    """若有已快取的頁面涵蓋所求的 [start, start + rows)，切出該範圍並重新編碼。"""
+    page = page_key(path, params)
+    if page is None:
+        return None
+    base, start, rows = page
+    for cached_start, cached_rows, key in _pages.get(base) or ():
+        if start < cached_start:
+            continue
+        content = response_cache.get(key)
+        if content is None:
+            continue
+        data = loads(content)
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            continue
+        # 上游回傳不足 cached_rows 筆表示已到結尾，之後的範圍也都涵蓋在內
+        if start + rows > cached_start + cached_rows and len(results) >= cached_rows:
+            continue
+        offset = start - cached_start
+        sliced = {**data, "results": results[offset:offset + rows]}
+        for name, value in (("start", start), ("rows", rows)):
+            if name in data:
+                sliced[name] = value
+        return dumps(sliced)
+    return None
+
+
+async def get_raw(path: str, params: dict | None = None, timeout: float = 20.0) -> bytes:
+    """取得上游原始位元組：先查 response_cache，再找涵蓋此頁的已快取頁面，最後才呼叫上游。"""
+    for hook in access_hooks:
+        hook(path, params)
+    raw_key = _raw_key(path, params)
+    if _raw_keys.get(raw_key) is not None:
+        _metrics.incr("response_cache.baseline_hits")
+    _raw_keys.set(raw_key, True)
+
+    with _tracing.span("cache.lookup") as s:
+        key = cache_key(path, params)
+        content = response_cache.get(key)
+        if content is not None:
+            _metrics.incr("response_cache.hits")
+            s.set(result="hit")
+            return content
+        content = _from_larger_page(path, params)
+        if content is not None:
+            _metrics.incr("response_cache.page_hits")
+            s.set(result="page_hit")
+            return content
+        s.set(result="miss")
+    _metrics.incr("response_cache.misses")
+    content = await _fetch_content(path, params, timeout, key)
+    response_cache.set(key, content)
+    _remember_page(path, params, key)
+    return content
+
+
+async def _fetch_content(path: str, params: dict | None, timeout: float, key: tuple) -> bytes:
+    """
+    向上游取回內容；有過期內容與驗證資訊時送條件式請求，304 即沿用舊內容。
+    過期內容在取得 200／304 後才移除，請求失敗時保留給下一次重新驗證。
+    """
+    stale = _stale.get(key)
+    headers = None
+    if stale is not None:
+        _, etag, last_modified = stale
+        headers = {name: value for name, value in (("If-None-Match", etag), ("If-Modified-Since", last_modified)) if value}
+    resp = await fetch(path, params, timeout, headers=headers)
+    if stale is not None:
+        _stale.pop(key)
+    if resp.status_code == 304 and stale is not None:
+        _metrics.incr("response_cache.revalidated")
+        _metrics.incr("response_cache.revalidated_bytes", len(stale[0]))
+        return stale[0]
+    if stale is not None:
+        _metrics.incr("response_cache.revalidate_changed")
+    etag, last_modified = resp.headers.get("etag"), resp.headers.get("last-modified")
+    if etag or last_modified:
+        _validators.set(key, (etag, last_modified))
+    else:
+        _validators.pop(key)
+    return resp.content
+
+
+def cache_stats() -> dict:
+    counters = _metrics.counters
+    hits = counters["response_cache.hits"] + counters["response_cache.page_hits"]
+    lookups = hits + counters["response_cache.misses"]
+    # 快取本身的大小與准入統計（命中數以上方計數器為準，含分頁命中）
+    policy = {k: v for k, v in response_cache.stats().items() if k not in ("hits", "misses")}
+    return {
+        **policy,
+        "lookups": lookups,
+        "hits": counters["response_cache.hits"],
+        "page_hits": counters["response_cache.page_hits"],
+        "misses": counters["response_cache.misses"],
+        "revalidated": counters["response_cache.revalidated"],
+        "revalidated_bytes": counters["response_cache.revalidated_bytes"],
+        "revalidate_changed": counters["response_cache.revalidate_changed"],
+        "hit_rate": _metrics.ratio(hits, lookups),
+        "baseline_hit_rate": _metrics.ratio(counters["response_cache.baseline_hits"], lookups),
+    }
+
+
+_metrics.register("response_cache", cache_stats)
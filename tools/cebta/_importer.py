@@ -0,0 +1,492 @@
+"""
+CBETA 語料匯入：由本地語料目錄建立 tools/cebta/_corpus.py 使用的索引。
+
+語料目錄結構：
+
+    <source>/
+      works.jsonl                 每行一筆 /works 回傳的佛典資料（work、title、canon、
+                                  category、time_dynasty、creators、vol …）
+      juans/<work>/<juan>.html    /juans 回傳的卷 HTML（results[].html），檔名為卷號，如 001.html
+
+用法：
+    python -m tools.cebta._importer <source_dir> <index_dir> [--suffix-array] [--workers N]
+    python -m tools.cebta._importer <source_dir> <index_dir> --update     # 增量更新（CBETA 新版語料）
+    python -m tools.cebta._importer <index_dir> --compact                 # 只合併 segment
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import pathlib
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from tools.cebta._corpus import MANIFEST, Segment, merge_segments, read_manifest, write_manifest, write_segment
+from tools.cebta._juan_text import extract_html
+from tools.cebta._suffix_array import build as build_suffix_array
+
+# segment 數超過此值時，增量更新後合併最小的幾個
+MAX_SEGMENTS = 8
+
+
+def load_works(source: pathlib.Path) -> dict[str, dict]:
+    works: dict[str, dict] = {}
+    path = source / "works.jsonl"
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for row in f:
+                if row.strip():
+                    record = json.loads(row)
+                    works[record["work"]] = record
+    return works
+
+
+def list_juan_files(source: pathlib.Path) -> list[tuple[str, int, pathlib.Path]]:
+    files = []
+    for path in sorted((source / "juans").glob("*/*.html")):
+        if path.stem.isdigit():
+            files.append((path.parent.name, int(path.stem), path))
+    return files
+
+
+def doc_metadata(work: str, juan: int, info: dict) -> dict:
+    creators = info.get("creators") or ""
+    if isinstance(creators, str):
+        creators = [c.strip() for c in creators.split(",") if c.strip()]
+    return {
+        "work": work,
+        "juan": juan,
+        "vol": info.get("vol"),
+        "title": info.get("title"),
+        "canon": info.get("canon") or re.match(r"[A-Z]+", work).group(0),
+        "category": info.get("category"),
+        "dynasty": info.get("time_dynasty"),
+        "creators": creators,
+    }
+
+
+def parse_juan(path: pathlib.Path) -> tuple[tuple[list[str], list[str]], list[dict]]:
+    """
+    回傳 ((lineheads, 每行文字), 註解)；註解含腳註（依錨點定位行首）與夾注。
+
+    夾注文字也在正文中，另記下它在全卷文字中的起始位移（offset），供 KWIC 排除夾注。
+    """
+    juan_text = extract_html(path.read_text(encoding="utf-8"))
+    texts, offsets = juan_text.line_index("none")
+    lineheads = [line.linehead or "" for line in juan_text.lines]
+    anchors = juan_text.note_lineheads()
+    notes = [
+        {"id": note_id, "linehead": anchors.get(note_id), "place": "foot", "content": content}
+        for note_id, content in juan_text.notes.items()
+    ]
+    full_text = "".join(texts)
+    line_offset = {}
+    for linehead, offset in zip(lineheads, offsets):
+        line_offset.setdefault(linehead, offset)
+    search_from = 0
+    for linehead, content in juan_text.inline_notes:
+        pos = full_text.find(content, max(search_from, line_offset.get(linehead or "", 0)))
+        if pos >= 0:
+            search_from = pos + len(content)
+        notes.append({"id": None, "linehead": linehead, "place": "inline", "content": content,
+                      "offset": pos if pos >= 0 else None})
+    return (lineheads, texts), notes
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _meta_digest(meta: dict) -> str:
+    return _digest(json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+
+def _fingerprint(path: pathlib.Path, meta: dict, content: bytes | None = None) -> dict:
+    st = path.stat()
+    return {
+        "hash": _digest(content if content is not None else path.read_bytes()),
+        "meta": _meta_digest(meta),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def _next_segment(index: pathlib.Path) -> str:
+    numbers = [int(p.name[4:]) for p in index.glob("seg-*") if p.name[4:].isdigit()]
+    return f"seg-{max(numbers, default=0) + 1:06d}"
+
+
+def _has_suffix_arrays(index: pathlib.Path, segments: list[str]) -> bool:
+    return any((index / name / "suffix.json").exists() for name in segments)
+
+
+@contextmanager
+def writer_lock(index: pathlib.Path) -> Iterator[None]:
+    """同一索引同時只允許一個寫入者（更新或合併）；讀取端不需要鎖。"""
+    index.mkdir(parents=True, exist_ok=True)
+    with open(index / ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_new_segment(index: pathlib.Path, docs: list[dict], texts: list, notes: list, suffix_array: bool) -> str:
+    name = _next_segment(index)
+    write_segment(index / name, docs, texts, notes)
+    if suffix_array:
+        build_suffix_array(Segment(index / name))
+    return name
+
+
+def plan_shards(source: pathlib.Path, works: dict[str, dict]) -> list[tuple[str, list[tuple[str, int, pathlib.Path]]]]:
+    """依藏經與冊（canon/vol）分片；沒有冊號的佛典以佛典編號為一片。大片在前，讓工作較均衡。"""
+    shards: dict[str, list[tuple[str, int, pathlib.Path]]] = {}
+    for work, juan, path in list_juan_files(source):
+        info = works.get(work, {})
+        canon = info.get("canon") or re.match(r"[A-Z]+", work).group(0)
+        shards.setdefault(f"{canon}-{info.get('vol') or work}", []).append((work, juan, path))
+    return sorted(shards.items(), key=lambda item: -len(item[1]))
+
+
+def _build_shard(shard: str, files: list[tuple[str, int, pathlib.Path]], works: dict[str, dict], out: pathlib.Path) -> dict:
+    """在子行程中解析一個分片的卷並寫成 segment（HTML 解析與 bigram 計算都在這裡）。"""
+    docs, texts, notes, fingerprints = [], [], [], {}
+    for work, juan, path in files:
+        meta = doc_metadata(work, juan, works.get(work, {}))
+        fingerprints[f"{work}/{juan}"] = {**_fingerprint(path, meta), "doc": len(docs)}
+        docs.append(meta)
+        text, juan_notes = parse_juan(path)
+        texts.append(text)
+        notes.append(juan_notes)
+    write_segment(out, docs, texts, notes)
+    return {"shard": shard, "juans": len(docs), "notes": sum(len(n) for n in notes), "fingerprints": fingerprints}
+
+
+def print_progress(p: dict) -> None:
+    print(f"[{p['shards_done']}/{p['shards']} shards] {p['juans_done']}/{p['juans']} juans, "
+          f"{p['juans_per_second']:.1f} juans/s, {p['elapsed']:.1f}s", file=sys.stderr, flush=True)
+
+
+def build_index(
+    source: pathlib.Path,
+    index: pathlib.Path,
+    suffix_array: bool = False,
+    workers: int | None = 1,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    全量重建：依 canon/vol 分片，以 ProcessPoolExecutor 平行解析並各自寫成 segment，
+    再以 merge_segments k 路合併成單一 segment，回傳統計資訊（含 juans/sec）。
+
+    workers=None 表示使用全部 CPU；workers=1 時在本行程內依序處理各分片。
+    每完成一個分片呼叫一次 progress。
+    """
+    started = time.perf_counter()
+    works = load_works(source)
+    shards = plan_shards(source, works)
+    total = sum(len(files) for _, files in shards)
+    index.mkdir(parents=True, exist_ok=True)
+    scratch = pathlib.Path(tempfile.mkdtemp(prefix=".shards-", dir=index))
+    paths = {shard: scratch / f"shard-{i:04d}" for i, (shard, _) in enumerate(shards)}
+    results: dict[str, dict] = {}
+
+    def done(result: dict) -> None:
+        results[result["shard"]] = result
+        if progress is not None:
+            elapsed = time.perf_counter() - started
+            juans_done = sum(r["juans"] for r in results.values())
+            progress({
+                "shards_done": len(results), "shards": len(shards), "juans_done": juans_done, "juans": total,
+                "elapsed": elapsed, "juans_per_second": juans_done / elapsed if elapsed else 0.0,
+            })
+
+    try:
+        if workers == 1:
+            for shard, files in shards:
+                done(_build_shard(shard, files, works, paths[shard]))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_build_shard, shard, files, works, paths[shard]) for shard, files in shards]
+                for future in as_completed(futures):
+                    done(future.result())
+        parsed = time.perf_counter()
+
+        with writer_lock(index):
+            previous = {}
+            if (index / MANIFEST).exists():
+                remove_unreferenced(index)
+                previous = read_manifest(index)
+            segment = _next_segment(index)
+            order = [shard for shard, _ in shards]
+            mappings = merge_segments([paths[shard] for shard in order], index / segment)
+            juans = {}
+            for shard, mapping in zip(order, mappings):
+                for key, entry in results[shard]["fingerprints"].items():
+                    juans[key] = {**entry, "segment": segment, "doc": mapping[entry["doc"]]}
+            if suffix_array:
+                build_suffix_array(Segment(index / segment))
+            write_manifest(index, {
+                "generation": previous.get("generation", 0),
+                "segments": [segment],
+                "sizes": {segment: total},
+                "deleted": {},
+                "juans": juans,
+            })
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "juans": total,
+        "notes": sum(r["notes"] for r in results.values()),
+        "shards": len(shards),
+        "workers": workers or os.cpu_count(),
+        "parse_seconds": round(parsed - started, 2),
+        "merge_seconds": round(elapsed - (parsed - started), 2),
+        "seconds": round(elapsed, 2),
+        "juans_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def remove_unreferenced(index: pathlib.Path) -> list[str]:
+    """刪除 manifest 已不再引用的 segment 目錄（先前被合併或重建取代者）。"""
+    live = set(read_manifest(index)["segments"])
+    removed = []
+    for path in sorted(index.glob("seg-*")):
+        if path.is_dir() and path.name not in live:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path.name)
+    return removed
+
+
+def update_index(
+    source: pathlib.Path,
+    index: pathlib.Path,
+    compact_after: bool = True,
+    suffix_array: bool = False,
+) -> dict:
+    """
+    增量更新：依內容雜湊比對各卷，只重新解析新增或變動的卷，寫成一個新的 segment。
+
+    - 檔案大小與修改時間都沒變、中繼資料（works.jsonl）也沒變的卷不讀檔；
+      其餘才讀檔計算雜湊，內容相同者視為未變動。
+    - 變動與刪除的卷在原 segment 記為 tombstone；全部卷都已刪除的 segment 直接移出 manifest。
+    - 新 manifest 原子替換後，compact_after 時在背景執行緒合併小 segment（見 start_compaction），
+      不拖長更新本身；讀取端在整個過程中都沿用目前的 manifest，不等待。
+
+    已有後綴陣列的索引，新 segment 也一併建立。
+    索引不存在或為舊版（沒有各卷雜湊）時改為全量重建。耗時與變動的卷數成正比
+    （外加一次目錄掃描與 stat）。
+    """
+    if not (index / MANIFEST).exists() or "juans" not in read_manifest(index):
+        return {"mode": "full", **build_index(source, index, suffix_array)}
+
+    started = time.perf_counter()
+    works = load_works(source)
+    with writer_lock(index):
+        remove_unreferenced(index)
+        manifest = read_manifest(index)
+        previous: dict[str, dict] = manifest["juans"]
+        juans: dict[str, dict] = {}
+        docs, texts, notes, changed = [], [], [], []
+        hashed = 0
+        for work, juan, path in list_juan_files(source):
+            key = f"{work}/{juan}"
+            meta = doc_metadata(work, juan, works.get(work, {}))
+            old = previous.get(key)
+            st = path.stat()
+            if (old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns
+                    and old["meta"] == _meta_digest(meta)):
+                juans[key] = old
+                continue
+            entry = _fingerprint(path, meta)
+            hashed += 1
+            if old and old["hash"] == entry["hash"] and old["meta"] == entry["meta"]:
+                juans[key] = {**old, **entry}  # 只有修改時間變了
+                continue
+            if old:
+                changed.append(old)
+            juans[key] = {**entry, "doc": len(docs)}
+            docs.append(meta)
+            text, juan_notes = parse_juan(path)
+            texts.append(text)
+            notes.append(juan_notes)
+        removed = [old for key, old in previous.items() if key not in juans]
+
+        deleted = {name: set(ordinals) for name, ordinals in manifest.get("deleted", {}).items()}
+        for old in changed + removed:
+            deleted.setdefault(old["segment"], set()).add(old["doc"])
+        segments = list(manifest["segments"])
+        sizes = dict(manifest["sizes"])
+        if docs:
+            with_suffix = suffix_array or _has_suffix_arrays(index, segments)
+            segment = _write_new_segment(index, docs, texts, notes, with_suffix)
+            for entry in juans.values():
+                entry.setdefault("segment", segment)
+            segments.append(segment)
+            sizes[segment] = len(docs)
+        segments = [name for name in segments if len(deleted.get(name, ())) < sizes[name]]
+        write_manifest(index, {
+            "generation": manifest.get("generation", 0),
+            "segments": segments,
+            "sizes": {name: sizes[name] for name in segments},
+            "deleted": {name: sorted(deleted[name]) for name in segments if deleted.get(name)},
+            "juans": juans,
+        })
+
+    stats = {
+        "mode": "incremental",
+        "juans": len(juans),
+        "added": len(docs) - len(changed),
+        "changed": len(changed),
+        "removed": len(removed),
+        "hashed": hashed,
+        "segments": len(segments),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    if compact_after:
+        stats["compaction"] = start_compaction(index).name
+    return stats
+
+
+def plan_merge(manifest: dict, max_segments: int = MAX_SEGMENTS) -> list[str]:
+    """
+    選出要合併的 segment（依 manifest 順序）：
+    tombstone 佔一半以上的 segment，加上 segment 數超過 max_segments 時最小的幾個。
+    """
+    segments, sizes = manifest["segments"], manifest["sizes"]
+    deleted = manifest.get("deleted", {})
+    picks = [name for name in segments if deleted.get(name) and len(deleted[name]) * 2 >= sizes[name]]
+    rest = sorted((name for name in segments if name not in picks),
+                  key=lambda name: sizes[name] - len(deleted.get(name, ())))
+    while rest and len(segments) - len(picks) + 1 > max_segments:
+        picks.append(rest.pop(0))
+    return [name for name in segments if name in picks]
+
+
+def compact(index: pathlib.Path, max_segments: int = MAX_SEGMENTS) -> list[str]:
+    """
+    合併 plan_merge 選出的 segment：以 merge_segments 只搬移未刪除的卷，寫成新 segment 後原子替換 manifest。
+
+    合併在暫存目錄進行，不持有寫入鎖，期間增量更新照常進行；替換 manifest 前重新檢查，
+    若被選中的 segment 已被移除或多了 tombstone 則放棄本次合併。讀取端直到替換前都使用舊 manifest，
+    被合併的舊目錄在下次寫入時才刪除。回傳被合併的 segment。
+    """
+    with writer_lock(index):
+        remove_unreferenced(index)
+        manifest = read_manifest(index)
+        picks = plan_merge(manifest, max_segments)
+        if not picks:
+            return []
+        deleted = {name: manifest.get("deleted", {}).get(name, []) for name in picks}
+    live = sum(manifest["sizes"][name] - len(deleted[name]) for name in picks)
+
+    staging, mappings = None, []
+    if live:
+        staging = index / f".compact-{uuid.uuid4().hex}"
+        mappings = merge_segments([index / name for name in picks], staging, [frozenset(deleted[name]) for name in picks])
+        if _has_suffix_arrays(index, picks):
+            build_suffix_array(Segment(staging))
+
+    with writer_lock(index):
+        manifest = read_manifest(index)
+        current = manifest.get("deleted", {})
+        if any(name not in manifest["segments"] or current.get(name, []) != deleted[name] for name in picks):
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+            return []
+        segment = None
+        if staging is not None:
+            segment = _next_segment(index)
+            staging.rename(index / segment)
+        moved = {(name, old): new for name, mapping in zip(picks, mappings) for old, new in mapping.items()}
+        segments = []
+        for name in manifest["segments"]:
+            if name not in picks:
+                segments.append(name)
+            elif segment and segment not in segments:
+                segments.append(segment)
+        juans = {}
+        for key, entry in manifest["juans"].items():
+            target = moved.get((entry["segment"], entry["doc"]))
+            juans[key] = entry if target is None else {**entry, "segment": segment, "doc": target}
+        sizes = {name: manifest["sizes"][name] for name in segments if name != segment}
+        if segment:
+            sizes[segment] = live
+        write_manifest(index, {
+            "generation": manifest.get("generation", 0),
+            "segments": segments,
+            "sizes": sizes,
+            "deleted": {name: v for name, v in current.items() if name in segments},
+            "juans": juans,
+        })
+    return picks
+
+
+_compactions: dict[pathlib.Path, threading.Thread] = {}
+
+
+def start_compaction(index: pathlib.Path, max_segments: int = MAX_SEGMENTS) -> threading.Thread:
+    """
+    在背景執行緒執行 compact()；同一索引已有合併在進行時直接回傳該執行緒。
+    執行緒不是 daemon，命令列在合併完成後才結束。
+    """
+    running = _compactions.get(index)
+    if running is not None and running.is_alive():
+        return running
+
+    def run() -> None:
+        try:
+            picks = compact(index, max_segments)
+            if picks:
+                print(f"🗜️ 已合併 segment：{', '.join(picks)}", file=sys.stderr)
+        except Exception as e:
+            print(f"❌ 合併 segment 失敗：{e}", file=sys.stderr)
+
+    thread = threading.Thread(target=run, name=f"cbeta-compact-{index.name}")
+    _compactions[index] = thread
+    thread.start()
+    return thread
+
+
+def wait_compaction(index: pathlib.Path, timeout: float | None = None) -> None:
+    """等待 index 的背景合併（若有）結束。"""
+    thread = _compactions.get(index)
+    if thread is not None:
+        thread.join(timeout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the local CBETA corpus index")
+    parser.add_argument("source", type=pathlib.Path, help="語料目錄（含 works.jsonl 與 juans/）；--compact 時為索引目錄")
+    parser.add_argument("index", type=pathlib.Path, nargs="?", help="輸出索引目錄（即 CBETA_INDEX_DIR）")
+    parser.add_argument("--suffix-array", action="store_true", help="一併建立後綴陣列（供子字串計數工具使用）")
+    parser.add_argument("--update", action="store_true", help="增量更新：只重新索引有變動的卷")
+    parser.add_argument("--no-compact", action="store_true", help="增量更新後不合併 segment")
+    parser.add_argument("--compact", action="store_true", help="只合併 segment（可與更新分開排程）")
+    parser.add_argument("--workers", type=int, default=None, help="全量重建的平行行程數（預設為 CPU 核心數）")
+    args = parser.parse_args()
+    if args.compact:
+        print({"compacted": compact(args.index or args.source)})
+        return
+    if args.index is None:
+        parser.error("需指定索引目錄")
+    if args.update:
+        print(update_index(args.source, args.index, not args.no_compact, args.suffix_array))
+    else:
+        print(build_index(args.source, args.index, args.suffix_array, args.workers, print_progress))
+
+
+if __name__ == "__main__":
+    main()
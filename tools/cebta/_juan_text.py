@@ -0,0 +1,286 @@
+"""
+CBETA 卷 HTML → 純文字／分行結構 轉換管線。
+
+使用標準庫 html.parser 的串流 tokenizer 逐段解析 CBETA 回傳的 HTML，
+丟棄排版標記，只保留經文、行首（linehead）、段落與校勘註解。
+解析結果以 (work, juan) 為鍵快取，同一卷不同輸出格式不需重新解析。
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+from tools.cebta import _metrics, _offload
+from tools.cebta._cache import LRUCache
+from tools.cebta._http import get_raw, loads
+
+OUTPUT_FORMATS = ("html", "text", "lines", "paragraphs")
+NOTE_MODES = ("separate", "inline", "none")
+
+# 整個元素（含子節點）都不輸出文字的 class / id
+_SKIP_CLASSES = {"lb", "lineInfo", "pc", "juanname-hidden"}
+_SKIP_IDS = {"cbeta-copyright"}
+_NOTE_CLASSES = {"footnote", "footnote_orig", "footnote_add", "footnote_mod"}
+# 夾注（行內雙行小字注）：文字照常輸出於正文，另記錄一份供註解索引使用
+_INLINE_NOTE_CLASSES = {"doube-line-note", "double-line-note", "interlinear-note"}
+_BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "tr"}
+_VOID_TAGS = {"br", "img", "hr", "meta", "link", "input", "wbr"}
+
+
+@dataclass
+class NoteRef:
+    """經文中的註解錨點（noteAnchor），id 不含開頭的 'n'。"""
+    id: str
+
+
+@dataclass
+class Line:
+    linehead: str | None
+    parts: list = field(default_factory=list)  # str 或 NoteRef
+    paragraph_start: bool = False
+
+
+@dataclass
+class JuanText:
+    lines: list[Line]
+    notes: dict[str, str]
+    # 夾注：[(所在行首, 文字)]
+    inline_notes: list[tuple[str | None, str]] = field(default_factory=list)
+    # note_mode → (逐行文字, 每行在全文中的起始字元位移)；首次使用時建立
+    _line_index: dict[str, tuple[list[str], list[int]]] = field(default_factory=dict, repr=False)
+
+    def _line_text(self, line: Line, note_mode: str) -> str:
+        out = []
+        for part in line.parts:
+            if isinstance(part, NoteRef):
+                if note_mode == "inline" and part.id in self.notes:
+                    out.append(f"（注：{self.notes[part.id]}）")
+            else:
+                out.append(part)
+        return "".join(out).strip()
+
+    def _line_note_ids(self, line: Line) -> list[str]:
+        return [p.id for p in line.parts if isinstance(p, NoteRef)]
+
+    def note_lineheads(self) -> dict[str, str | None]:
+        """註解 ID → 錨點所在行首。"""
+        return {p.id: line.linehead for line in self.lines for p in line.parts if isinstance(p, NoteRef)}
+
+    def _used_notes(self, lines: list[Line]) -> dict[str, str]:
+        ids = {p.id for line in lines for p in line.parts if isinstance(p, NoteRef)}
+        return {k: v for k, v in self.notes.items() if k in ids}
+
+    def line_index(self, note_mode: str) -> tuple[list[str], list[int]]:
+        """回傳逐行文字與行起始位移（offsets[i] 為第 i 行之前的總字數，末項為全卷字數）。"""
+        index = self._line_index.get(note_mode)
+        if index is None:
+            texts = [self._line_text(line, note_mode) for line in self.lines]
+            offsets = [0]
+            for text in texts:
+                offsets.append(offsets[-1] + len(text))
+            index = self._line_index[note_mode] = (texts, offsets)
+        return index
+
+    def window(
+        self,
+        note_mode: str,
+        max_chars: int,
+        cursor: int = 0,
+        linehead: str | None = None,
+    ) -> tuple[int, int, int | None]:
+        """
+        依行起始位移索引切出不超過 max_chars 字的整行區間。
+
+        回傳 (起始行, 結束行(不含), 下一頁 cursor)；已到卷尾時 cursor 為 None。
+        至少包含一行，避免單行超長時無法前進。
+        """
+        texts, offsets = self.line_index(note_mode)
+        if linehead:
+            start = next((i for i, line in enumerate(self.lines) if line.linehead == linehead), None)
+            if start is None:
+                raise ValueError(f"本卷查無行首：{linehead}")
+        else:
+            start = bisect_right(offsets, cursor, hi=len(texts)) - 1
+            start = max(start, 0)
+        end = bisect_right(offsets, offsets[start] + max_chars, lo=start + 1) - 1
+        end = min(max(end, start + 1), len(texts))
+        next_cursor = offsets[end] if end < len(texts) else None
+        return start, end, next_cursor
+
+    def render(self, fmt: str, note_mode: str = "separate", start: int = 0, end: int | None = None) -> dict:
+        """依輸出格式組成第 start～end 行的回傳內容；note_mode='separate' 時另附 notes 字典。"""
+        texts = self.line_index(note_mode)[0][start:end]
+        lines = self.lines[start:end]
+        if fmt == "lines":
+            body: dict = {"lines": [
+                {"linehead": line.linehead, "text": text,
+                 **({"notes": self._line_note_ids(line)} if note_mode == "separate" else {})}
+                for line, text in zip(lines, texts)
+            ]}
+        elif fmt == "paragraphs":
+            paragraphs: list[dict] = []
+            for line, text in zip(lines, texts):
+                if line.paragraph_start or not paragraphs:
+                    paragraphs.append({"linehead": line.linehead, "text": text})
+                else:
+                    paragraphs[-1]["text"] += text
+            body = {"paragraphs": [p for p in paragraphs if p["text"]]}
+        else:
+            paragraphs_text: list[str] = []
+            for line, text in zip(lines, texts):
+                if line.paragraph_start or not paragraphs_text:
+                    paragraphs_text.append(text)
+                else:
+                    paragraphs_text[-1] += text
+            body = {"text": "\n".join(p for p in paragraphs_text if p)}
+        if note_mode == "separate":
+            body["notes"] = self._used_notes(lines)
+        return body
+
+
+class _JuanHTMLParser(HTMLParser):
+    """串流解析 CBETA HTML：lb 標記換行，noteAnchor 記為 NoteRef，footnote 收進 notes。"""
+
+    def __init__(self, linehead: str | None = None):
+        super().__init__(convert_charrefs=True)
+        self.lines: list[Line] = [Line(linehead=linehead)]
+        self.notes: dict[str, str] = {}
+        self.inline_notes: list[tuple[str | None, str]] = []
+        self._inline_bufs: list[tuple[str | None, list[str]]] = []
+        self._stack: list[tuple[str, str]] = []  # (tag, role)；role: skip/note/block/""
+        self._skip_depth = 0
+        self._note_id: str | None = None
+        self._note_buf: list[str] = []
+        self._pending_paragraph = False
+
+    def _new_line(self, linehead: str | None) -> None:
+        current = self.lines[-1]
+        if current.linehead is None and not current.parts:
+            current.linehead = linehead
+        else:
+            self.lines.append(Line(linehead=linehead))
+        if self._pending_paragraph:
+            self.lines[-1].paragraph_start = True
+            self._pending_paragraph = False
+
+    def handle_starttag(self, tag, attrs):
+        attr = dict(attrs)
+        classes = set((attr.get("class") or "").split())
+        role = ""
+        if self._skip_depth or self._note_id is not None:
+            role = "skip" if self._skip_depth else ""
+        elif "lb" in classes:
+            self._new_line(attr.get("id") or attr.get("data-linehead") or attr.get("l"))
+            role = "skip"
+        elif "noteAnchor" in classes:
+            href = attr.get("href") or ""
+            note_id = href.lstrip("#")
+            if note_id.startswith("n"):
+                note_id = note_id[1:]
+            if note_id:
+                self.lines[-1].parts.append(NoteRef(note_id))
+        elif classes & _NOTE_CLASSES and attr.get("id"):
+            self._note_id = attr["id"][1:] if attr["id"].startswith("n") else attr["id"]
+            self._note_buf = []
+            role = "note"
+        elif classes & _INLINE_NOTE_CLASSES:
+            self._inline_bufs.append((self.lines[-1].linehead, []))
+            role = "inline"
+        elif classes & _SKIP_CLASSES or attr.get("id") in _SKIP_IDS or tag in ("script", "style"):
+            role = "skip"
+        elif tag in _BLOCK_TAGS:
+            self._pending_paragraph = True
+            role = "block"
+        if tag in _VOID_TAGS:
+            return
+        if role == "skip":
+            self._skip_depth += 1
+        self._stack.append((tag, role))
+
+    def handle_endtag(self, tag):
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, role = self._stack.pop()
+            if role == "skip":
+                self._skip_depth -= 1
+            elif role == "note" and self._note_id is not None:
+                self.notes[self._note_id] = "".join(self._note_buf).strip()
+                self._note_id = None
+            elif role == "inline" and self._inline_bufs:
+                linehead, buf = self._inline_bufs.pop()
+                text = "".join(buf).strip()
+                if text:
+                    self.inline_notes.append((linehead, text))
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._note_id is not None:
+            self._note_buf.append(data)
+            return
+        text = data.replace("\n", "").replace("\r", "")
+        if not text:
+            return
+        if self._pending_paragraph and self.lines[-1].parts:
+            self.lines.append(Line(linehead=self.lines[-1].linehead, paragraph_start=True))
+        elif self._pending_paragraph:
+            self.lines[-1].paragraph_start = True
+        self._pending_paragraph = False
+        self.lines[-1].parts.append(text)
+        for _, buf in self._inline_bufs:
+            buf.append(text)
+
+
+def extract_html(html: str, notes: dict[str, str] | None = None, linehead: str | None = None) -> JuanText:
+    """將一段 CBETA HTML 解析為 JuanText；notes 可傳入 API 另外回傳的註解字典。"""
+    parser = _JuanHTMLParser(linehead=linehead)
+    parser.feed(html)
+    parser.close()
+    merged = dict(parser.notes)
+    if notes:
+        merged.update({str(k): str(v) for k, v in notes.items()})
+    lines = [line for line in parser.lines if line.parts or line.linehead]
+    return JuanText(lines=lines, notes=merged, inline_notes=parser.inline_notes)
+
+
+# 每卷解析結果快取：(work, juan) → JuanText
+juan_text_cache = LRUCache(maxsize=128, ttl=3600)
+_metrics.register("juan_text_cache", juan_text_cache.stats)
+
+
+def get_juan_text(work: str, juan: int) -> JuanText | None:
+    return juan_text_cache.get((work, juan))
+
+
+async def cache_juan_text(work: str, juan: int, html: str) -> JuanText:
+    """解析並快取；大卷的解析移出事件迴圈（見 _offload），快取在呼叫端更新。"""
+    juan_text = await _offload.run(extract_html, html, size=len(html))
+    juan_text_cache.set((work, juan), juan_text)
+    return juan_text
+
+
+async def load_juan_text(work: str, juan: int) -> JuanText:
+    """取得解析後的卷：先查 juan_text_cache，否則向上游取 /juans（與 get_juan_html 共用回應快取）。"""
+    juan_text = get_juan_text(work, juan)
+    if juan_text is not None:
+        return juan_text
+    raw = await get_raw("/juans", {"work": work, "juan": juan, "work_info": 0, "toc": 0}, timeout=30.0)
+    data = await _offload.run(loads, raw, size=len(raw))
+    results = data.get("results") or []
+    if not results:
+        raise LookupError(f"查無 {work} 第 {juan} 卷")
+    item = results[0]
+    html = item.get("html", "") if isinstance(item, dict) else str(item)
+    return await cache_juan_text(work, juan, html)
+
+
+def validate_output_options(fmt: str, note_mode: str) -> str | None:
+    """檢查 format / notes 參數，有誤時回傳錯誤訊息。"""
+    if fmt not in OUTPUT_FORMATS:
+        return f"format 必須為 {', '.join(OUTPUT_FORMATS)} 之一"
+    if note_mode not in NOTE_MODES:
+        return f"notes 必須為 {', '.join(NOTE_MODES)} 之一"
+    return None
@@ -0,0 +1,163 @@
+"""
+本地 KWIC（Keyword in Context）引擎：在 _corpus 索引上一次處理多部佛典、多卷。
+
+- 命中位置以 str.find 逐卷掃描；note=0 時先移除夾注（依 NoteStore 記錄的位移），
+  並保留「檢視文字 → 原文位移」的對照，仍可換回 linehead。
+- 排序鍵為後綴式的前後文鍵：'f' 取關鍵詞之後的後綴，'b' 取關鍵詞之前文字的反轉；
+  鍵長 CONTEXT_KEY_CHARS 字，遠大於顯示的前後文，排序結果與完整後綴排序一致。
+  排好的命中清單依 (works, 卷範圍, 詞, 排序, 夾注) 快取，翻頁或重複查詢不再重排。
+- iter_kwic() 為產生器，逐筆產出 KWIC 行，只有實際輸出的那幾筆才組字串。
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterator
+
+from tools.cebta._cache import LRUCache
+from tools.cebta._corpus import CorpusIndex, Segment
+
+SORTS = ("f", "b", "location")
+CONTEXT_KEY_CHARS = 64
+
+_RANGE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\s*$")
+
+
+@dataclass
+class DocView:
+    """一卷供 KWIC 使用的文字；pieces 為 [(檢視位移, 原文位移)]，未移除任何內容時為 None。"""
+    text: str
+    pieces: list[tuple[int, int]] | None = None
+
+    def original_offset(self, pos: int) -> int:
+        if self.pieces is None:
+            return pos
+        view_starts = [p[0] for p in self.pieces]
+        view_start, orig_start = self.pieces[bisect_right(view_starts, pos) - 1]
+        return orig_start + pos - view_start
+
+
+_view_cache = LRUCache(maxsize=256, ttl=3600)
+_hits_cache = LRUCache(maxsize=64, ttl=600)
+
+
+def parse_juan_ranges(spec: str | None) -> list[tuple[int, int]] | None:
+    """'1-10,20' → [(1, 10), (20, 20)]；格式錯誤時拋出 ValueError。"""
+    if not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        m = _RANGE.match(part)
+        if not m:
+            raise ValueError(f"卷號範圍格式錯誤：{part.strip()}，應如 '1-10,20'")
+        lo = int(m.group(1))
+        hi = int(m.group(2) or lo)
+        ranges.append((min(lo, hi), max(lo, hi)))
+    return ranges
+
+
+def doc_view(seg: Segment, doc: int, note: bool) -> DocView:
+    text = seg.texts[doc]
+    spans = [] if note else seg.notes.inline_spans(doc)
+    if not spans:
+        return DocView(text)
+    key = (str(seg.path), doc)
+    view = _view_cache.get(key)
+    if view is None:
+        parts, pieces = [], []
+        pos = view_len = 0
+        for start, end in spans:
+            if start > pos:
+                pieces.append((view_len, pos))
+                parts.append(text[pos:start])
+                view_len += start - pos
+            pos = max(pos, end)
+        pieces.append((view_len, pos))
+        parts.append(text[pos:])
+        view = DocView("".join(parts), pieces)
+        _view_cache.set(key, view)
+    return view
+
+
+def select_docs(
+    index: CorpusIndex,
+    works: list[str],
+    ranges: list[tuple[int, int]] | None,
+) -> list[tuple[Segment, int]]:
+    out = []
+    for work in works:
+        for seg, doc in index.docs_for_work(work):
+            juan = seg.docs[doc].juan
+            if ranges is None or any(lo <= juan <= hi for lo, hi in ranges):
+                out.append((seg, doc))
+    return out
+
+
+def _sort_key(view: DocView, pos: int, term_len: int, sort: str) -> str:
+    if sort == "f":
+        start = pos + term_len
+        return view.text[start:start + CONTEXT_KEY_CHARS]
+    return view.text[max(0, pos - CONTEXT_KEY_CHARS):pos][::-1]
+
+
+def find_hits(
+    index: CorpusIndex,
+    works: list[str],
+    ranges: list[tuple[int, int]] | None,
+    term: str,
+    sort: str = "location",
+    note: bool = True,
+) -> list[tuple[Segment, int, int]]:
+    """回傳依 sort 排序的命中 [(segment, doc, 檢視文字中的位移)]，結果快取。"""
+    key = (str(index.root), index.generation, tuple(works), tuple(ranges or ()), term, sort, note)
+    hits = _hits_cache.get(key)
+    if hits is not None:
+        return hits
+    hits = []
+    for seg, doc in select_docs(index, works, ranges):
+        if term not in seg.texts[doc]:
+            continue
+        text = doc_view(seg, doc, note).text
+        pos = text.find(term)
+        while pos >= 0:
+            hits.append((seg, doc, pos))
+            pos = text.find(term, pos + 1)
+    if sort != "location":
+        hits.sort(key=lambda h: _sort_key(doc_view(h[0], h[1], note), h[2], len(term), sort))
+    _hits_cache.set(key, hits)
+    return hits
+
+
+def kwic_line(seg: Segment, doc: int, pos: int, term: str, around: int, mark: bool, note: bool) -> dict:
+    view = doc_view(seg, doc, note)
+    keyword = f"<mark>{term}</mark>" if mark else term
+    end = pos + len(term)
+    linehead = seg.linehead_at(doc, view.original_offset(pos)) or ""
+    d = seg.docs[doc]
+    return {
+        "work": d.work,
+        "juan": d.juan,
+        "vol": d.vol or linehead.split("n")[0] or None,
+        "lb": linehead.split("_p")[-1] if "_p" in linehead else None,
+        "linehead": linehead or None,
+        "kwic": view.text[max(0, pos - around):pos] + keyword + view.text[end:end + around],
+    }
+
+
+def iter_kwic(
+    index: CorpusIndex,
+    works: list[str],
+    term: str,
+    ranges: list[tuple[int, int]] | None = None,
+    sort: str = "f",
+    around: int = 10,
+    mark: bool = False,
+    note: bool = True,
+    start: int = 0,
+    rows: int | None = None,
+) -> Iterator[dict]:
+    """依序產出第 start 筆起、最多 rows 筆 KWIC 行。"""
+    hits = find_hits(index, works, ranges, term, sort, note)
+    stop = len(hits) if rows is None else min(len(hits), start + rows)
+    for seg, doc, pos in hits[start:stop]:
+        yield kwic_line(seg, doc, pos, term, around, mark, note)
@@ -0,0 +1,31 @@
+"""
+行程內的計數器與統計，由 main.py 的 /metrics 路由輸出。
+
+- incr(name)：累加計數器，如 response_cache.hits。
+- register(name, fn)：登記一個回傳 dict 的統計函式，輸出時才呼叫（如快取大小、命中率）。
+"""
+
+from collections import Counter
+from typing import Callable
+
+counters: Counter[str] = Counter()
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def incr(name: str, n: int = 1) -> None:
+    counters[name] += n
+
+
+def register(name: str, fn: Callable[[], dict]) -> None:
+    _collectors[name] = fn
+
+
+def ratio(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def snapshot() -> dict:
+    return {
+        "counters": dict(sorted(counters.items())),
+        **{name: fn() for name, fn in _collectors.items()},
+    }
@@ -0,0 +1,103 @@
+"""
+本地註解（校勘）檢索：在 _corpus 索引的 NoteStore 上執行 search_cbeta_notes 的查詢。
+
+查詢語法同 CBETA 擴充語法（見 _query），以 bigram 倒排表求候選註解後逐筆求值；
+回傳格式比照 /search/notes：{"response": {"numFound", "start", "docs"}, "facets": {...}}。
+"""
+
+import re
+from collections import Counter
+
+from tools.cebta._corpus import CorpusIndex, NoteStore, candidates_from_postings
+from tools.cebta._facets import aggregate_matches
+from tools.cebta._query import evaluate, parse, positive_terms
+
+NOTE_FACETS = ["canon", "category", "creator", "work"]
+
+
+def _candidates(store: NoteStore, node: tuple) -> set[int] | None:
+    """依 AST 求候選註解編號；None 表示無法過濾（需逐筆檢查全部）。"""
+    kind = node[0]
+    if kind == "term":
+        return candidates_from_postings(store.postings, positive_terms(node)[0])
+    if kind == "not":
+        return None
+    children = [_candidates(store, n) for n in (node[2] if kind == "near" else node[1])]
+    if kind == "or":
+        if any(c is None for c in children):
+            return None
+        return set().union(*children)
+    known = [c for c in children if c is not None]
+    if not known:
+        return None
+    return set.intersection(*known)
+
+
+def highlight(content: str, terms: list[str], around: int) -> str:
+    """以第一個命中詞為中心取前後 around 字，所有查詢詞以 <mark> 標示。"""
+    hits = [(content.find(t), t) for t in terms if t and t in content]
+    if not hits:
+        return content[:around * 2]
+    pos, term = min(hits)
+    lo = max(0, pos - around)
+    hi = min(len(content), pos + len(term) + around)
+    pattern = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True) if t)
+    snippet = re.sub(pattern, lambda m: f"<mark>{m.group()}</mark>", content[lo:hi])
+    return ("..." if lo > 0 else "") + snippet + ("..." if hi < len(content) else "")
+
+
+def search_notes(
+    index: CorpusIndex,
+    q: str,
+    around: int = 10,
+    rows: int = 20,
+    start: int = 0,
+    facet: int = 0,
+) -> dict:
+    """
+    在本地註解索引中查詢；查詢含本地不支援的語法時拋出 _query.QuerySyntaxError。
+    """
+    node = parse(q)
+    terms = positive_terms(node)
+    matched: list[tuple] = []  # (segment, 註解編號)
+    for seg in index.segments:
+        store = seg.notes
+        candidates = _candidates(store, node)
+        if candidates is None:
+            ordinals = seg.live_notes()
+        else:
+            ordinals = sorted(i for i in candidates if store.docs[i] not in seg.deleted)
+        matched.extend((seg, i) for i in ordinals if evaluate(node, store.contents[i]))
+
+    docs = []
+    for seg, i in matched[start:start + rows]:
+        store = seg.notes
+        record = index.doc_record(seg, store.docs[i])
+        docs.append({
+            "note_place": store.places[i],
+            "note_id": store.ids[i],
+            "linehead": store.lineheads[i],
+            "work": record["work"],
+            "juan": record["juan"],
+            "title": record["title"],
+            "canon": record["canon"],
+            "content": store.contents[i],
+            "highlight": highlight(store.contents[i], terms, around),
+        })
+    body: dict = {"response": {"numFound": len(matched), "start": start, "docs": docs}}
+
+    if facet:
+        per_segment: dict[int, tuple] = {}
+        for seg, i in matched:
+            per_segment.setdefault(id(seg), (seg, Counter()))[1][seg.notes.docs[i]] += 1
+        facets = aggregate_matches(
+            ((seg, sorted(counts.items())) for seg, counts in per_segment.values()), NOTE_FACETS
+        )
+        body["facets"] = {
+            name: sorted(
+                ({"value": b[name], "count": b["hits"]} for b in buckets),
+                key=lambda b: (-b["count"], b["value"]),
+            )
+            for name, buckets in facets.items()
+        }
+    return body
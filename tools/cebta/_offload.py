@@ -0,0 +1,125 @@
+"""
+把大型的解碼／轉換工作移出事件迴圈，避免單一大回應卡住其他同時進行的 MCP 工作階段。
+
+- run(fn, *args, size=位元組數)：size 未達 CBETA_OFFLOAD_BYTES（預設 64 KiB）時直接在事件迴圈上執行
+  （小工作切換執行緒的成本反而較高）；達到門檻才送進執行緒池，事件迴圈只等待結果。
+- CBETA_OFFLOAD_POOL=thread（預設）或 process；process 模式可避開 GIL，但 fn 與參數、結果都須可 pickle，
+  且在子行程執行，不能依賴行程內快取（呼叫端應只送純函式，快取在事件迴圈上更新）。
+- CBETA_OFFLOAD_WORKERS 為池大小（預設 min(4, CPU 數)）。
+- run(..., process=True)：純 Python 的 CPU 密集工作（如譯本對齊）不論 CBETA_OFFLOAD_POOL 都送進行程池，
+  執行緒池受 GIL 限制無法平行。
+- run(..., local=True)：讀取行程內狀態的工作（本地索引的掃描）不論 CBETA_OFFLOAD_POOL 都送進執行緒池，
+  索引無法（也不該）pickle 到子行程。size 可用 CorpusIndex.scan_size 估計。
+- /metrics 的 offload：排隊深度（已送出未開始）、執行中數量、內聯／移出次數、排隊與執行時間。
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from tools.cebta import _metrics, _tracing
+
+THRESHOLD = int(os.getenv("CBETA_OFFLOAD_BYTES", str(64 * 1024)))
+POOL_KIND = os.getenv("CBETA_OFFLOAD_POOL", "thread")
+WORKERS = int(os.getenv("CBETA_OFFLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool: Executor | None = None
+_process_pool: Executor | None = None  # process=True 且 POOL_KIND 為 thread 時使用
+_thread_pool: Executor | None = None  # local=True 且 POOL_KIND 為 process 時使用
+pending = 0  # 已送出未完成；池是 FIFO 且只給本模組用，超過 WORKERS 的部分即為排隊中
+max_queued = 0
+_waits: deque[float] = deque(maxlen=512)
+_runs: deque[float] = deque(maxlen=512)
+
+
+def _executor(process: bool = False, local: bool = False) -> Executor:
+    global _pool, _process_pool, _thread_pool
+    if local and POOL_KIND == "process":
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="cbeta-offload")
+        return _thread_pool
+    if process and POOL_KIND != "process":
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=WORKERS)
+        return _process_pool
+    if _pool is None:
+        if POOL_KIND == "process":
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        else:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="cbeta-offload")
+    return _pool
+
+
+def _timed(fn: Callable, submitted: float) -> tuple[Any, float, float]:
+    """在池中執行；回傳 (結果, 排隊秒數, 執行秒數)。perf_counter 在 Linux 上跨行程可比較。"""
+    started = time.perf_counter()
+    result = fn()
+    return result, started - submitted, time.perf_counter() - started
+
+
+async def run(fn: Callable, *args: Any, size: int, process: bool = False, local: bool = False, **kwargs: Any) -> Any:
+    """size 達門檻時在池中執行 fn(*args, **kwargs)，否則直接執行；process=True 時用行程池，local=True 時用執行緒池。"""
+    if size < THRESHOLD:
+        _metrics.incr("offload.inline")
+        return fn(*args, **kwargs)
+
+    global pending, max_queued
+    _metrics.incr("offload.offloaded")
+    call = functools.partial(fn, *args, **kwargs)
+    if local or (not process and POOL_KIND != "process"):
+        # 執行緒池沿用呼叫端的 contextvars，池中的 span 仍歸在同一個 trace
+        call = functools.partial(contextvars.copy_context().run, call)
+    with _tracing.span(f"offload {getattr(fn, '__name__', 'call')}", bytes=size) as s:
+        future = asyncio.get_running_loop().run_in_executor(
+            _executor(process, local), functools.partial(_timed, call, time.perf_counter()))
+        pending += 1
+        max_queued = max(max_queued, pending - WORKERS)
+        try:
+            result, waited, ran = await future
+        finally:
+            pending -= 1
+        _waits.append(waited)
+        _runs.append(ran)
+        s.set(queued_ms=round(waited * 1000, 3), run_ms=round(ran * 1000, 3))
+    return result
+
+
+def _ms(samples: deque[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+
+
+def stats() -> dict:
+    counters = _metrics.counters
+    return {
+        "pool": POOL_KIND,
+        "workers": WORKERS,
+        "threshold_bytes": THRESHOLD,
+        "queue_depth": max(0, pending - WORKERS),
+        "running": min(pending, WORKERS),
+        "max_queue_depth": max_queued,
+        "inline": counters["offload.inline"],
+        "offloaded": counters["offload.offloaded"],
+        "wait_p50_ms": _ms(_waits, 0.5),
+        "wait_p99_ms": _ms(_waits, 0.99),
+        "run_p50_ms": _ms(_runs, 0.5),
+        "run_p99_ms": _ms(_runs, 0.99),
+    }
+
+
+def shutdown() -> None:
+    global _pool, _process_pool, _thread_pool
+    for pool in (_pool, _process_pool, _thread_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _pool = _process_pool = _thread_pool = None
+
+
+_metrics.register("offload", stats)
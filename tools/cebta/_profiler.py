@@ -0,0 +1,205 @@
+"""
+取樣式效能剖析與事件迴圈延遲監測，供 main.py 的 /admin 路由使用。
+
+- profile(seconds, interval)：在背景執行緒以 sys._current_frames() 定時取樣所有執行緒（事件迴圈與工作執行緒）
+  的呼叫堆疊，輸出 collapsed stack（flamegraph.pl / speedscope 可直接讀取）。事件迴圈執行緒的堆疊前
+  會加上當下執行中的工具名稱（tool:<name>）。取樣在另一條執行緒，不需要修改或重啟服務。
+- LoopMonitor：事件迴圈上的心跳協程每 interval 秒醒來一次，量測實際延遲；監看執行緒發現心跳逾時
+  （超過 threshold）時立即擷取事件迴圈執行緒的堆疊與目前的工具，恢復後印出阻塞時間與堆疊。
+  CBETA_LOOP_LAG_THRESHOLD（秒，預設 0.1；0 表示不啟用）。
+- 工具名稱由 TaskTagMiddleware 在工具派送時存成其 frame 的區域變數；工具執行時該 frame 就在事件迴圈執行緒
+  的堆疊上，取樣時沿堆疊找到即可，不需讀取 asyncio 的內部狀態。找不到時退回堆疊中最內層的 tools 模組。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from tools.cebta import _metrics
+
+LAG_THRESHOLD = float(os.getenv("CBETA_LOOP_LAG_THRESHOLD", "0.1"))
+MAX_SECONDS = 60.0
+
+_profiling = threading.Lock()
+monitor: "LoopMonitor | None" = None
+
+
+class TaskTagMiddleware(Middleware):
+    """在工具派送的 frame 上記下工具名稱，供剖析與延遲監測對應。"""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = getattr(context.message, "name", "unknown")  # running_tool 由堆疊讀取
+        return await call_next(context)
+
+
+_TAG_CODE = TaskTagMiddleware.on_call_tool.__code__
+
+
+def running_tool(frame) -> str | None:
+    """事件迴圈執行緒的 frame 所屬的工具：沿 f_back 找 TaskTagMiddleware.on_call_tool 的 frame（取樣用）。"""
+    while frame is not None:
+        if frame.f_code is _TAG_CODE:
+            return frame.f_locals.get("tool")
+        frame = frame.f_back
+    return None
+
+
+def _label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _stack(frame) -> list[str]:
+    """由外到內的 frame 標籤。"""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _tool_module(labels: list[str]) -> str | None:
+    for label in reversed(labels):
+        module = label.split(":", 1)[0]
+        if module.startswith("tools.") and not module.rsplit(".", 1)[-1].startswith("_"):
+            return module
+    return None
+
+
+def profile(seconds: float, interval: float = 0.005, loop_thread: int | None = None) -> tuple[Counter, int]:
+    """
+    取樣 seconds 秒（呼叫端的執行緒會被佔用，async 程式請以 asyncio.to_thread 呼叫），
+    回傳 (collapsed stack → 次數, 取樣輪數)。loop_thread 為事件迴圈執行緒的 ident（省略時取延遲監測記下的執行緒
+    或主執行緒），其堆疊前加上 tool:<name>。同時只允許一個剖析，重複呼叫拋出 RuntimeError。
+    """
+    if not _profiling.acquire(blocking=False):
+        raise RuntimeError("profile already running")
+    try:
+        me = threading.get_ident()
+        if loop_thread is None:
+            loop_thread = monitor.thread_id if monitor else threading.main_thread().ident
+        stacks: Counter[str] = Counter()
+        rounds = 0
+        deadline = time.perf_counter() + min(seconds, MAX_SECONDS)
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                root = [names.get(ident, f"thread-{ident}")]
+                if ident == loop_thread:
+                    tool = running_tool(frame)
+                    if tool:
+                        root.append(f"tool:{tool}")
+                stacks[";".join(root + _stack(frame))] += 1
+            rounds += 1
+            time.sleep(interval)
+        return stacks, rounds
+    finally:
+        _profiling.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg 的 folded 格式：每行 `frame;frame;frame 次數`。"""
+    return "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
+
+
+class LoopMonitor:
+    """事件迴圈延遲監測：心跳協程 + 監看執行緒，記錄阻塞期間的堆疊與工具。"""
+
+    def __init__(self, interval: float = 0.05, threshold: float = LAG_THRESHOLD, keep: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque[dict] = deque(maxlen=keep)
+        self.lags: deque[float] = deque(maxlen=1200)
+        self.max_lag = 0.0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread_id: int | None = None
+        self._beat = time.monotonic()
+        self._captured: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """在事件迴圈內呼叫。"""
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = self.loop.create_task(self._heartbeat(), name="cbeta-loop-monitor")
+        threading.Thread(target=self._watch, name="cbeta-loop-watchdog", daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self._beat = time.monotonic()
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._report(lag)
+            else:
+                self._captured = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            if self._captured is None and time.monotonic() - self._beat > self.interval + self.threshold:
+                frame = sys._current_frames().get(self.thread_id)
+                labels = _stack(frame) if frame is not None else []
+                self._captured = {
+                    "tool": running_tool(frame) or _tool_module(labels),
+                    "stack": labels,
+                    "detail": "".join(traceback.format_stack(frame)[-8:]) if frame is not None else "",
+                }
+
+    def _report(self, lag: float) -> None:
+        captured, self._captured = self._captured or {"tool": None, "stack": [], "detail": ""}, None
+        stall = {"at": time.time(), "lag_ms": round(lag * 1000, 1), "tool": captured["tool"],
+                 "stack": ";".join(captured["stack"])}
+        self.stalls.append(stall)
+        _metrics.incr("event_loop.stalls")
+        print(f"⚠️ 事件迴圈阻塞 {stall['lag_ms']:.0f}ms，工具：{stall['tool'] or '未知'}\n{captured['detail']}", end="")
+
+    def stats(self) -> dict:
+        lags = sorted(self.lags)
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2) if lags else 0.0,
+            "lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 2) if lags else 0.0,
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "stalls": _metrics.counters["event_loop.stalls"],
+        }
+
+
+async def start_monitor() -> LoopMonitor | None:
+    """由 main.lifespan 呼叫；CBETA_LOOP_LAG_THRESHOLD=0 時不啟用。"""
+    global monitor
+    if LAG_THRESHOLD <= 0:
+        return None
+    monitor = LoopMonitor()
+    monitor.start()
+    _metrics.register("event_loop", monitor.stats)
+    return monitor
+
+
+async def stop_monitor() -> None:
+    global monitor
+    if monitor is not None:
+        await monitor.stop()
+        monitor = None
@@ -0,0 +1,114 @@
+"""
+回應欄位投影（projection）。
+
+選擇器為逗號分隔的路徑，語法取 JSONPath 的簡化子集：
+- "num_found,results.work,results.title"：只保留列出的欄位
+- "-places,-results.kwics"：以 '-' 開頭表示排除該子樹，其餘保留
+- 路徑可寫成 "$.results[*].work"；陣列會自動逐項套用，'*' 代表任意鍵
+
+編譯結果會快取，同一選擇器只解析一次。
+"""
+
+from functools import lru_cache
+from typing import Any
+
+# 樹節點：True 代表整個子樹，dict 代表只取下層指定鍵
+_Tree = dict[str, Any]
+
+
+def _split_path(path: str) -> list[str]:
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:].lstrip(".")
+    path = path.replace("[*]", "").replace("[]", "")
+    parts = [p.strip() for p in path.split(".")]
+    if not path or any(not p for p in parts):
+        raise ValueError(f"無效的欄位路徑：'{path}'")
+    return parts
+
+
+def _insert(tree: _Tree, parts: list[str]) -> None:
+    node = tree
+    for i, part in enumerate(parts):
+        if i == len(parts) - 1:
+            node[part] = True
+            return
+        child = node.get(part)
+        if child is True:
+            return  # 已選取整個子樹
+        if child is None:
+            child = node[part] = {}
+        node = child
+
+
+class Projection:
+    def __init__(self, include: _Tree | None, exclude: _Tree):
+        self.include = include
+        self.exclude = exclude
+
+    def apply(self, data: Any, fill_missing: bool = False) -> Any:
+        """
+        套用投影。fill_missing=True 時，include 中列出但資料缺少的鍵以 None 補上。
+        """
+        if self.include is not None:
+            data = _pick(data, self.include, fill_missing)
+        if self.exclude:
+            data = _drop(data, self.exclude)
+        return data
+
+
+def _pick(data: Any, tree: _Tree, fill_missing: bool) -> Any:
+    if isinstance(data, list):
+        return [_pick(item, tree, fill_missing) for item in data]
+    if not isinstance(data, dict):
+        return data
+    out = {}
+    wildcard = tree.get("*")
+    for key, sub in tree.items():
+        if key == "*":
+            continue
+        if key in data:
+            out[key] = data[key] if sub is True else _pick(data[key], sub, fill_missing)
+        elif fill_missing:
+            out[key] = None
+    if wildcard is not None:
+        for key, value in data.items():
+            if key not in out:
+                out[key] = value if wildcard is True else _pick(value, wildcard, fill_missing)
+    return out
+
+
+def _drop(data: Any, tree: _Tree) -> Any:
+    if isinstance(data, list):
+        return [_drop(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    out = {}
+    for key, value in data.items():
+        sub = tree.get(key, tree.get("*"))
+        if sub is True:
+            continue
+        out[key] = _drop(value, sub) if sub else value
+    return out
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str) -> Projection:
+    include: _Tree = {}
+    exclude: _Tree = {}
+    for raw in selector.split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        if raw.startswith("-") or raw.startswith("!"):
+            _insert(exclude, _split_path(raw[1:]))
+        else:
+            _insert(include, _split_path(raw))
+    return Projection(include or None, exclude)
+
+
+def project(data: Any, selector: str | None, fill_missing: bool = False) -> Any:
+    """依選擇器裁剪資料；selector 為空時原樣返回。"""
+    if not selector:
+        return data
+    return compile_selector(selector).apply(data, fill_missing)
@@ -0,0 +1,272 @@
+"""
+查詢正規化：把同一個邏輯查詢的不同寫法歸成同一個快取鍵。
+
+- 擴充語法解析成 AST 後正規化：多餘空白去除、巢狀 AND/OR 攤平、
+  可交換的運算元排序並去重，如 '"聖嚴"  "法鼓"' 與 '"法鼓" "聖嚴"' 得到同一字串。
+  語法與優先順序依 CBETA 後端（Sphinx 擴充查詢語法）：空白為 AND，| 為 OR 且優先於 AND，
+  ! 或 - 為 NOT，NEAR/n 為鄰近；NEAR 保留原順序。無法解析的查詢只去掉頭尾空白。
+- 參數正規化：去除 None、空字串與 start=0 這類與省略等價的參數，值一律轉成字串。
+- 分頁：start/rows 另外拆出，讓 _http 能用已快取的較大頁面回答落在其範圍內的小頁面。
+
+這裡產生的鍵只用於快取；送往上游的仍是原始查詢。
+同一份 AST 也供本地索引求值（evaluate / positive_terms）。
+"""
+
+import re
+
+# q 參數支援擴充語法的 API；一般全文檢索（/search）與 KWIC 的 q 是字面字串，不可重排
+EXTENDED_QUERY_PATHS = {"/search/extended", "/search/notes", "/search/all_in_one"}
+
+# 回傳 {"num_found", "results": [...]} 並以 start/rows 分頁的 API
+PAGED_PATHS = {"/search", "/search/extended", "/search/notes", "/search/all_in_one", "/search/title"}
+
+_TOKEN = re.compile(r'\s*(?:("[^"]*"(?:~\d+|/\d+)?)|(NEAR/\d+)|([()|!]|-(?=["(]))|([^\s"()|!]+))')
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+def tokenize(q: str) -> list[tuple[str, str]]:
+    tokens = []
+    pos = 0
+    q = q.rstrip()
+    while pos < len(q):
+        m = _TOKEN.match(q, pos)
+        if not m or m.end() == pos:
+            raise QuerySyntaxError(f"無法解析的查詢：{q[pos:]}")
+        quoted, near, op, bare = m.groups()
+        if quoted is not None:
+            tokens.append(("term", quoted))
+        elif near:
+            tokens.append(("near", near))
+        elif op:
+            tokens.append(("op", "!" if op == "-" else op))
+        else:
+            tokens.append(("term", bare))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """
+    文法（| 優先於 AND）：
+        and   := or or*
+        or    := unary ('|' unary)*
+        unary := '!' unary | near
+        near  := primary (NEAR/n primary)*
+        primary := TERM | '(' and ')'
+    AST 節點為 tuple：("term", 字串)、("not", x)、("near", "NEAR/n", [x, ...])、("and", [...])、("or", [...])
+    """
+
+    def __init__(self, tokens: list[tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise QuerySyntaxError("查詢不完整")
+        self.pos += 1
+        return token
+
+    def parse(self) -> tuple:
+        node = self.and_expr()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"多餘的符號：{self.peek()[1]}")
+        return node
+
+    def and_expr(self) -> tuple:
+        items = [self.or_expr()]
+        while self.peek() is not None and self.peek() != ("op", ")"):
+            items.append(self.or_expr())
+        return items[0] if len(items) == 1 else ("and", items)
+
+    def or_expr(self) -> tuple:
+        items = [self.unary()]
+        while self.peek() == ("op", "|"):
+            self.take()
+            items.append(self.unary())
+        return items[0] if len(items) == 1 else ("or", items)
+
+    def unary(self) -> tuple:
+        if self.peek() == ("op", "!"):
+            self.take()
+            return ("not", self.unary())
+        return self.near()
+
+    def near(self) -> tuple:
+        node = self.primary()
+        while self.peek() is not None and self.peek()[0] == "near":
+            op = self.take()[1]
+            right = self.primary()
+            if node[0] == "near" and node[1] == op:
+                node = ("near", op, [*node[2], right])
+            else:
+                node = ("near", op, [node, right])
+        return node
+
+    def primary(self) -> tuple:
+        kind, value = self.take()
+        if kind == "term":
+            return ("term", value)
+        if (kind, value) == ("op", "("):
+            node = self.and_expr()
+            if self.take() != ("op", ")"):
+                raise QuerySyntaxError("括號未閉合")
+            return node
+        raise QuerySyntaxError(f"預期查詢詞，遇到：{value}")
+
+
+def parse(q: str) -> tuple:
+    return _Parser(tokenize(q)).parse()
+
+
+def term_text(value: str) -> str:
+    """取出查詢詞本身；"詞"~n、"詞"/n 這類詞組運算本地不支援。"""
+    if value.startswith('"'):
+        if not value.endswith('"') or len(value) < 3:
+            raise QuerySyntaxError(f"本地檢索不支援的查詢詞：{value}")
+        return value[1:-1]
+    return value
+
+
+def single_term(q: str) -> str | None:
+    """查詢只有單一詞時回傳該詞，否則（含無法解析或本地不支援的詞）回傳 None；本地引擎只處理單詞。"""
+    try:
+        node = parse(q)
+        return term_text(node[1]) if node[0] == "term" else None
+    except QuerySyntaxError:
+        return None
+
+
+def positive_terms(node: tuple) -> list[str]:
+    """不在 NOT 之下的查詢詞（用於候選過濾與高亮）。"""
+    kind = node[0]
+    if kind == "term":
+        return [term_text(node[1])]
+    if kind == "not":
+        return []
+    children = node[2] if kind == "near" else node[1]
+    return list(dict.fromkeys(t for child in children for t in positive_terms(child)))
+
+
+def _positions(text: str, term: str) -> list[int]:
+    out = []
+    i = text.find(term)
+    while i >= 0:
+        out.append(i)
+        i = text.find(term, i + 1)
+    return out
+
+
+def _near(text: str, a: str, b: str, distance: int) -> bool:
+    pa, pb = _positions(text, a), _positions(text, b)
+    return any(
+        (j - (i + len(a)) if j >= i else i - (j + len(b))) <= distance
+        for i in pa for j in pb
+    )
+
+
+def evaluate(node: tuple, text: str) -> bool:
+    """在一段文字上對查詢 AST 求值；NEAR/n 以字元距離計算，兩側須為單一查詢詞。"""
+    kind = node[0]
+    if kind == "term":
+        return term_text(node[1]) in text
+    if kind == "not":
+        return not evaluate(node[1], text)
+    if kind == "and":
+        return all(evaluate(n, text) for n in node[1])
+    if kind == "or":
+        return any(evaluate(n, text) for n in node[1])
+    if any(n[0] != "term" for n in node[2]):
+        raise QuerySyntaxError("本地檢索的 NEAR 兩側須為單一查詢詞")
+    distance = int(node[1].split("/")[1])
+    terms = [term_text(n[1]) for n in node[2]]
+    return all(_near(text, a, b, distance) for a, b in zip(terms, terms[1:]))
+
+
+def normalize(node: tuple) -> tuple:
+    """攤平巢狀 AND/OR，排序並去除重複的運算元。"""
+    kind = node[0]
+    if kind == "term":
+        return node
+    if kind == "not":
+        return ("not", normalize(node[1]))
+    if kind == "near":
+        return ("near", node[1], [normalize(n) for n in node[2]])
+    items = []
+    for child in (normalize(n) for n in node[1]):
+        items.extend(child[1] if child[0] == kind else [child])
+    unique = {to_string(n): n for n in items}
+    # AND 中排除詞（NOT）排在後面，確保查詢不以 ! 開頭
+    keys = sorted(unique, key=lambda s: (unique[s][0] == "not", s))
+    return unique[keys[0]] if len(keys) == 1 else (kind, [unique[k] for k in keys])
+
+
+def to_string(node: tuple) -> str:
+    kind = node[0]
+    if kind == "term":
+        return node[1]
+    if kind == "not":
+        return "!" + _wrap(node[1], ("term",))
+    if kind == "near":
+        return f" {node[1]} ".join(_wrap(n, ("term",)) for n in node[2])
+    if kind == "and":
+        return " ".join(_wrap(n, ("term", "not", "near", "or")) for n in node[1])
+    return " | ".join(_wrap(n, ("term", "not", "near")) for n in node[1])
+
+
+def _wrap(node: tuple, bare_kinds: tuple) -> str:
+    text = to_string(node)
+    return text if node[0] in bare_kinds else f"({text})"
+
+
+def canonical_query(q: str) -> str:
+    try:
+        return to_string(normalize(parse(q)))
+    except QuerySyntaxError:
+        return q.strip()
+
+
+def _value(v) -> str:
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    return str(v).strip()
+
+
+def canonical_params(path: str, params: dict | None) -> dict[str, str]:
+    out = {}
+    for k, v in (params or {}).items():
+        if v is None or _value(v) == "":
+            continue
+        if k == "start" and _value(v) == "0":
+            continue
+        out[k] = _value(v)
+    if "q" in out:
+        out["q"] = canonical_query(out["q"]) if path in EXTENDED_QUERY_PATHS else out["q"]
+    return out
+
+
+def cache_key(path: str, params: dict | None) -> tuple:
+    return path, tuple(sorted(canonical_params(path, params).items()))
+
+
+def page_key(path: str, params: dict | None) -> tuple[tuple, int, int] | None:
+    """
+    分頁 API 回傳 (不含 start/rows 的鍵, start, rows)，其他 API 回傳 None。
+
+    rows 未指定時無法得知上游預設值，不做分頁比對。
+    """
+    if path not in PAGED_PATHS:
+        return None
+    canonical = canonical_params(path, params)
+    try:
+        start = int(canonical.pop("start", 0))
+        rows = int(canonical.pop("rows"))
+    except (KeyError, ValueError):
+        return None
+    return (path, tuple(sorted(canonical.items()))), start, rows
@@ -0,0 +1,173 @@
+"""
+共用 httpx 用戶端的錄製／重播傳輸層，讓工具可在無網路環境下重現上游回應（效能回歸測試用）。
+
+- CBETA_HTTP_RECORD=<檔案>：照常呼叫上游，並把每筆交換附加寫入檔案（*.gz 時以 gzip 壓縮）。
+- CBETA_HTTP_REPLAY=<檔案>：不連網，依 (method, path, 正規化參數) 從檔案回應；
+  CBETA_HTTP_REPLAY_SCALE 為回應延遲相對錄製時耗時的倍數（預設 1 = 原始耗時，0 = 立即回應）。
+
+檔案格式與 tests/fake_cbeta.py 相同，每行一筆：
+
+    {"request": {"method": "GET", "path": "/search", "params": [["q", "法鼓"], ...]},
+     "response": {"status": 200, "headers": {...}, "body": "..."},   # 或 body_b64
+     "elapsed": 0.21}
+
+錄製時保存線上的原始位元組（含 content-encoding 壓縮），重播時逐位元組相同；
+同一請求錄到多次時依錄製順序重播，用完後重複最後一筆。
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import os
+import pathlib
+import time
+from collections import defaultdict
+
+import httpx
+
+from tools.cebta._query import cache_key
+
+
+class ReplayMiss(httpx.TransportError):
+    """重播檔中沒有對應的請求。"""
+
+
+def load_exchanges(path: str | os.PathLike) -> list[dict]:
+    path = pathlib.Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(row) for row in f if row.strip()]
+
+
+def response_body(exchange: dict) -> bytes:
+    response = exchange["response"]
+    if "body_b64" in response:
+        return base64.b64decode(response["body_b64"])
+    return response.get("body", "").encode("utf-8")
+
+
+def encode_body(body: bytes, headers: dict) -> dict:
+    """可讀的 UTF-8 文字存成 body，壓縮或二進位內容存成 body_b64。"""
+    if "content-encoding" not in headers:
+        try:
+            return {"body": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            pass
+    return {"body_b64": base64.b64encode(body).decode("ascii")}
+
+
+class ExchangeTable:
+    """
+    依 (method, 正規化後的 path + 參數) 查找錄製的交換；strict=False 時找不到就退回同一 path 的第一筆。
+    """
+
+    def __init__(self, exchanges: list[dict], strict: bool = True):
+        self.strict = strict
+        self._exact: dict[tuple, list[dict]] = defaultdict(list)
+        self._by_path: dict[tuple, dict] = {}
+        self._served: dict[tuple, int] = defaultdict(int)
+        for exchange in exchanges:
+            request = exchange["request"]
+            method = request.get("method", "GET")
+            self._exact[(method, cache_key(request["path"], dict(request.get("params") or [])))].append(exchange)
+            self._by_path.setdefault((method, request["path"]), exchange)
+
+    def match(self, method: str, path: str, params: dict) -> dict | None:
+        key = (method, cache_key(path, params))
+        recorded = self._exact.get(key)
+        if recorded:
+            i = self._served[key]
+            self._served[key] = i + 1
+            return recorded[min(i, len(recorded) - 1)]
+        if self.strict:
+            return None
+        return self._by_path.get((method, path))
+
+
+def _relative_path(url: httpx.URL, prefix: str) -> str:
+    path = url.path
+    return (path[len(prefix):] or "/") if prefix and path.startswith(prefix) else path
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """包住實際的傳輸層，把每筆交換寫入 path（逐行寫入，關閉時才 flush gzip 尾端）。"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: str | os.PathLike, base: str = ""):
+        self.inner = inner
+        self.path = pathlib.Path(path)
+        self.prefix = httpx.URL(base).path.rstrip("/") if base else ""
+        self.recorded = 0
+        self._file = None
+
+    def _write(self, exchange: dict) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            opener = gzip.open if self.path.suffix == ".gz" else open
+            self._file = opener(self.path, "at", encoding="utf-8")
+        self._file.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+        self.recorded += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            raw = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        elapsed = time.perf_counter() - started
+
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        self._write({
+            "request": {
+                "method": request.method,
+                "path": _relative_path(request.url, self.prefix),
+                "params": request.url.params.multi_items(),
+            },
+            "response": {"status": response.status_code, "headers": headers, **encode_body(raw, headers)},
+            "elapsed": round(elapsed, 6),
+        })
+        return httpx.Response(response.status_code, headers=response.headers, content=raw,
+                              extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """不連網，從錄製的交換回應；scale 為延遲相對原始耗時的倍數。"""
+
+    def __init__(self, exchanges: list[dict], scale: float = 1.0, strict: bool = True, base: str = ""):
+        self.table = ExchangeTable(exchanges, strict=strict)
+        self.scale = scale
+        self.prefix = httpx.URL(base).path.rstrip("/") if base else ""
+        self.replayed = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = _relative_path(request.url, self.prefix)
+        exchange = self.table.match(request.method, path, dict(request.url.params))
+        if exchange is None:
+            raise ReplayMiss(f"no recorded exchange for {request.method} {path}?{request.url.query.decode()}",
+                             request=request)
+        delay = exchange.get("elapsed", 0.0) * self.scale
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.replayed += 1
+        response = exchange["response"]
+        return httpx.Response(response["status"], headers=response.get("headers", {}),
+                              content=response_body(exchange), request=request)
+
+
+def transport_from_env(base: str, limits: httpx.Limits) -> httpx.AsyncBaseTransport | None:
+    """依 CBETA_HTTP_REPLAY / CBETA_HTTP_RECORD 建立傳輸層；都未設定時回傳 None（使用預設連線）。"""
+    replay = os.getenv("CBETA_HTTP_REPLAY")
+    if replay:
+        scale = float(os.getenv("CBETA_HTTP_REPLAY_SCALE", "1"))
+        return ReplayTransport(load_exchanges(replay), scale=scale, base=base)
+    record = os.getenv("CBETA_HTTP_RECORD")
+    if record:
+        return RecordingTransport(httpx.AsyncHTTPTransport(limits=limits), record, base=base)
+    return None
@@ -0,0 +1,332 @@
+"""
+後綴陣列（suffix array + LCP）：在本地語料上精確計算任意子字串的出現次數與位置。
+
+bigram 倒排表只能求候選卷，任意長度子字串的精確次數仍須逐卷掃描；
+後綴陣列以二分搜尋求出所有以該字串開頭的後綴區間，次數即區間長度，O(m log n)。
+
+每個 segment 另存四個檔案（與 segment 同樣不可變）：
+
+    suffix.json   {"version", "byteorder", "length", "suffixes"}，載入時據此檢查是否過期
+    suffix.txt    全部卷文字以 U+0000 分隔串接（每卷之後一個分隔字元），UTF-32-LE，可依位置隨機讀取
+    suffix.sa     後綴起點（uint32，本機位元組順序），分隔字元位置不收錄
+    suffix.lcp    lcp[i] = 第 i-1 與第 i 個後綴的共同前綴長度（lcp[0] = 0）
+
+三個陣列都以 mmap 載入，不佔 Python 物件記憶體。索引換版（增量更新、合併）後，
+已不在 manifest 中的 segment 的快取項目會被移除，mmap 在最後一個仍在進行的查詢結束後隨物件釋放而關閉。列舉命中位置時沿 LCP 前進
+（lcp[i] >= m 即仍在區間內），不需再讀文字比對；位置再經卷起點與行起始位移換回 linehead。
+
+建立：
+    python -m tools.cebta._suffix_array <index_dir>
+或匯入時加上 --suffix-array。
+"""
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import pathlib
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterator
+
+from tools.cebta._corpus import MANIFEST, CorpusIndex, Segment
+
+VERSION = 1
+SEPARATOR = "\x00"
+ORDERS = ("suffix", "location")
+
+# 排序鍵的初始長度；鍵相同的後綴再以加倍長度的下一段比較
+_KEY_CHARS = 32
+
+
+@dataclass
+class Occurrence:
+    seg: Segment
+    doc: int
+    offset: int
+
+
+def _sort_suffixes(text: str, positions: list[int], offset: int = 0, width: int = _KEY_CHARS) -> list[int]:
+    """依後綴排序 positions；已知這些後綴前 offset 字相同。"""
+    keyed = sorted((text[p + offset:p + offset + width], p) for p in positions)
+    out: list[int] = []
+    i = 0
+    while i < len(keyed):
+        key = keyed[i][0]
+        j = i + 1
+        while j < len(keyed) and keyed[j][0] == key:
+            j += 1
+        if j - i > 1 and len(key) == width:
+            out.extend(_sort_suffixes(text, [p for _, p in keyed[i:j]], offset + width, width * 2))
+        else:
+            # 鍵不足 width 字表示已讀到文字結尾，不同位置的這類鍵長度必不同，不會相等
+            out.extend(p for _, p in keyed[i:j])
+        i = j
+    return out
+
+
+def suffix_array(text: str) -> array:
+    """
+    建立後綴陣列（略過分隔字元位置）。
+
+    先依首字分桶，再逐桶排序；每桶只需該桶的排序鍵，尖峰記憶體取決於最常見的字。
+    """
+    buckets: dict[str, array] = {}
+    for i, ch in enumerate(text):
+        if ch != SEPARATOR:
+            bucket = buckets.get(ch)
+            if bucket is None:
+                bucket = buckets[ch] = array("I")
+            bucket.append(i)
+    sa = array("I")
+    for ch in sorted(buckets):
+        sa.extend(_sort_suffixes(text, buckets.pop(ch).tolist(), 1))
+    return sa
+
+
+def lcp_array(text: str, sa: array) -> array:
+    """Kasai 演算法；sa 不含分隔字元位置時仍成立（分隔字元之後的共同前綴歸零重算）。"""
+    n = len(text)
+    missing = len(sa)
+    rank = array("I", [missing]) * n
+    for r, p in enumerate(sa):
+        rank[p] = r
+    lcp = array("I", [0]) * len(sa)
+    h = 0
+    for p in range(n):
+        r = rank[p]
+        if r == missing:
+            h = 0
+            continue
+        if r == 0:
+            h = 0
+            continue
+        q = sa[r - 1]
+        while p + h < n and q + h < n and text[p + h] == text[q + h] and text[p + h] != SEPARATOR:
+            h += 1
+        lcp[r] = h
+        if h:
+            h -= 1
+    return lcp
+
+
+def _doc_starts(lengths: list[int]) -> array:
+    starts = array("Q")
+    pos = 0
+    for length in lengths:
+        starts.append(pos)
+        pos += length + 1
+    return starts
+
+
+def build(seg: Segment) -> dict:
+    """為一個 segment 建立後綴陣列檔案，回傳統計資訊（各階段耗時與檔案大小）。"""
+    started = time.perf_counter()
+    text = "".join(t + SEPARATOR for t in seg.texts)
+    sa = suffix_array(text)
+    sorted_at = time.perf_counter()
+    lcp = lcp_array(text, sa)
+    lcp_at = time.perf_counter()
+
+    files = {
+        "suffix.txt": text.encode("utf-32-le"),
+        "suffix.sa": sa.tobytes(),
+        "suffix.lcp": lcp.tobytes(),
+        "suffix.json": json.dumps({
+            "version": VERSION, "byteorder": sys.byteorder, "length": len(text), "suffixes": len(sa),
+        }).encode("utf-8"),
+    }
+    # suffix.json 最後寫入：中途失敗時舊的 json 與新陣列長度不符，載入時視為過期
+    for name, data in files.items():
+        tmp = seg.path / f"{name}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, seg.path / name)
+    return {
+        "segment": seg.path.name,
+        "chars": len(text),
+        "suffixes": len(sa),
+        "sort_seconds": round(sorted_at - started, 3),
+        "lcp_seconds": round(lcp_at - sorted_at, 3),
+        "bytes": sum(len(data) for data in files.values()),
+    }
+
+
+class SuffixArray:
+    """一個 segment 的後綴陣列（mmap）。"""
+
+    def __init__(self, seg: Segment):
+        self.seg = seg
+        meta = json.loads((seg.path / "suffix.json").read_text(encoding="utf-8"))
+        self.doc_starts = _doc_starts([len(t) for t in seg.texts])
+        length = sum(len(t) + 1 for t in seg.texts)
+        if meta.get("version") != VERSION or meta.get("byteorder") != sys.byteorder or meta.get("length") != length:
+            raise ValueError(f"後綴陣列與 segment 內容不符：{seg.path}")
+        self.length = length
+        self.size = meta["suffixes"]
+        self._maps = {name: self._map(seg.path / name) for name in ("suffix.txt", "suffix.sa", "suffix.lcp")}
+        self.text = self._maps["suffix.txt"]
+        self.sa = memoryview(self._maps["suffix.sa"]).cast("I")
+        self.lcp = memoryview(self._maps["suffix.lcp"]).cast("I")
+        if len(self.text) != 4 * length or len(self.sa) != self.size or len(self.lcp) != self.size:
+            self.close()
+            raise ValueError(f"後綴陣列檔案不完整：{seg.path}")
+
+    @staticmethod
+    def _map(path: pathlib.Path) -> mmap.mmap | bytes:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # 空 segment 無法 mmap
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        for view in ("sa", "lcp"):
+            if isinstance(getattr(self, view, None), memoryview):
+                getattr(self, view).release()
+        for m in self._maps.values():
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+    def _prefix(self, rank: int, m: int) -> str:
+        p = self.sa[rank]
+        return self.text[4 * p:4 * min(p + m, self.length)].decode("utf-32-le")
+
+    def range(self, term: str) -> tuple[int, int]:
+        """以 term 開頭的後綴在陣列中的區間 [lo, hi)。"""
+        m = len(term)
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._prefix(mid, m) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.size or self._prefix(lo, m) != term:
+            return lo, lo
+        # 命中不多時沿 LCP 前進即可找到區間終點，否則改用二分搜尋
+        end = lo + 1
+        limit = min(self.size, lo + 64)
+        while end < limit and self.lcp[end] >= m:
+            end += 1
+        if end < limit or end == self.size:
+            return lo, end
+        hi = self.size
+        while end < hi:
+            mid = (end + hi) // 2
+            if self._prefix(mid, m) == term:
+                end = mid + 1
+            else:
+                hi = mid
+        return lo, end
+
+    def count(self, term: str) -> int:
+        lo, hi = self.range(term)
+        return hi - lo
+
+    def locate(self, pos: int) -> tuple[int, int]:
+        """串接文字中的位置 → (doc, 卷內位移)。"""
+        doc = bisect_right(self.doc_starts, pos) - 1
+        return doc, pos - self.doc_starts[doc]
+
+
+_loaded: dict[str, SuffixArray | None] = {}
+# 索引根目錄 → _loaded 已依其 manifest 清理過的 generation
+_synced: dict[str, int] = {}
+
+
+def _sync(index: CorpusIndex) -> None:
+    """移除同一索引中已不在目前 manifest 的 segment 的後綴陣列。"""
+    root = str(index.root)
+    if _synced.get(root) == index.generation:
+        return
+    live = {str(seg.path) for seg in index.segments}
+    for key in [k for k in _loaded if str(pathlib.Path(k).parent) == root and k not in live]:
+        # 不直接 close：舊版索引上進行中的查詢可能仍在讀取
+        del _loaded[key]
+    _synced[root] = index.generation
+
+
+def for_segment(seg: Segment) -> SuffixArray | None:
+    """載入（並快取）segment 的後綴陣列；尚未建立或已過期時回傳 None。"""
+    key = str(seg.path)
+    if key not in _loaded:
+        _loaded[key] = None
+        if (seg.path / "suffix.json").exists():
+            try:
+                _loaded[key] = SuffixArray(seg)
+            except Exception as e:
+                print(f"❌ 後綴陣列載入失敗：{seg.path}, error: {e}")
+    return _loaded[key]
+
+
+def available(index: CorpusIndex) -> bool:
+    _sync(index)
+    return all(for_segment(seg) is not None for seg in index.segments)
+
+
+def _live_count(seg: Segment, term: str) -> int:
+    sa = for_segment(seg)
+    if not seg.deleted:
+        return sa.count(term)
+    lo, hi = sa.range(term)
+    return sum(1 for r in range(lo, hi) if sa.locate(sa.sa[r])[0] not in seg.deleted)
+
+
+def count(index: CorpusIndex, term: str) -> int:
+    """精確出現次數；segment 有已刪除（被增量更新取代）的卷時，須逐筆排除這些卷的命中。"""
+    _sync(index)
+    return sum(_live_count(seg, term) for seg in index.segments)
+
+
+def _segment_occurrences(seg: Segment, term: str) -> Iterator[Occurrence]:
+    """單一 segment 內依後綴順序產出命中，只讀取實際取用的筆數。"""
+    sa = for_segment(seg)
+    lo, hi = sa.range(term)
+    for r in range(lo, hi):
+        doc, offset = sa.locate(sa.sa[r])
+        if doc not in seg.deleted:
+            yield Occurrence(seg, doc, offset)
+
+
+def _location_key(occ: Occurrence) -> tuple[str, int, int]:
+    d = occ.seg.docs[occ.doc]
+    return d.work, d.juan, occ.offset
+
+
+def occurrences(index: CorpusIndex, term: str, order: str = "suffix") -> Iterator[Occurrence]:
+    """
+    逐筆產出命中位置。
+
+    order='suffix' 時逐個 segment 產出，段內依後綴順序（即依關鍵詞之後的文字排序，同 KWIC 的 'f'），
+    只讀取實際取用的筆數；order='location' 時全部 segment 依（佛典、卷、位移）合併排序，
+    需先取出並排序每段全部命中，命中多時應經 _offload.run 移出事件迴圈。
+    """
+    _sync(index)
+    if order == "suffix":
+        for seg in index.segments:
+            yield from _segment_occurrences(seg, term)
+        return
+    runs = [sorted(_segment_occurrences(seg, term), key=_location_key) for seg in index.segments]
+    yield from heapq.merge(*runs, key=_location_key)
+
+
+def build_index(root: pathlib.Path) -> list[dict]:
+    index = CorpusIndex(root)
+    return [build(seg) for seg in index.segments]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build suffix arrays for a local CBETA index")
+    parser.add_argument("index", type=pathlib.Path, help="索引目錄（即 CBETA_INDEX_DIR）")
+    args = parser.parse_args()
+    if not (args.index / MANIFEST).exists():
+        parser.error(f"找不到 {args.index / MANIFEST}")
+    for stats in build_index(args.index):
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+本地近義詞圖。
+
+由匯出的近義詞表（CBETA_SYNONYM_TABLE）建立，以 union-find 將互為近義的詞併成同一群，
+群內具遞移性（A~B、B~C ⇒ A~C）。建好後每個詞直接對應其所屬群組，查詢為 O(1) 字典查找。
+
+近義詞表支援兩種格式：
+- .jsonl：每行一筆 /search/synonym 的結果，如 {"q": "文殊師利", "results": ["曼殊室利", ...]}
+- 其他：每行一組近義詞，以 Tab、逗號或空白分隔，如「文殊師利\t曼殊室利\t妙吉祥」
+"""
+
+import asyncio
+import json
+import os
+import pathlib
+import re
+
+from tools.cebta._http import get_json
+from tools.cebta._query import QuerySyntaxError, parse, term_text, to_string
+
+SYNONYM_TABLE = os.getenv("CBETA_SYNONYM_TABLE")
+
+_SEPARATORS = re.compile(r"[\t,，\s]+")
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent: dict[str, str] = {}
+        self.rank: dict[str, int] = {}
+
+    def find(self, x: str) -> str:
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.rank[x] = 0
+            return x
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:  # 路徑壓縮
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a: str, b: str) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+
+
+class SynonymGraph:
+    def __init__(self, groups: list[list[str]]):
+        uf = UnionFind()
+        for group in groups:
+            terms = [t for t in group if t]
+            for term in terms:
+                uf.find(term)
+            for term in terms[1:]:
+                uf.union(terms[0], term)
+        clusters: dict[str, list[str]] = {}
+        for term in uf.parent:
+            clusters.setdefault(uf.find(term), []).append(term)
+        self._cluster: dict[str, tuple[str, ...]] = {}
+        for members in clusters.values():
+            frozen = tuple(sorted(members))
+            for term in members:
+                self._cluster[term] = frozen
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._cluster
+
+    def __len__(self) -> int:
+        return len(self._cluster)
+
+    def synonyms(self, term: str) -> list[str]:
+        """回傳 term 的所有（遞移）近義詞，不含 term 本身。"""
+        return [t for t in self._cluster.get(term, ()) if t != term]
+
+    def expand(self, term: str) -> list[str]:
+        """回傳 [term, *近義詞]，用於查詢擴展。"""
+        return [term, *self.synonyms(term)]
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "SynonymGraph":
+        groups: list[list[str]] = []
+        with open(path, encoding="utf-8") as f:
+            for row in f:
+                row = row.strip()
+                if not row or row.startswith("#"):
+                    continue
+                if path.suffix == ".jsonl":
+                    record = json.loads(row)
+                    groups.append([record.get("q") or record.get("term", ""),
+                                   *(record.get("results") or record.get("synonyms") or [])])
+                else:
+                    groups.append(_SEPARATORS.split(row))
+        return cls(groups)
+
+
+def _expandable(node: tuple) -> list[str]:
+    """AST 中可擴展的詞：NOT 之下與 NEAR 兩側的詞不擴展，以免改變語意；"詞"~n 這類詞組運算也不擴展。"""
+    kind = node[0]
+    if kind == "term":
+        try:
+            return [term_text(node[1])]
+        except QuerySyntaxError:
+            return []
+    if kind in ("not", "near"):
+        return []
+    return [t for child in node[1] for t in _expandable(child)]
+
+
+def _parse(q: str) -> tuple | None:
+    try:
+        return parse(q)
+    except QuerySyntaxError:
+        return None
+
+
+def query_terms(q: str) -> list[str]:
+    node = _parse(q)
+    return list(dict.fromkeys(_expandable(node))) if node is not None else []
+
+
+def expand_query(q: str, expansions: dict[str, list[str]]) -> str:
+    """
+    將擴充語法查詢中的每個可擴展的詞改寫為 ("詞" | "近義詞" ...)。
+
+    expansions 為 {詞: [詞, *近義詞]}；沒有任何詞可擴展（或查詢無法解析）時原樣傳回 q。
+    """
+    node = _parse(q)
+    if node is None:
+        return q
+    changed = False
+
+    def rewrite(node: tuple) -> tuple:
+        nonlocal changed
+        kind = node[0]
+        if kind in ("not", "near"):
+            return node
+        if kind == "term":
+            terms = _expandable(node)
+            group = expansions.get(terms[0]) if terms else None
+            if not group or len(group) < 2:
+                return node
+            changed = True
+            # 以括號包起的 OR 群組當作一個詞輸出，單獨成為查詢時也保留括號
+            return ("term", "(" + " | ".join(f'"{t}"' for t in group) + ")")
+        return (kind, [rewrite(child) for child in node[1]])
+
+    expanded = rewrite(node)
+    return to_string(expanded) if changed else q
+
+
+async def lookup(term: str) -> list[str]:
+    """回傳 [term, *近義詞]；本地近義詞表沒有此詞時改查 CBETA API。"""
+    graph = get_graph()
+    if graph is not None and term in graph:
+        return graph.expand(term)
+    data = await get_json("/search/synonym", {"q": term})
+    return [term, *(t for t in data.get("results", []) if t != term)]
+
+
+async def expansions_for(q: str) -> dict[str, list[str]]:
+    terms = query_terms(q)
+    return dict(zip(terms, await asyncio.gather(*(lookup(t) for t in terms))))
+
+
+_graph: SynonymGraph | None = None
+_graph_loaded = False
+
+
+def get_graph() -> SynonymGraph | None:
+    """載入（並快取）CBETA_SYNONYM_TABLE 指定的近義詞表；未設定或失敗時回傳 None。"""
+    global _graph, _graph_loaded
+    if not _graph_loaded:
+        _graph_loaded = True
+        if SYNONYM_TABLE and pathlib.Path(SYNONYM_TABLE).exists():
+            try:
+                _graph = SynonymGraph.load(pathlib.Path(SYNONYM_TABLE))
+            except Exception as e:
+                print(f"❌ 近義詞表載入失敗：{SYNONYM_TABLE}, error: {e}")
+    return _graph
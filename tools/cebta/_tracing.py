@@ -0,0 +1,316 @@
+"""
+行程內的請求追蹤（OpenTelemetry 風格的 span），用來拆解一次工具呼叫的時間花在哪裡。
+
+- span(name, **attrs)：context manager，建立目前 span 的子 span，以 contextvars 傳遞，
+  同步、非同步與 to_thread 的程式碼都適用；不在任何 trace 中（如 CLI、直接呼叫）時不記錄。
+- 儀表點：HTTP 請求（TraceASGIMiddleware，含 W3C traceparent）、工具派送與排隊（TracingMiddleware）、
+  回應快取查詢、上游 HTTP（連線/TLS/送出/TTFB/本文，取自 httpcore 的 trace 事件）、JSON 解碼、
+  回應編碼（信封建立後到 FastMCP 轉換完成）。
+- trace 的本地根 span 結束時整批匯出：
+  CBETA_TRACE_FILE=<檔案> 逐行寫入 OTLP/JSON；CBETA_TRACE_OTLP=<URL> 以 OTLP/HTTP JSON POST 到 collector。
+  最近 CBETA_TRACE_KEEP（預設 256）筆保留在記憶體，可由 /traces/{trace_id} 查詢。
+- CBETA_TRACE_SAMPLE 為記錄比例（預設 1）；未取樣的呼叫仍有 trace_id，只是不記錄 span。
+- 等待根 span 結束的 trace 最多保留 CBETA_TRACE_MAX_OPEN（預設 1024）筆，超過時丟棄最久沒有新 span 的一筆
+  （根 span 沒有結束，或子 span 在根 span 結束後才結束），避免常駐行程累積記憶體。
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from tools.cebta import _metrics
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "cbeta-mcp")
+SAMPLE = float(os.getenv("CBETA_TRACE_SAMPLE", "1"))
+TRACE_FILE = os.getenv("CBETA_TRACE_FILE")
+OTLP_ENDPOINT = os.getenv("CBETA_TRACE_OTLP")
+KEEP = int(os.getenv("CBETA_TRACE_KEEP", "256"))
+MAX_OPEN = int(os.getenv("CBETA_TRACE_MAX_OPEN", "1024"))
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("cbeta_span", default=None)
+_open: OrderedDict[str, list["Span"]] = OrderedDict()
+recent: OrderedDict[str, list[dict]] = OrderedDict()
+_rng = random.Random()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "events", "error", "sampled", "local_root", "result_ns")
+
+    def __init__(self, name: str, parent: "Span | None" = None, trace_id: str | None = None,
+                 parent_id: str | None = None, sampled: bool | None = None, **attributes: Any):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else trace_id or f"{_rng.getrandbits(128):032x}"
+        self.span_id = f"{_rng.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else parent_id
+        self.sampled = parent.sampled if parent else (sampled if sampled is not None else _rng.random() < SAMPLE)
+        self.local_root = parent is None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.events: list[tuple[str, int, dict]] = []
+        self.error: str | None = None
+        self.result_ns: int | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes: Any) -> None:
+        self.events.append((name, time.time_ns(), attributes))
+
+    def end(self, end_ns: int | None = None) -> None:
+        self.end_ns = end_ns or time.time_ns()
+        if not self.sampled:
+            return
+        spans = _open.get(self.trace_id)
+        if spans is None:
+            spans = _open[self.trace_id] = []
+            while len(_open) > MAX_OPEN:
+                _open.popitem(last=False)
+                _metrics.incr("tracing.dropped")
+        else:
+            _open.move_to_end(self.trace_id)
+        spans.append(self)
+        if self.local_root:
+            _finish(self.trace_id, _open.pop(self.trace_id))
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": [{"name": n, "offset_ms": round((t - self.start_ns) / 1e6, 3), **a} for n, t, a in self.events],
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def current_trace_id() -> str | None:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """以目前 span 為父開一個子 span；目前沒有 span 時回傳不記錄的 span。"""
+    parent = _current.get()
+    s = Span(name, parent=parent, **attributes) if parent else Span(name, sampled=False, **attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+def child(parent: Span, name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+    """補記一段已知起訖時間的子 span（如排隊、上游連線各階段）。"""
+    s = Span(name, parent=parent, **attributes)
+    s.start_ns = start_ns
+    s.end(end_ns)
+
+
+def mark_result() -> None:
+    """工具建立回應信封時呼叫，之後到 FastMCP 轉換完成的時間記為 encode。"""
+    s = _current.get()
+    if s is not None:
+        s.result_ns = time.time_ns()
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """W3C traceparent：00-<trace_id 32 hex>-<span_id 16 hex>-<flags>。"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+
+
+def http_trace_hook(parent: Span):
+    """httpx 的 trace extension：把 httpcore 的 *.started / *.complete 事件轉成子 span。"""
+    started: dict[str, int] = {}
+    phases = {
+        "connection.connect_tcp": "connect", "connection.start_tls": "tls",
+        "http11.send_request_headers": "send", "http2.send_request_headers": "send",
+        "http11.receive_response_headers": "ttfb", "http2.receive_response_headers": "ttfb",
+        "http11.receive_response_body": "body", "http2.receive_response_body": "body",
+    }
+
+    async def hook(event: str, info: dict) -> None:
+        phase, _, state = event.rpartition(".")
+        if phase not in phases:
+            return
+        if state == "started":
+            started[phase] = time.time_ns()
+        elif phase in started:
+            child(parent, f"http.{phases[phase]}", started.pop(phase), time.time_ns(),
+                  **({"failed": True} if state == "failed" else {}))
+
+    return hook
+
+
+def _finish(trace_id: str, spans: list[Span]) -> None:
+    spans.sort(key=lambda s: (s.start_ns, -s.end_ns))
+    recent[trace_id] = [s.to_dict() for s in spans]
+    while len(recent) > KEEP:
+        recent.popitem(last=False)
+    _metrics.incr("tracing.traces")
+    _metrics.incr("tracing.spans", len(spans))
+    if TRACE_FILE or OTLP_ENDPOINT:
+        export(spans)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(spans: list[Span]) -> dict:
+    """轉為 OTLP/JSON 的 ExportTraceServiceRequest。"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+        "scopeSpans": [{
+            "scope": {"name": "tools.cebta"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 2 if s.local_root else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": _otlp_attributes(s.attributes),
+                "events": [{"name": n, "timeUnixNano": str(t), "attributes": _otlp_attributes(a)}
+                           for n, t, a in s.events],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+def export(spans: list[Span]) -> None:
+    payload = to_otlp(spans)
+    if TRACE_FILE:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+    if OTLP_ENDPOINT:
+        try:
+            asyncio.get_running_loop().create_task(_post(payload))
+        except RuntimeError:  # 不在事件迴圈中（如 CLI），略過
+            pass
+
+
+async def _post(payload: dict) -> None:
+    import httpx
+
+    try:
+        # 獨立的用戶端：不經共用 client 的快取、錄製/重播與追蹤
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            await client.post(OTLP_ENDPOINT, json=payload)
+    except Exception:
+        _metrics.incr("tracing.export_errors")
+
+
+class TraceASGIMiddleware:
+    """最外層的 HTTP span；延續呼叫端的 traceparent，並放進 scope 供工具派送的 span 接續（含排隊時間）。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or ())
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        s = Span(f"{scope['method']} {scope['path']}", trace_id=remote[0] if remote else None,
+                 parent_id=remote[1] if remote else None, sampled=remote[2] if remote else None)
+        scope.setdefault("state", {})["trace_span"] = s
+        token = _current.set(s)
+        status = {}
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()),
+                                                   (b"x-trace-id", s.trace_id.encode("ascii"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            s.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            s.set(**{"http.status_code": status.get("code")})
+            s.end()
+
+
+class TracingMiddleware(Middleware):
+    """FastMCP 工具派送的 span；接續 HTTP span，並補記排隊（HTTP 到達 → 開始派送）與 encode 兩段。"""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = getattr(context.message, "name", "unknown")
+        parent = _current.get() or _http_span()
+        dispatched = time.time_ns()
+        s = Span(f"tool {name}", parent=parent, **{"mcp.tool": name})
+        if parent is not None:
+            child(parent, "queue", parent.start_ns, dispatched)
+        token = _current.set(s)
+        try:
+            result = await call_next(context)
+            if s.result_ns is not None:
+                child(s, "encode", s.result_ns, time.time_ns())
+            return result
+        except BaseException as e:
+            s.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            s.end()
+
+
+def _http_span() -> Span | None:
+    try:
+        from fastmcp.server.dependencies import get_http_request
+
+        return get_http_request().scope.get("state", {}).get("trace_span")
+    except RuntimeError:  # 非 HTTP 傳輸（如記憶體內的 Client）
+        return None
+
+
+def stats() -> dict:
+    return {"sample": SAMPLE, "kept": len(recent), "open": len(_open), "dropped": _metrics.counters["tracing.dropped"],
+            "file": TRACE_FILE, "otlp": OTLP_ENDPOINT}
+
+
+_metrics.register("tracing", stats)
@@ -0,0 +1,225 @@
+"""
+依存取熱度預熱回應快取，避免部署後第一個小時都在冷快取上。
+
+- 熱度：_http.get_raw 的每次存取（含命中）都經 record() 記入 Count-Min Sketch，
+  另保留估計次數最高的 CANDIDATES 個鍵（path + 正規化參數）。只記可預熱的 API：
+  佛典資訊（/works）、目次（/works/toc）、目錄節點（/catalog_entry）與各種檢索（/search…）；
+  卷文（/juans）體積大且分散，不預熱。
+- warm(top_k)：取熱度前 top_k 且不在 response_cache 中的鍵，以 CBETA_WARM_RATE（每秒請求數，預設 5）
+  與最多 2 個並行請求向上游取回放進快取；上游回 429 時立即停止本輪，避免觸發限流。
+  預熱本身的請求不計入熱度。
+- 持久化：設定 CBETA_WARM_FILE 時，啟動時載入上次的熱度並預熱，之後每 CBETA_WARM_INTERVAL 秒
+  （預設 600，與 response_cache 的 ttl 相同；0 表示只在啟動時）存檔並再預熱一次，關閉時也存檔。CBETA_WARM_TOP_K 預設 100。
+- start_warmer() / stop_warmer() 由 main.lifespan 呼叫；/metrics 的 warm 為最近一輪的結果。
+"""
+
+import asyncio
+import contextvars
+import heapq
+import json
+import os
+import pathlib
+import time
+
+import httpx
+
+from tools.cebta import _http, _metrics
+from tools.cebta._cache import CountMinSketch
+from tools.cebta._query import cache_key, canonical_params
+
+WARM_FILE = os.getenv("CBETA_WARM_FILE")
+TOP_K = int(os.getenv("CBETA_WARM_TOP_K", "100"))
+RATE = float(os.getenv("CBETA_WARM_RATE", "5"))
+INTERVAL = float(os.getenv("CBETA_WARM_INTERVAL", "600"))
+CONCURRENCY = 2
+CANDIDATES = 1000
+
+WARM_PATHS = {"/works", "/works/toc", "/catalog_entry"}
+
+_warming: contextvars.ContextVar[bool] = contextvars.ContextVar("cbeta_warming", default=False)
+
+
+def warmable(path: str) -> bool:
+    return path in WARM_PATHS or path == "/search" or path.startswith("/search/")
+
+
+def _key_text(path: str, params: dict) -> str:
+    return json.dumps([path, sorted(params.items())], ensure_ascii=False)
+
+
+class Popularity:
+    """
+    各請求鍵的存取熱度：Count-Min Sketch 估計次數，另保留前 capacity 名的鍵以便列舉。
+
+    最弱的鍵以最小堆積找出：每次更新推入 (估計值, 鍵)，與 top 不符的舊項目在堆頂時才丟棄（延遲刪除），
+    堆積超過 2 × capacity 時依 top 重建，record 攤銷為 O(log capacity)。
+    """
+
+    def __init__(self, sketch: CountMinSketch | None = None, capacity: int = CANDIDATES):
+        self.sketch = sketch or CountMinSketch()
+        self.capacity = capacity
+        # 鍵文字 → (path, 正規化參數, 最近一次的估計值)
+        self.top: dict[str, tuple[str, dict, int]] = {}
+        self._heap: list[tuple[int, str]] = []
+
+    def _set(self, key: str, path: str, params: dict, count: int) -> None:
+        self.top[key] = (path, params, count)
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 2 * max(self.capacity, 1):
+            self._heap = [(n, k) for k, (_, _, n) in self.top.items()]
+            heapq.heapify(self._heap)
+
+    def _weakest(self) -> tuple[int, str]:
+        heap = self._heap
+        while True:
+            count, key = heap[0]
+            item = self.top.get(key)
+            if item is not None and item[2] == count:
+                return count, key
+            heapq.heappop(heap)
+
+    def record(self, path: str, params: dict | None) -> None:
+        if _warming.get() or not warmable(path):
+            return
+        canonical = canonical_params(path, params)
+        key = _key_text(path, canonical)
+        count = self.sketch.add(key)
+        if key in self.top or len(self.top) < self.capacity:
+            self._set(key, path, canonical, count)
+            return
+        weakest_count, weakest = self._weakest()
+        if count > weakest_count:
+            del self.top[weakest]
+            heapq.heappop(self._heap)
+            self._set(key, path, canonical, count)
+
+    def ranked(self, k: int) -> list[tuple[str, dict, int]]:
+        """熱度前 k 名 [(path, params, 估計次數)]，次數以目前的 sketch 重新估計（已套用老化）。"""
+        items = [(path, params, self.sketch.estimate(key)) for key, (path, params, _) in self.top.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return items[:k]
+
+    def save(self, path: pathlib.Path) -> None:
+        data = {"sketch": self.sketch.to_dict(),
+                "keys": [{"path": p, "params": params, "count": n} for p, params, n in self.ranked(self.capacity)]}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "Popularity":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        popularity = cls(CountMinSketch.from_dict(data["sketch"]))
+        for item in data["keys"]:
+            popularity._set(_key_text(item["path"], item["params"]), item["path"], item["params"], item["count"])
+        return popularity
+
+
+popularity = Popularity()
+last_run: dict = {}
+_task: asyncio.Task | None = None
+
+
+class RateLimiter:
+    """平均每秒最多 rate 次：每次 acquire 依序預約下一個時間點。"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def warm(top_k: int = TOP_K, rate: float = RATE, concurrency: int = CONCURRENCY) -> dict:
+    """把熱度前 top_k 且尚未快取的請求取回放進 response_cache，回傳本輪統計。"""
+    global last_run
+    token = _warming.set(True)
+    started = time.perf_counter()
+    ranked = popularity.ranked(top_k)
+    todo = [(path, params) for path, params, _ in ranked if cache_key(path, params) not in _http.response_cache]
+    limiter, semaphore = RateLimiter(rate), asyncio.Semaphore(concurrency)
+    stats = {"candidates": len(ranked), "cached": len(ranked) - len(todo), "warmed": 0, "failed": 0, "throttled": False}
+
+    async def one(path: str, params: dict) -> None:
+        async with semaphore:
+            if stats["throttled"]:
+                return
+            await limiter.acquire()
+            try:
+                await _http.get_raw(path, params)
+                stats["warmed"] += 1
+            except httpx.HTTPStatusError as e:
+                stats["failed"] += 1
+                if e.response.status_code == 429:
+                    stats["throttled"] = True
+            except httpx.HTTPError:
+                stats["failed"] += 1
+
+    try:
+        await asyncio.gather(*(one(path, params) for path, params in todo))
+    finally:
+        _warming.reset(token)
+    if stats["throttled"]:
+        print("⚠️ 快取預熱遇到上游限流（429），本輪提前結束")
+    _metrics.incr("warm.requests", stats["warmed"])
+    last_run = {**stats, "at": time.time(), "seconds": round(time.perf_counter() - started, 3)}
+    return last_run
+
+
+def stats() -> dict:
+    return {
+        "tracked_keys": len(popularity.top),
+        "sketch_additions": popularity.sketch.additions,
+        "requests": _metrics.counters["warm.requests"],
+        "last_run": last_run,
+    }
+
+
+async def _loop(path: pathlib.Path | None) -> None:
+    while True:
+        try:
+            await warm()
+        except Exception as e:
+            print(f"❌ 快取預熱失敗：{e}")
+        if INTERVAL <= 0:
+            return
+        await asyncio.sleep(INTERVAL)
+        if path is not None:
+            popularity.save(path)
+
+
+async def start_warmer() -> None:
+    """由 main.lifespan 呼叫：載入熱度檔（若有）並在背景預熱。"""
+    global popularity, _task
+    path = pathlib.Path(WARM_FILE) if WARM_FILE else None
+    if path is not None and path.exists():
+        try:
+            popularity = Popularity.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ 無法載入快取熱度檔 {path}：{e}")
+    _task = asyncio.create_task(_loop(path), name="cbeta-cache-warmer")
+
+
+async def stop_warmer() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if WARM_FILE:
+        try:
+            popularity.save(pathlib.Path(WARM_FILE))
+        except OSError as e:
+            print(f"⚠️ 無法寫入快取熱度檔 {WARM_FILE}：{e}")
+
+
+_http.access_hooks.append(lambda path, params: popularity.record(path, params))
+_metrics.register("warm", stats)
@@ -0,0 +1,195 @@
+"""
+簡體 → 繁體（CBETA 用字）本地轉換。
+
+所有接受查詢字串的工具在呼叫 API／查快取／查本地索引之前先把查詢轉成繁體，
+讓「四圣谛」與「四聖諦」落在同一個快取項目，也能直接用本地索引求值。
+
+轉換分兩層：
+- 詞組表：一簡對多繁的字（发→發/髮、后→後/后、于→於/于 …）只在詞組中轉換，
+  詞組表編譯成 trie 形狀的正規表示式，由 re 的 C 引擎做最長匹配。
+- 單字表：一對一的字以 str.translate 轉換。
+未被詞組涵蓋的歧義字（云、于、后、台、舍、尸 …）原樣保留，因為它們在繁體佛典中本身就是常用字
+（云何、舍利、尸羅），誤轉反而查不到。无、弥、适、胜、叶、价、虫、体 在 CBETA 中也有原字用例
+（无為異體字，胜、叶、价、虫、体 各有本義），同樣只在詞組中轉換。
+
+用字以 CBETA 為準（鉢、著、歎、脇、眾），而非臺灣教育部標準字。
+CBETA_SC_TABLE 可指定額外的 OpenCC 格式對照表（每行「簡\t繁 [其他候選…]」），覆蓋內建表。
+"""
+
+import os
+import pathlib
+import re
+from functools import lru_cache
+
+SC_TABLE = os.getenv("CBETA_SC_TABLE")
+
+# 每個詞為「簡繁」兩字
+_CHARS = """
+爱愛 碍礙 袄襖 罢罷 摆擺 败敗 办辦 帮幫 宝寶 报報 贝貝 备備 笔筆 毕畢 边邊 变變 宾賓 别別 补補 财財
+参參 惭慚 残殘 蚕蠶 灿燦 仓倉 苍蒼 层層 产產 缠纏 忏懺 长長 尝嘗 偿償 厂廠 场場 肠腸 车車 彻徹 尘塵
+陈陳 衬襯 称稱 惩懲 诚誠 驰馳 迟遲 齿齒 宠寵 筹籌 处處 础礎 触觸 传傳 疮瘡 创創 词詞 辞辭 聪聰
+从從 丛叢 错錯 达達 带帶 单單 担擔 胆膽 弹彈 当當 党黨 导導 岛島 祷禱 灯燈 邓鄧 敌敵 递遞 谛諦 点點
+电電 垫墊 钓釣 调調 叠疊 顶頂 订訂 东東 动動 冻凍 独獨 读讀 犊犢 断斷 锻鍛 队隊 对對 顿頓 夺奪 堕墮
+恶惡 饿餓 儿兒 尔爾 饵餌 贰貳 罚罰 阀閥 烦煩 贩販 饭飯 访訪 纺紡 飞飛 废廢 费費 纷紛 坟墳 奋奮 愤憤
+粪糞 丰豐 风風 锋鋒 凤鳳 肤膚 妇婦 复復 负負 缚縛 该該 盖蓋 赶趕 冈岡 刚剛 钢鋼 纲綱 个個 给給 龚龔
+巩鞏 贡貢 沟溝 构構 购購 顾顧 关關 观觀 馆館 贯貫 惯慣 广廣 归歸 龟龜 规規 轨軌 贵貴 国國 过過 还還
+汉漢 号號 轰轟 红紅 鸿鴻 护護 华華 画畫 话話 怀懷 坏壞 欢歡 环環 缓緩 换換 唤喚 挥揮 辉輝 会會 讳諱
+绘繪 秽穢 荤葷 浑渾 货貨 获獲 祸禍 击擊 鸡雞 积積 饥飢 机機 迹跡 际際 济濟 计計 记記 纪紀 继繼 绩績
+夹夾 驾駕 间間 坚堅 艰艱 监監 减減 检檢 俭儉 简簡 见見 荐薦 渐漸 践踐 鉴鑑 键鍵 将將 奖獎 讲講
+酱醬 胶膠 骄驕 娇嬌 脚腳 搅攪 缴繳 较較 阶階 节節 杰傑 洁潔 结結 诫誡 届屆 紧緊 锦錦 仅僅 谨謹 进進
+尽盡 劲勁 经經 惊驚 镜鏡 径徑 静靜 纠糾 旧舊 举舉 剧劇 惧懼 据據 觉覺 决決 绝絕 军軍 骏駿 开開 凯凱
+恳懇 垦墾 颗顆 课課 库庫 夸誇 块塊 宽寬 矿礦 亏虧 馈饋 溃潰 扩擴 阔闊 蜡蠟 来來 赖賴 兰蘭 栏欄 蓝藍
+篮籃 览覽 懒懶 烂爛 滥濫 劳勞 乐樂 类類 泪淚 垒壘 离離 礼禮 丽麗 厉厲 励勵 历歷 隶隸 俩倆 联聯 莲蓮
+怜憐 连連 炼煉 练練 恋戀 脸臉 链鏈 凉涼 粮糧 两兩 辆輛 谅諒 疗療 辽遼 猎獵 临臨 邻鄰 灵靈 岭嶺 领領
+龄齡 刘劉 龙龍 楼樓 卢盧 芦蘆 炉爐 虏虜 鲁魯 陆陸 录錄 驴驢 侣侶 虑慮 滤濾 绿綠 乱亂 轮輪 论論 罗羅
+萝蘿 逻邏 锣鑼 络絡 骆駱 妈媽 马馬 骂罵 吗嗎 买買 卖賣 麦麥 迈邁 满滿 蛮蠻 猫貓 贸貿 么麼 门門 们們
+梦夢 觅覓 绵綿 灭滅 庙廟 悯憫 鸣鳴 铭銘 谬謬 谋謀 亩畝 难難 脑腦 恼惱 闹鬧 腻膩 拟擬 鸟鳥 宁寧
+农農 浓濃 脓膿 诺諾 欧歐 呕嘔 殴毆 盘盤 庞龐 赔賠 喷噴 鹏鵬 骗騙 飘飄 贫貧 频頻 评評 凭憑 苹蘋 扑撲
+铺鋪 谱譜 齐齊 骑騎 岂豈 启啟 气氣 弃棄 牵牽 铅鉛 迁遷 签簽 谦謙 钱錢 钳鉗 浅淺 谴譴 枪槍 墙牆 强強
+抢搶 桥橋 乔喬 侨僑 窍竅 亲親 轻輕 倾傾 顷頃 请請 庆慶 穷窮 琼瓊 区區 躯軀 驱驅 趋趨 权權 劝勸 确確
+让讓 扰擾 热熱 认認 荣榮 软軟 锐銳 润潤 洒灑 萨薩 赛賽 伞傘 丧喪 扫掃 涩澀 杀殺 纱紗 晒曬 闪閃 陕陝
+赏賞 伤傷 烧燒 绍紹 摄攝 设設 绅紳 审審 婶嬸 肾腎 渗滲 声聲 绳繩 圣聖 师師 狮獅 湿濕 诗詩 时時
+识識 实實 势勢 释釋 饰飾 视視 试試 寿壽 兽獸 书書 枢樞 输輸 术術 树樹 帅帥 双雙 谁誰 税稅 顺順
+说說 硕碩 烁爍 丝絲 饲飼 颂頌 诵誦 讼訟 苏蘇 诉訴 肃肅 虽雖 随隨 岁歲 孙孫 损損 笋筍 缩縮 锁鎖 琐瑣
+态態 摊攤 滩灘 坛壇 谈談 叹歎 汤湯 烫燙 涛濤 讨討 腾騰 誊謄 题題 屉屜 条條 贴貼 铁鐵 厅廳 听聽
+铜銅 统統 头頭 图圖 团團 颓頹 驮馱 椭橢 洼窪 袜襪 弯彎 湾灣 顽頑 万萬 网網 韦韋 违違 围圍 为為 伪偽
+纬緯 卫衛 稳穩 问問 闻聞 蜗蝸 卧臥 乌烏 诬誣 吴吳 芜蕪 务務 误誤 雾霧 牺犧 习習 袭襲 戏戲 细細
+虾蝦 峡峽 狭狹 侠俠 厦廈 显顯 险險 宪憲 县縣 现現 线線 献獻 乡鄉 详詳 响響 项項 萧蕭 销銷 晓曉 啸嘯
+协協 胁脇 挟挾 写寫 泻瀉 谢謝 兴興 选選 悬懸 学學 寻尋 逊遜 训訓 讯訊 压壓 鸦鴉 鸭鴨 哑啞 亚亞 讶訝
+烟煙 盐鹽 严嚴 颜顏 阎閻 艳豔 厌厭 砚硯 验驗 谚諺 扬揚 杨楊 阳陽 养養 样樣 尧堯 遥遙 谣謠 药藥 爷爺
+页頁 业業 医醫 仪儀 遗遺 忆憶 义義 亿億 议議 艺藝 异異 译譯 驿驛 阴陰 银銀 饮飲 隐隱 樱櫻 婴嬰
+鹰鷹 应應 营營 蝇蠅 赢贏 颖穎 拥擁 佣傭 痈癰 踊踴 咏詠 优優 忧憂 邮郵 犹猶 鱼魚 与與 语語 屿嶼 誉譽
+狱獄 预預 渊淵 园園 员員 圆圓 缘緣 远遠 愿願 约約 跃躍 钥鑰 阅閱 运運 酝醞 韵韻 杂雜 灾災 载載 赞讚
+凿鑿 枣棗 灶竈 责責 择擇 则則 泽澤 贼賊 赠贈 闸閘 诈詐 斋齋 债債 毡氈 盏盞 斩斬 辗輾 崭嶄 栈棧 战戰
+张張 涨漲 帐帳 账賬 胀脹 赵趙 这這 侦偵 针針 诊診 镇鎮 阵陣 睁睜 证證 郑鄭 织織 职職 执執 纸紙 挚摯
+掷擲 质質 滞滯 钟鐘 终終 种種 众眾 肿腫 轴軸 皱皺 昼晝 骤驟 猪豬 诸諸 烛燭 嘱囑 瞩矚 贮貯 铸鑄 筑築
+驻駐 专專 砖磚 转轉 赚賺 庄莊 装裝 妆妝 壮壯 状狀 锥錐 坠墜 缀綴 浊濁 资資 渍漬 踪蹤 总總 纵縱 邹鄒
+诅詛 组組 钻鑽 着著 并並 发發 须須 闲閑 痴癡 钵鉢 刹剎 脱脫 净淨 蕴蘊 诃訶 谒謁 呗唄 锡錫 饶饒 阇闍
+赡贍 绕繞 缕縷 鹫鷲 维維 诘詰 阐闡 伦倫 韩韓 纯純 况況 冯馮 测測 渔漁 焕煥 窥窺 窃竊 竖豎 竞競 笼籠
+筛篩 篱籬 纳納 纶綸 绢絹 绣繡 续續 绪緒 绫綾 绮綺 综綜 聋聾 脉脈 腊臘 舆輿 舰艦 萤螢 蔷薔 衔銜 讥譏
+许許 讽諷 诀訣 询詢 谊誼 谓謂 谜謎 谭譚 贞貞 贤賢 贱賤 贷貸 贺賀 赋賦 赌賭 赐賜 轩軒 轿轎 辅輔 辈輩
+辖轄 辩辯 迩邇 酿釀 钉釘 钝鈍 钞鈔 钦欽 铃鈴 铲鏟 锄鋤 锅鍋 锤錘 锯鋸 闭閉 闯闖 闷悶 阁閣 雏雛 霁霽
+韧韌 颁頒 颇頗 颈頸 额額 颠顛 饱飽 饼餅 驳駁 驶駛 髅髏 鬓鬢 鲜鮮 鹅鵝 鹤鶴 鹦鸚 龛龕 闽閩 粤粵 贪貪
+瞒瞞 诲誨 怼懟 缮繕
+"""
+
+# 每個詞為「簡體詞組 + 等長繁體詞組」
+_PHRASES = """
+头发頭髮 剃发剃髮 须发鬚髮 毛发毛髮 发爪髮爪 白发白髮 削发削髮 落发落髮 束发束髮 发髻髮髻 螺发螺髮 胡须鬍鬚
+以后以後 然后然後 之后之後 前后前後 最后最後 先后先後 后世後世 后身後身 后有後有 后际後際 后来後來 后时後時
+后夜後夜 后分後分 背后背後 午后午後 后代後代 后学後學 后生後生 后人後人 身后身後 灭后滅後 食后食後 后得智後得智
+于是於是 由于由於 对于對於 在于在於 至于至於 关于關於 于此於此 于彼於彼 于中於中 于一切於一切 于诸於諸 于佛於佛
+于法於法 于众生於眾生 于如来於如來 于今於今 于世於世 于其於其 于我於我 于汝於汝 于时於時 于阗于闐
+白云白雲 云雾雲霧 浮云浮雲 云集雲集 云门雲門 云居雲居 慈云慈雲 法云法雲 青云青雲 彩云彩雲 云海雲海 香云香雲
+这里這裡 那里那裡 哪里哪裡 心里心裡 里面裡面 家里家裡
+五台山五臺山 台湾臺灣 楼台樓臺 灯台燈臺
+几何幾何 几许幾許 几时幾時 几多幾多 几人幾人 几种幾種 几个幾個 未几未幾 庶几庶幾
+干燥乾燥 干枯乾枯 枯干枯乾 干净乾淨 干闼婆乾闥婆 干慧乾慧
+其余其餘 余者餘者 多余多餘 有余有餘 无余無餘 余习餘習 残余殘餘 余处餘處 余人餘人 余经餘經 余国餘國
+五谷五穀 谷物穀物 稻谷稻穀
+历法曆法 历数曆數 日历日曆
+系缚繫縛 联系聯繫 关系關係 系念繫念 系属繫屬 系心繫心 维系維繫
+钟情鍾情
+舍弃捨棄 施舍施捨 舍离捨離 舍身捨身 舍命捨命 舍家捨家 不舍不捨 难舍難捨 喜舍喜捨 舍心捨心 取舍取捨 弃舍棄捨
+舍寿捨壽 行舍行捨
+游戏遊戲 游行遊行 游化遊化 游历遊歷 游方遊方 周游周遊 游心遊心
+范围範圍 模范模範 规范規範 典范典範 标准標準 准确準確 制作製作 象征象徵 丑陋醜陋
+合并合併 吞并吞併 兼并兼併 并州并州
+尸体屍體 尸骸屍骸 死尸死屍
+无常無常 无我無我 无明無明 无量無量 无上無上 无边無邊 无漏無漏 无为無為 无生無生 无碍無礙 无相無相 无住無住
+无所無所 无有無有 无尽無盡 无数無數 无垢無垢 无畏無畏 无著無著 无念無念 无二無二 无记無記 无色無色 无想無想
+无始無始 无缘無緣 无知無知 无得無得 无量寿無量壽 南无南無 虚无虛無 有无有無 若无若無 亦无亦無 都无都無
+弥勒彌勒 弥陀彌陀 须弥須彌 沙弥沙彌 弥满彌滿 弥天彌天
+适当適當 适合適合 适宜適宜 适意適意 适时適時 适悦適悅 适来適來 适才適才 安适安適 自适自適 适应適應
+胜义勝義 殊胜殊勝 最胜最勝 胜解勝解 胜妙勝妙 胜利勝利 胜负勝負 胜劣勝劣 胜鬘勝鬘 胜进勝進 胜处勝處 增胜增勝
+胜者勝者 胜他勝他 胜地勝地 胜法勝法 胜论勝論 得胜得勝 名胜名勝
+迦叶迦葉 树叶樹葉 枝叶枝葉 花叶花葉 贝叶貝葉 莲叶蓮葉 叶落葉落 一叶一葉 末叶末葉 中叶中葉 落叶落葉 叶上葉上
+价值價值 价格價格 代价代價 身价身價 无价無價 声价聲價 定价定價 高价高價 物价物價
+虫类蟲類 昆虫昆蟲 虫兽蟲獸 毒虫毒蟲 诸虫諸蟲 虫蚁蟲蟻 飞虫飛蟲 虫豸蟲豸 蛆虫蛆蟲 细虫細蟲 虫食蟲食
+身体身體 体性體性 自体自體 本体本體 体相體相 全体全體 一体一體 体用體用 法体法體 实体實體 当体當體 同体同體
+体解體解 具体具體 体会體會 形体形體 体质體質 大体大體 心体心體
+"""
+
+
+def _pairs(table: str) -> dict[str, str]:
+    out = {}
+    for word in table.split():
+        half = len(word) // 2
+        out[word[:half]] = word[half:]
+    return out
+
+
+def _trie_pattern(words) -> str:
+    """把詞組集合編成 trie 形狀的正規表示式：共用前綴只比對一次，較長的分支優先。"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node: dict) -> str:
+        branches = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return walk(trie)
+
+
+class Converter:
+    def __init__(self, chars: dict[str, str], phrases: dict[str, str]):
+        self.chars = chars
+        self.phrases = phrases
+        self._table = str.maketrans(chars)
+        self._pattern = re.compile(_trie_pattern(phrases)) if phrases else None
+
+    def convert(self, text: str) -> str:
+        if text.isascii():
+            return text
+        if self._pattern is None:
+            return text.translate(self._table)
+        out = []
+        pos = 0
+        for m in self._pattern.finditer(text):
+            out.append(text[pos:m.start()].translate(self._table))
+            out.append(self.phrases[m.group()])
+            pos = m.end()
+        out.append(text[pos:].translate(self._table))
+        return "".join(out)
+
+    @classmethod
+    def load(cls, path: pathlib.Path | None = None) -> "Converter":
+        """內建表，加上（若有）OpenCC 格式的對照表。"""
+        chars = _pairs(_CHARS)
+        phrases = _pairs(_PHRASES)
+        if path is not None:
+            with open(path, encoding="utf-8") as f:
+                for row in f:
+                    fields = row.split()
+                    if len(fields) < 2 or row.startswith("#"):
+                        continue
+                    (chars if len(fields[0]) == 1 else phrases)[fields[0]] = fields[1]
+        return cls(chars, phrases)
+
+
+_converter: Converter | None = None
+
+
+def get_converter() -> Converter:
+    global _converter
+    if _converter is None:
+        path = pathlib.Path(SC_TABLE) if SC_TABLE else None
+        try:
+            _converter = Converter.load(path if path and path.exists() else None)
+        except Exception as e:
+            print(f"❌ 簡繁對照表載入失敗：{SC_TABLE}, error: {e}")
+            _converter = Converter.load()
+    return _converter
+
+
+@lru_cache(maxsize=4096)
+def to_traditional(text: str) -> str:
+    """簡體 → 繁體；已是繁體或非中文的字串原樣傳回。"""
+    return get_converter().convert(text)
@@ -2,11 +2,13 @@ import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
 
 
 @__mcp_server__.tool
 async def get_cbeta_catalog(
     q: Annotated[str, Field(description="查詢節點編號，如 'root'、'CBETA'、'orig-T'、'CBETA.001'")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.n,results.label'；'-' 開頭表示排除，如 '-num_found'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典目錄結構查詢工具
@@ -47,12 +49,9 @@ async def get_cbeta_catalog(
     
     ⚠️ 注意：若 node_type 為 'alt'，代表該節點未直接收錄全文，可透過對應藏經節點查詢。
     """
-    url = "https://api.cbetaonline.cn/catalog_entry"
+    url = "/catalog_entry"
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.get(url, params={"q": q})
-            response.raise_for_status()
-            return success_response(response.json())
+        return success_response(await get_json(url, {"q": q}, select=select))
     except httpx.HTTPError as e:
         return error_response(f"HTTP 錯誤: {str(e)}")
     except Exception as e:
@@ -1,7 +1,9 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -9,6 +11,7 @@ async def search_cbeta_by_dynasty(
     dynasty: Annotated[str | None, Field(description="朝代名稱，多個朝代用逗號分隔，如 '唐'、'唐,宋'")] = None,
     time_start: Annotated[int | None, Field(description="起始年份（公元），如 600")] = None,
     time_end: Annotated[int | None, Field(description="結束年份（公元），如 900")] = None,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,sample_result.work,sample_result.title'；'-' 開頭表示排除，如 '-sample_result.byline'")] = None,
 ) -> dict:
     """
     📘 CBETA 朝代/年份搜尋工具
@@ -50,20 +53,17 @@ async def search_cbeta_by_dynasty(
 
     query_params = {}
     if dynasty:
-        query_params["dynasty"] = dynasty
+        query_params["dynasty"] = to_traditional(dynasty)
     if time_start:
         query_params["time_start"] = time_start
     if time_end:
         query_params["time_end"] = time_end
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/works", params=query_params)
-            resp.raise_for_status()
-            data = resp.json()
-            return success_response({
-                "num_found": data.get("num_found", 0),
-                "sample_result": data.get("results", [])[:10]
-            })
+        data = await get_json("/works", query_params)
+        return success_response(project({
+            "num_found": data.get("num_found", 0),
+            "sample_result": data.get("results", [])[:10]
+        }, select))
     except Exception as e:
         return error_response(f"CBETA 查詢失敗: {str(e)}")
@@ -1,7 +1,9 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -9,6 +11,7 @@ async def search_works_by_translator(
     creator_id: Annotated[str | None, Field(description="作譯者 ID，如 'A000439'（玄奘）")] = None,
     creator: Annotated[str | None, Field(description="作譯者姓名模糊搜尋，如 '玄奘'、'鳩摩羅什'")] = None,
     creator_name: Annotated[str | None, Field(description="僅搜尋尚未確認 ID 的譯者姓名")] = None,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.title,results.byline'；'-' 開頭表示排除，如 '-results.places'")] = None,
 ) -> dict:
     """
     📘 CBETA 作譯者搜尋工具
@@ -49,30 +52,27 @@ async def search_works_by_translator(
         ]
     }
     """
-    url = "https://api.cbetaonline.cn/works"
+    url = "/works"
     query_params = {}
 
     if creator_id:
         query_params["creator_id"] = creator_id
     elif creator:
-        query_params["creator"] = creator
+        query_params["creator"] = to_traditional(creator)
     elif creator_name:
-        query_params["creator_name"] = creator_name
+        query_params["creator_name"] = to_traditional(creator_name)
     else:
         return error_response("請至少提供一個搜尋參數：creator_id、creator 或 creator_name")
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(url, params=query_params)
-            resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, dict) and "error" in data:
-                error = data["error"]
-                if isinstance(error, dict):
-                    message = error.get("message", "CBETA API returned an error")
-                else:
-                    message = str(error)
-                return error_response(f"CBETA API error: {message}")
-            return success_response(data)
+        data = await get_json(url, query_params)
+        if isinstance(data, dict) and "error" in data:
+            error = data["error"]
+            if isinstance(error, dict):
+                message = error.get("message", "CBETA API returned an error")
+            else:
+                message = str(error)
+            return error_response(f"CBETA API error: {message}")
+        return success_response(project(data, select))
     except Exception as e:
         return error_response(f"查詢失敗: {str(e)}")
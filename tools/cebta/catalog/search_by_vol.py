@@ -1,7 +1,8 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
 
 
 @__mcp_server__.tool
@@ -9,6 +10,7 @@ async def search_buddhist_canons_by_vol(
     canon: Annotated[str, Field(description="藏經 ID，如 'T'（大正藏）、'X'（卍續藏）、'J'（嘉興藏）")],
     vol_start: Annotated[int, Field(description="開始冊數")],
     vol_end: Annotated[int, Field(description="結束冊數")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.title,results.juan'；'-' 開頭表示排除，如 '-results.byline'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典範圍搜尋工具
@@ -49,17 +51,14 @@ async def search_buddhist_canons_by_vol(
     - J：嘉興藏
     - N：南傳大藏經
     """
-    url = "https://api.cbetaonline.cn/works"
+    url = "/works"
     query_params = {"canon": canon, "vol_start": vol_start, "vol_end": vol_end}
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(url, params=query_params)
-            resp.raise_for_status()
-            data = resp.json()
-            return success_response({
-                "num_found": data.get("num_found"),
-                "results": data.get("results", [])
-            })
+        data = await get_json(url, query_params)
+        return success_response(project({
+            "num_found": data.get("num_found"),
+            "results": data.get("results", [])
+        }, select))
     except Exception as e:
         return error_response(f"API 請求失敗: {str(e)}")
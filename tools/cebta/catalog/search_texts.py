@@ -2,11 +2,14 @@ import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
 async def search_cbeta_texts(
     q: Annotated[str, Field(description="搜尋關鍵詞或藏經冊號，如 '阿含'、'T01'")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.n,results.label'；'-' 開頭表示排除，如 '-results.type'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典經目搜尋工具
@@ -50,12 +53,10 @@ async def search_cbeta_texts(
     - toc：佛典內目次層級
     """
     # API path: /search/toc (not /toc)
-    url = "https://api.cbetaonline.cn/search/toc"
+    url = "/search/toc"
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.get(url, params={"q": q})
-            response.raise_for_status()
-            return success_response(response.json())
+        q = to_traditional(q)
+        return success_response(await get_json(url, {"q": q}, select=select))
     except httpx.HTTPError as e:
         return error_response(f"HTTP 錯誤: {str(e)}")
     except Exception as e:
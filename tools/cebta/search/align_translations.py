@@ -0,0 +1,126 @@
+import asyncio
+from typing import Annotated
+from pydantic import Field
+from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._align import MAX_SENTENCE_CHARS, align_batch, alignment_cache, normalize, split_sentences
+from tools.cebta._juan_text import load_juan_text
+from tools.cebta._kwic import parse_juan_ranges
+from tools.cebta._projection import project
+
+# 每批送進行程池的來源句數
+_BATCH = 64
+_MAX_TARGET_JUANS = 50
+
+
+async def _align(source: str, source_juan: int, target: str, juans: list[int],
+                 gain: int, penalty: int, min_similarity: float, candidates: int) -> list[dict]:
+    texts = await asyncio.gather(load_juan_text(source, source_juan), *(load_juan_text(target, j) for j in juans))
+    source_sentences = split_sentences(texts[0])
+    target_sentences = [{"juan": j, **s} for j, text in zip(juans, texts[1:]) for s in split_sentences(text)]
+    sources = [normalize(s["text"]) for s in source_sentences]
+    targets = [normalize(s["text"]) for s in target_sentences]
+
+    batches = [sources[i:i + _BATCH] for i in range(0, len(sources), _BATCH)]
+    scored = await asyncio.gather(*(
+        # size 估計 Smith-Waterman 的格數，小卷直接在事件迴圈上算
+        _offload.run(align_batch, batch, targets, gain, penalty, min_similarity, candidates,
+                     size=sum(map(len, batch)) * candidates * MAX_SENTENCE_CHARS, process=True)
+        for batch in batches
+    ))
+
+    pairs = []
+    for sentence, text, (match, score) in zip(source_sentences, sources, (r for rows in scored for r in rows)):
+        pairs.append({
+            "source": sentence,
+            "target": target_sentences[match] if match is not None else None,
+            "score": score,
+            "similarity": round(score / (gain * len(text)), 3) if match is not None else 0.0,
+        })
+    return pairs
+
+
+@__mcp_server__.tool
+async def cbeta_align_translations(
+    source: Annotated[str, Field(description="來源佛典編號，如 'T0099'")],
+    target: Annotated[str, Field(description="對照的異譯本佛典編號，如 'T0100'")],
+    source_juan: Annotated[int, Field(description="來源卷號")] = 1,
+    target_juans: Annotated[str | None, Field(description="目標卷號範圍，如 '1-3,5'；省略時與來源卷號相同")] = None,
+    gain: Annotated[int, Field(description="比對演算法 match 加分")] = 2,
+    penalty: Annotated[int, Field(description="比對演算法 miss 扣分")] = -1,
+    min_similarity: Annotated[float, Field(description="最低相似度（0～1），未達者 target 為 null")] = 0.5,
+    candidates: Annotated[int, Field(description="每句以 bigram 預選的候選句數")] = 5,
+    rows: Annotated[int | None, Field(description="回傳筆數，省略時回傳全部")] = None,
+    start: Annotated[int, Field(description="起始位置（用於分頁）")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.source.text,results.target.text,results.score'；'-' 開頭表示排除")] = None,
+) -> dict:
+    """
+    📘 CBETA 異譯本對齊工具
+    
+    將來源佛典的一卷切成句子，逐句在目標佛典（異譯本）的指定卷中找出最相近的句子，
+    回傳對齊的句對與分數，適合逐卷比較異譯本。
+    
+    ⚡ 只在目標佛典的指定卷中比對，不查詢全藏：先以 bigram 重疊挑出候選句，再以
+    Smith-Waterman 局部比對計分（與 cbeta_similar_search 相同的 gain/penalty）。
+    大卷分批送進行程池平行計算；卷文與 get_juan_html 共用快取，對齊結果另有快取，翻頁不需重算。
+    
+    📥 請求範例：
+    - source: "T0099", target: "T0100" → 雜阿含經第1卷 對照 別譯雜阿含經第1卷
+    - source: "T0099", source_juan: 2, target: "T0100", target_juans: "1-3" → 在目標第1～3卷中找
+    - source: "T0099", target: "T0100", rows: 20, start: 20 → 第 21～40 句
+    
+    📤 回應範例：
+    {
+        "source": "T0099",
+        "source_juan": 1,
+        "target": "T0100",
+        "target_juans": [1],
+        "num_sentences": 11,
+        "num_aligned": 10,
+        "mean_similarity": 0.82,
+        "results": [
+            {
+                "source": {"linehead": "T02n0099_p0001a02", "text": "一時佛住舍衛國祇樹給孤獨園。"},
+                "target": {"juan": 1, "linehead": "T02n0100_p0001a02", "text": "一時佛在舍衛國祇樹給孤獨園。"},
+                "score": 23,
+                "similarity": 0.885
+            }
+        ]
+    }
+    
+    🏷️ 返回字段說明：
+    - num_sentences / num_aligned: 來源句數、找到對應句的句數
+    - results[].source / target: 句子所在行首與文字（target 可能為 null）
+    - results[].score: Smith-Waterman 分數
+    - results[].similarity: 分數 ÷ 來源句完全相同時的滿分（0～1）
+    """
+    try:
+        ranges = parse_juan_ranges(target_juans) or [(source_juan, source_juan)]
+    except ValueError as e:
+        return error_response(str(e))
+    juans = sorted({j for lo, hi in ranges for j in range(lo, hi + 1)})
+    if len(juans) > _MAX_TARGET_JUANS:
+        return error_response(f"目標卷數不可超過 {_MAX_TARGET_JUANS} 卷")
+    if gain <= 0 or penalty > 0 or candidates <= 0 or not 0 <= min_similarity <= 1:
+        return error_response("gain 與 candidates 必須大於 0，penalty 不可大於 0，min_similarity 須介於 0～1")
+
+    try:
+        key = (source, source_juan, target, tuple(juans), gain, penalty, min_similarity, candidates)
+        pairs = alignment_cache.get(key)
+        if pairs is None:
+            pairs = await _align(source, source_juan, target, juans, gain, penalty, min_similarity, candidates)
+            alignment_cache.set(key, pairs)
+
+        aligned = [p["similarity"] for p in pairs if p["target"] is not None]
+        return success_response(project({
+            "source": source,
+            "source_juan": source_juan,
+            "target": target,
+            "target_juans": juans,
+            "num_sentences": len(pairs),
+            "num_aligned": len(aligned),
+            "mean_similarity": round(sum(aligned) / len(aligned), 3) if aligned else 0.0,
+            "results": pairs[start:None if rows is None else start + rows],
+        }, select))
+    except Exception as e:
+        return error_response(f"CBETA 異譯本對齊失敗: {str(e)}")
@@ -1,10 +1,12 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
-from main import __mcp_server__, success_response, error_response
+from main import __mcp_server__, success_response, raw_success_response, error_response
+from tools.cebta._http import get_json, get_raw
+from tools.cebta._zhconv import to_traditional
 
 
-@__mcp_server__.tool
+# 回應原樣轉送上游 JSON（不解碼再編碼），因此不宣告 output schema
+@__mcp_server__.tool(output_schema=None)
 async def cbeta_all_in_one(
     q: Annotated[str, Field(description="查詢關鍵字，支援 AND/OR/NOT/NEAR 語法")],
     note: Annotated[int, Field(description="是否含夾注：0=不含，1=含")] = 1,
@@ -15,6 +17,7 @@ async def cbeta_all_in_one(
     around: Annotated[int, Field(description="KWIC 前後字數")] = 10,
     order: Annotated[str | None, Field(description="排序條件，如 'time_from+' 升序，'time_from-' 降序")] = None,
     cache: Annotated[int, Field(description="是否使用快取：1=是")] = 1,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.title,results.term_hits'；'-' 開頭表示排除，如 '-results.kwics'")] = None,
 ) -> dict:
     """
     📘 CBETA 全文檢索 All-in-One 工具
@@ -66,15 +69,15 @@ async def cbeta_all_in_one(
     <mark>...</mark> 標記關鍵字位置。
     """
     try:
+        q = to_traditional(q)
         params = {"q": q, "note": note, "facet": facet, "rows": rows, "start": start, "around": around, "cache": cache}
         if fields:
             params["fields"] = fields
         if order:
             params["order"] = order
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/all_in_one", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        if select:
+            return success_response(await get_json("/search/all_in_one", params, select=select))
+        return raw_success_response(await get_raw("/search/all_in_one", params))
     except Exception as e:
         return error_response(f"CBETA all-in-one 搜尋失敗: {str(e)}")
@@ -1,7 +1,11 @@
-import httpx
+from functools import partial
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._synonyms import expand_query, expansions_for
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -9,6 +13,8 @@ async def extended_search(
     q: Annotated[str, Field(description="查詢語句，支援 AND/OR/NOT/NEAR 語法，如 '\"法鼓\" \"聖嚴\"'")],
     start: Annotated[int, Field(description="起始位置")] = 0,
     rows: Annotated[int, Field(description="回傳筆數")] = 20,
+    synonyms: Annotated[int, Field(description="是否以近義詞擴展查詢：0=否，1=是（每個 \"詞\" 改寫為其近義詞的 OR 群組）")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'total,rows.title,rows.juan'；'-' 開頭表示排除，如 '-rows.content'")] = None,
 ) -> dict:
     """
     📘 CBETA 擴充模式全文檢索工具
@@ -25,6 +31,7 @@ async def extended_search(
     - q: '"法鼓" "聖嚴"' → 同時包含法鼓和聖嚴
     - q: '"波羅蜜" | "波羅密"' → 包含波羅蜜或波羅密
     - q: '"法鼓" NEAR/7 "迦葉"' → 法鼓和迦葉相距7字以內
+    - q: '"文殊師利" "般若"', synonyms: 1 → ("文殊師利" | "曼殊室利" | …) ("般若" | …)
     
     📤 回應範例：
     {
@@ -39,23 +46,25 @@ async def extended_search(
     }
     """
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(
-                "https://api.cbetaonline.cn/search/extended",
-                params={"q": q, "start": start, "rows": rows},
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-        total = data.get("total", 0)
-        rows_data = [
-            {
-                "title": r.get("title", ""),
-                "juan": r.get("juan", ""),
-                "content": r.get("content", ""),
-            }
-            for r in data.get("results", [])
-        ]
-        return success_response({"total": total, "rows": rows_data})
+        q = to_traditional(q)
+        if synonyms:
+            # NOT 與 NEAR 兩側的詞不擴展，以免改變查詢語意
+            q = expand_query(q, await expansions_for(q))
+        # 解碼與整理結果一起進行，大回應時在事件迴圈外執行
+        result = await get_json("/search/extended", {"q": q, "start": start, "rows": rows},
+                                transform=partial(_shape, select=select))
+        return success_response(result)
     except Exception as e:
         return error_response(f"CBETA 擴充搜尋失敗: {str(e)}")
+
+
+def _shape(data: dict, select: str | None) -> dict:
+    rows_data = [
+        {
+            "title": r.get("title", ""),
+            "juan": r.get("juan", ""),
+            "content": r.get("content", ""),
+        }
+        for r in data.get("results", [])
+    ]
+    return project({"total": data.get("total", 0), "rows": rows_data}, select)
@@ -1,20 +1,27 @@
-import httpx
+import asyncio
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import get_index
+from tools.cebta._facets import aggregate, parse_facets
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
 async def cbeta_facet_query(
     q: Annotated[str, Field(description="查詢關鍵字，如 '法鼓'、'般若'")],
-    f: Annotated[str, Field(description="指定 facet 類型：canon/category/dynasty/creator/work")] = "canon",
+    f: Annotated[str, Field(description="指定 facet 類型：canon/category/dynasty/creator/work，可用逗號指定多個或 'all'")] = "canon",
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑；單一 facet 時逐項套用，如 'canon,hits'，多個 facet 時如 'canon.canon,dynasty.hits'；'-' 開頭表示排除，如 '-docs'")] = None,
 ) -> dict:
     """
     📘 CBETA Facet 多維面向查詢工具
     
     查詢 CBETA Online 的 Facet 結構，可按 5 種維度統計搜尋結果分布。
     
-    ✅ 支援的 Facet 類型（f 參數，必須指定）：
+    ✅ 支援的 Facet 類型（f 參數，可逗號分隔一次查詢多個，或 "all" 取得全部）：
     - canon：藏經編號（T、X、J 等）
     - category：部類（阿含部、大乘經等）
     - dynasty：朝代（唐、宋等）
@@ -25,6 +32,7 @@ async def cbeta_facet_query(
     - q: "法鼓", f: "canon" → 返回藏經分布
     - q: "般若", f: "dynasty" → 返回朝代分布
     - q: "法鼓", f: "category" → 返回部類分布
+    - q: "法鼓", f: "canon,dynasty" → 一次返回藏經與朝代分布
     
     📤 回應範例（f="canon"）：
     [
@@ -36,14 +44,27 @@ async def cbeta_facet_query(
     - canon/category/dynasty/creator/work: 分類值
     - docs: 符合條件的文獻數
     - hits: 關鍵詞命中次數
+    - canon_name: 藏經名稱（只在 canon facet）
+    
+    📤 指定多個 facet 時回傳 {facet 類型: [...]}，如 {"canon": [...], "dynasty": [...]}。
+    
+    ⚡ 若已設定本地索引（CBETA_INDEX_DIR），所有 facet 會在一次走訪命中卷時一併統計，
+    不需呼叫遠端 API（大索引的掃描在執行緒池進行，不佔用事件迴圈）；否則對每個 facet 並行呼叫 CBETA API。
     """
     try:
+        q = to_traditional(q)
+        names = parse_facets(f)
+
+        index = get_index()
+        if index is not None:
+            facets = await _offload.run(aggregate, index, q, names, size=index.scan_size, local=True)
+            return success_response(project(facets[names[0]] if len(names) == 1 else facets, select))
+
         # API requires facet type in path, e.g., /search/facet/canon
-        url = f"https://api.cbetaonline.cn/search/facet/{f}"
+        if len(names) == 1:
+            return success_response(await get_json(f"/search/facet/{names[0]}", {"q": q}, select=select))
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(url, params={"q": q})
-            resp.raise_for_status()
-            return success_response(resp.json())
+        results = await asyncio.gather(*(get_json(f"/search/facet/{name}", {"q": q}) for name in names))
+        return success_response(project(dict(zip(names, results)), select))
     except Exception as e:
         return error_response(f"CBETA facet 查詢失敗: {str(e)}")
@@ -1,7 +1,36 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex, get_index
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._synonyms import expand_query, expansions_for, query_terms
+from tools.cebta._zhconv import to_traditional
+
+# 本地檢索可處理的排序方式
+_LOCAL_ORDERS = {None: None, "term_hits-": True, "term_hits+": False}
+
+
+def _local_search(index: CorpusIndex, q: str, terms: list[str], rows: int, start: int, order: str | None,
+                  fields: str | None) -> dict:
+    matches = index.count_any(terms)
+    if _LOCAL_ORDERS[order] is not None:
+        matches.sort(key=lambda m: m[2], reverse=_LOCAL_ORDERS[order])
+    results = [
+        {**index.doc_record(seg, doc), "term_hits": hits}
+        for seg, doc, hits in matches[start:start + rows]
+    ]
+    if fields:
+        # 與 API 的 fields 參數相同：只留下指定欄位（本地紀錄沒有的欄位略過）
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        results = [{f: r[f] for f in wanted if f in r} for r in results]
+    return {
+        "query_string": q,
+        "num_found": len(matches),
+        "total_term_hits": sum(hits for _, _, hits in matches),
+        "results": results,
+    }
 
 
 @__mcp_server__.tool
@@ -11,6 +40,8 @@ async def cbeta_fulltext_search(
     rows: Annotated[int, Field(description="每頁回傳筆數")] = 20,
     start: Annotated[int, Field(description="起始位置（用於分頁）")] = 0,
     order: Annotated[str | None, Field(description="排序欄位，如 'time_from-' 依年代降序")] = None,
+    synonyms: Annotated[int, Field(description="是否以近義詞擴展查詢：0=否，1=是（如 文殊師利 → 文殊師利 | 曼殊室利 | 妙吉祥 …）")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.title,results.term_hits'；'-' 開頭表示排除，如 '-results.file'")] = None,
 ) -> dict:
     """
     📘 CBETA 一般全文檢索工具
@@ -20,6 +51,7 @@ async def cbeta_fulltext_search(
     📥 請求範例：
     - q: "法鼓" → 搜尋包含「法鼓」的佛典
     - q: "般若波羅蜜", rows: 10, order: "time_from-" → 搜尋般若波羅蜜，依年代降序排列
+    - q: "文殊師利", synonyms: 1 → 同時搜尋文殊師利的所有近義詞（OR）
     
     📤 回應範例：
     {
@@ -54,17 +86,34 @@ async def cbeta_fulltext_search(
     - results[].title: 佛典標題
     - results[].term_hits: 該卷關鍵詞出現次數
     - results[].time_from/to: 佛典成立時間
+    
+    🔁 synonyms=1 時，查詢詞改寫為其近義詞的 OR 查詢；若已設定本地索引（CBETA_INDEX_DIR）
+    且 order 為空或 term_hits±，直接在本地求值（全索引掃描在執行緒池進行），否則將改寫後的查詢送往 CBETA API 的擴充檢索
+    （/search/extended，一般檢索不解析 OR 語法）；查詢詞沒有近義詞時照常使用一般檢索。
+    本地求值的 results[] 只有 work、juan、vol、title、canon、category、creators、term_hits
+    （沒有 id、file、time_from/to），fields 同樣用來挑選其中的欄位。
     """
     try:
+        q = to_traditional(q)
+        path = "/search"
+        if synonyms:
+            expansions = await expansions_for(q)
+            index = get_index()
+            terms = query_terms(q)
+            single_term = len(terms) == 1 and q.strip().strip('"') == terms[0]
+            if index is not None and single_term and order in _LOCAL_ORDERS:
+                result = await _offload.run(_local_search, index, q, expansions[terms[0]], rows, start, order,
+                                            fields, size=index.scan_size, local=True)
+                return success_response(project(result, select))
+            if any(len(group) > 1 for group in expansions.values()):
+                q, path = expand_query(q, expansions), "/search/extended"
+
         query_params = {"q": q, "rows": rows, "start": start}
         if fields:
             query_params["fields"] = fields
         if order:
             query_params["order"] = order
         
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search", params=query_params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        return success_response(await get_json(path, query_params, select=select))
     except Exception as e:
         return error_response(f"CBETA 搜尋失敗: {str(e)}")
@@ -1,28 +1,65 @@
-import httpx
+import asyncio
+import time
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex, get_index
+from tools.cebta._http import get_json
+from tools.cebta._kwic import SORTS, find_hits, iter_kwic, parse_juan_ranges
+from tools.cebta._projection import project
+from tools.cebta._query import single_term
+from tools.cebta._zhconv import to_traditional
+
+# 沒有本地索引時，批次模式同時送出的遠端請求數與總卷數（佛典數 × 卷數）上限
+_REMOTE_CONCURRENCY = 8
+_MAX_REMOTE_JUANS = 50
+
+
+def _local_kwic(index: CorpusIndex, works: list[str], ranges, term: str, sort: str, note: bool, **kwargs) -> tuple[int, list[dict]]:
+    """本地引擎：回傳（命中總數, 第 start 筆起的 KWIC 行）；在 _offload 的執行緒池中執行。"""
+    hits = find_hits(index, works, ranges, term, sort, note)
+    return len(hits), list(iter_kwic(index, works, term, ranges, sort=sort, note=note, **kwargs))
+
+
+async def _remote_batch(works: list[str], ranges: list[tuple[int, int]], params: dict) -> list[dict]:
+    semaphore = asyncio.Semaphore(_REMOTE_CONCURRENCY)
+
+    async def one(work: str, juan: int) -> list[dict]:
+        async with semaphore:
+            data = await get_json("/search/kwic", {"work": work, "juan": juan, **params})
+        return [{"work": work, "juan": juan, **r} for r in data.get("results", [])]
+
+    jobs = [one(work, juan) for work in works for lo, hi in ranges for juan in range(lo, hi + 1)]
+    return [r for rows in await asyncio.gather(*jobs) for r in rows]
 
 
 @__mcp_server__.tool
 async def cbeta_kwic_search(
-    work: Annotated[str, Field(description="佛典編號，如 'T0001'、'X0600'")],
-    juan: Annotated[int, Field(description="卷號")],
+    work: Annotated[str, Field(description="佛典編號，如 'T0001'、'X0600'；可用逗號指定多部，如 'T0220,T0223'")],
     q: Annotated[str, Field(description="查詢關鍵詞，可含 NEAR、排除詞等語法")],
+    juan: Annotated[int | None, Field(description="卷號；與 juans 皆省略時檢索整部（需本地索引）")] = None,
+    juans: Annotated[str | None, Field(description="卷號範圍（批次模式），如 '1-10,20'")] = None,
     note: Annotated[int, Field(description="是否含夾注：0=不含，1=含")] = 1,
     mark: Annotated[int, Field(description="是否加 mark 標記：0=不加，1=加")] = 0,
     sort: Annotated[str, Field(description="排序：'f'=關鍵詞後排序，'b'=前排序，'location'=依出現位置")] = "f",
+    around: Annotated[int, Field(description="關鍵詞前後各取幾字（本地引擎）")] = 10,
+    rows: Annotated[int | None, Field(description="回傳筆數，省略時回傳全部")] = None,
+    start: Annotated[int, Field(description="起始位置（用於分頁）")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.lb,results.kwic'；'-' 開頭表示排除，如 '-time'")] = None,
 ) -> dict:
     """
-    📘 CBETA KWIC 單卷關鍵詞檢索工具
+    📘 CBETA KWIC 關鍵詞前後文檢索工具
     
-    提供 CBETA 的 KWIC（Keyword in Context）單卷前後文檢索功能，
-    可支援 NEAR 查詢、排除詞、夾注開關與排序控制。
+    提供 CBETA 的 KWIC（Keyword in Context）前後文檢索功能，
+    可支援 NEAR 查詢、排除詞、夾注開關與排序控制；可一次檢索多部佛典、多卷。
     
     📥 請求範例：
     - work: "T0001", juan: 1, q: "老子" → 搜尋長阿含經第1卷中的「老子」
     - work: "T0001", juan: 1, q: '"老子" NEAR/5 "道"' → NEAR 搜尋
     - work: "T0001", juan: 1, q: "老子", mark: 1 → 返回帶 mark 標記的結果
+    - work: "T0220", q: "般若", rows: 50 → 大般若經全部 600 卷，依關鍵詞後文排序取前 50 筆
+    - work: "T0220,T0223", juans: "1-10", q: "般若", sort: "location" → 兩部經第1～10卷，依位置排序
     
     📤 回應範例：
     {
@@ -43,12 +80,57 @@ async def cbeta_kwic_search(
     - results[].vol: 冊號
     - results[].lb: 行標位置（頁欄行）
     - results[].kwic: 前後文上下文（含關鍵詞）
+    - results[].work / juan / linehead: 佛典編號、卷號、行首（批次模式或本地引擎）
+    
+    ⚡ 若已設定本地索引（CBETA_INDEX_DIR）且查詢為單一詞，由本地 KWIC 引擎處理：
+    一次掃描所有指定卷，排序結果會快取，翻頁不需重算。其他情況呼叫 CBETA API；
+    沒有本地索引時批次模式需指定 juans，逐卷並行查詢後依卷序合併（佛典數 × 卷數至多 50）。
+    本地掃描與排序在執行緒池進行，不佔用事件迴圈。
     """
+    if sort not in SORTS:
+        return error_response(f"sort 必須為 {', '.join(SORTS)} 之一")
+    try:
+        ranges = parse_juan_ranges(juans) or ([(juan, juan)] if juan is not None else None)
+    except ValueError as e:
+        return error_response(str(e))
+    works = [w.strip() for w in work.split(",") if w.strip()]
+
     try:
-        params = {"work": work, "juan": juan, "q": q, "note": note, "mark": mark, "sort": sort}
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/kwic", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        started = time.perf_counter()
+        q = to_traditional(q)
+        index = get_index()
+        term = single_term(q)
+        if index is not None and term and all(index.docs_for_work(w) for w in works):
+            size = sum(len(index.docs_for_work(w)) for w in works) * 1024
+            num_found, results = await _offload.run(
+                _local_kwic, index, works, ranges, term, sort, bool(note), size=size, local=True,
+                around=around, mark=bool(mark), start=start, rows=rows)
+            return success_response(project({
+                "num_found": num_found,
+                "time": time.perf_counter() - started,
+                "results": results,
+            }, select))
+
+        params = {"q": q, "note": note, "mark": mark, "sort": sort}
+        if len(works) == 1 and juan is not None and not juans:
+            data = await get_json("/search/kwic", {"work": works[0], "juan": juan, **params})
+            if rows is not None or start:
+                data["results"] = data.get("results", [])[start:None if rows is None else start + rows]
+            return success_response(project(data, select))
+        if ranges is None:
+            missing = [w for w in works if index is None or not index.docs_for_work(w)]
+            if index is not None and missing:
+                return error_response(f"本地索引查無佛典：{', '.join(missing)}，請以 juans 指定卷號範圍改用 CBETA API")
+            return error_response("整部檢索需要本地索引（CBETA_INDEX_DIR），或以 juans 指定卷號範圍")
+
+        total = len(works) * sum(hi - lo + 1 for lo, hi in ranges)
+        if total > _MAX_REMOTE_JUANS:
+            return error_response(f"沒有本地索引時，批次模式的佛典數 × 卷數不可超過 {_MAX_REMOTE_JUANS}（目前 {total}）")
+        results = await _remote_batch(works, ranges, params)
+        return success_response(project({
+            "num_found": len(results),
+            "time": time.perf_counter() - started,
+            "results": results[start:None if rows is None else start + rows],
+        }, select))
     except Exception as e:
         return error_response(f"CBETA KWIC 搜尋失敗: {str(e)}")
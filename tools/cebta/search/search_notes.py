@@ -1,7 +1,13 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import get_index
+from tools.cebta._http import get_json
+from tools.cebta._notes import search_notes
+from tools.cebta._projection import project
+from tools.cebta._query import QuerySyntaxError
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -11,6 +17,7 @@ async def search_cbeta_notes(
     rows: Annotated[int, Field(description="每頁筆數")] = 20,
     start: Annotated[int, Field(description="起始位置")] = 0,
     facet: Annotated[int, Field(description="是否回傳 facet：0=否，1=是")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'response.numFound,response.docs.content'；'-' 開頭表示排除，如 '-facets'")] = None,
 ) -> dict:
     """
     📘 CBETA 註解/校勘搜尋工具
@@ -51,12 +58,23 @@ async def search_cbeta_notes(
     🏷️ note_place 說明：
     - "foot"：腳註
     - "inline"：夾注（行內註解）
+    
+    ⚡ 若已設定本地索引（CBETA_INDEX_DIR），直接在本地註解索引查詢（含高亮、分頁與 facet），
+    結果另含 work、juan、linehead、note_id；查詢含本地不支援的語法（如 "詞"~n）時改呼叫 CBETA API。
     """
     try:
+        q = to_traditional(q)
+        index = get_index()
+        num_notes = index.num_notes if index is not None else 0
+        if num_notes:
+            try:
+                # NOT 或單字查詢會走訪所有註解，大索引時在執行緒池進行（每則註解約 128 bytes）
+                result = await _offload.run(search_notes, index, q, size=num_notes * 128, local=True,
+                                            around=around, rows=rows, start=start, facet=facet)
+                return success_response(project(result, select))
+            except QuerySyntaxError:
+                pass
         params = {"q": q, "around": around, "rows": rows, "start": start, "facet": facet}
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/notes", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        return success_response(await get_json("/search/notes", params, select=select))
     except Exception as e:
         return error_response(f"CBETA notes 搜尋失敗: {str(e)}")
@@ -0,0 +1,173 @@
+import re
+import time
+import asyncio
+from typing import Annotated
+from pydantic import Field
+from fastmcp import Context
+from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex, get_index
+from tools.cebta._http import dumps, get_json
+from tools.cebta._juan_text import extract_html
+from tools.cebta._kwic import iter_kwic
+from tools.cebta._projection import project
+from tools.cebta._query import single_term
+from tools.cebta._zhconv import to_traditional
+
+_MAX_TOP = 50
+_MAX_KWIC_ROWS = 50
+_MAX_CONCURRENCY = 16
+
+
+def kwic_linehead(work: str, vol: str | None, lb: str | None) -> str | None:
+    """KWIC 結果的冊號 + 行標組回行首：T0270 / T09 / 0290a05 → T09n0270_p0290a05。"""
+    m = re.match(r"([A-Z]+)(.+)", work)
+    if not (m and vol and lb):
+        return None
+    return f"{vol}n{m.group(2)}_p{lb}"
+
+
+def _local_kwics(index: CorpusIndex, work: str, juan: int, term: str, rows: int) -> list[dict]:
+    """本地索引中該卷依出現位置的前 rows 筆 KWIC。"""
+    return [{"linehead": r["linehead"], "kwic": r["kwic"]}
+            for r in iter_kwic(index, [work], term, [(juan, juan)], sort="location", rows=rows)]
+
+
+def _local_juan(index: CorpusIndex | None, term: str | None, work: str, juan: int):
+    """本地索引涵蓋該卷且查詢為單一詞時回傳 (segment, doc)，否則 None。"""
+    if index is None or term is None:
+        return None
+    return next(((seg, doc) for seg, doc in index.docs_for_work(work) if seg.docs[doc].juan == juan), None)
+
+
+def _local_top_juans(index: CorpusIndex, term: str, top: int) -> dict:
+    matches = sorted(index.count(term), key=lambda m: m[2], reverse=True)
+    return {
+        "num_found": len(matches),
+        "total_term_hits": sum(hits for _, _, hits in matches),
+        "results": [{**index.doc_record(seg, doc), "term_hits": hits} for seg, doc, hits in matches[:top]],
+    }
+
+
+async def _top_juans(q: str, top: int, index: CorpusIndex | None, term: str | None) -> dict:
+    """依 term_hits 由多到少取前 top 卷；有本地索引且查詢為單一詞時不呼叫上游。"""
+    if index is not None and term is not None:
+        # 單字詞幾乎命中每一卷，全索引掃描在執行緒池進行
+        return await _offload.run(_local_top_juans, index, term, top, size=index.scan_size, local=True)
+    return await get_json("/search", {"q": q, "rows": top, "start": 0, "order": "term_hits-"})
+
+
+@__mcp_server__.tool
+async def cbeta_search_pipeline(
+    q: Annotated[str, Field(description="搜尋關鍵字，如 '法鼓'")],
+    top: Annotated[int, Field(description="取命中次數最多的前幾卷（1～50）")] = 5,
+    kwic_rows: Annotated[int, Field(description="每卷取前幾筆 KWIC（依出現位置，1～50）")] = 5,
+    context: Annotated[int, Field(description="每筆 KWIC 另取前後各幾行原文（0=不取，最多 5）")] = 1,
+    concurrency: Annotated[int, Field(description="同時進行的上游請求數（1～16）")] = 4,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.work,results.kwics.kwic'；'-' 開頭表示排除，如 '-results.kwics.lines'")] = None,
+    ctx: Context | None = None,
+) -> dict:
+    """
+    📘 CBETA 檢索管線工具（全文檢索 → 前 N 卷 → KWIC → 行文）
+    
+    一次呼叫完成：全文檢索、依 term_hits 取前 N 卷、各卷 KWIC、每筆 KWIC 的前後行原文，
+    取代 cbeta_fulltext_search → cbeta_kwic_search → get_cbeta_lines 的多次往返。
+    
+    ⚡ 各卷的 KWIC 與行文查詢在同一個並行額度（concurrency）內同時進行，並共用回應快取；
+    請求帶 progressToken 時，每完成一卷即送出進度通知，message 為該卷結果的 JSON，
+    客戶端可邊收邊處理；最後的回應依命中次數排序包含全部卷。單卷失敗只記在該卷的 error。
+    已設定本地索引且查詢為單一詞時，前 N 卷由本地索引計算，索引涵蓋的卷也由本地 KWIC 引擎處理
+    （在執行緒池進行），只有行文向上游查詢。
+    
+    📥 請求範例：
+    - q: "法鼓" → 命中最多的 5 卷，各取 5 筆 KWIC 與前後各 1 行
+    - q: "法鼓", top: 10, kwic_rows: 3, context: 0 → 只要 KWIC，不取行文
+    
+    📤 回應範例：
+    {
+        "query_string": "法鼓",
+        "num_found": 2628,
+        "total_term_hits": 3860,
+        "results": [
+            {
+                "work": "T0270",
+                "juan": 1,
+                "title": "大法鼓經",
+                "term_hits": 31,
+                "kwics": [
+                    {
+                        "linehead": "T09n0270_p0290a05",
+                        "kwic": "佛告迦葉法鼓……",
+                        "lines": [{"linehead": "T09n0270_p0290a04", "text": "如是我聞"}, ...]
+                    }
+                ]
+            }
+        ]
+    }
+    """
+    if not 1 <= top <= _MAX_TOP:
+        return error_response(f"top 必須介於 1～{_MAX_TOP}")
+    if not 1 <= kwic_rows <= _MAX_KWIC_ROWS:
+        return error_response(f"kwic_rows 必須介於 1～{_MAX_KWIC_ROWS}")
+    if not 1 <= concurrency <= _MAX_CONCURRENCY:
+        return error_response(f"concurrency 必須介於 1～{_MAX_CONCURRENCY}")
+    if not 0 <= context <= 5:
+        return error_response("context 必須介於 0～5")
+
+    try:
+        started = time.perf_counter()
+        q = to_traditional(q)
+        index, term = get_index(), single_term(q)
+        data = await _top_juans(q, top, index, term)
+        hits = data.get("results", [])[:top]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def lines_around(linehead: str) -> list[dict]:
+            async with semaphore:
+                lines = await get_json("/lines", {"linehead": linehead, "before": context, "after": context})
+            return [
+                {"linehead": item.get("linehead"),
+                 **extract_html(item.get("html", ""), None, item.get("linehead")).render("text", "none")}
+                for item in lines.get("results", [])
+            ]
+
+        async def one(rank: int, hit: dict) -> tuple[int, dict]:
+            item = {"work": hit.get("work"), "juan": hit.get("juan"), "title": hit.get("title"),
+                    "term_hits": hit.get("term_hits")}
+            try:
+                local = _local_juan(index, term, hit["work"], hit["juan"])
+                if local is not None:
+                    seg, doc = local
+                    kwics = await _offload.run(_local_kwics, index, hit["work"], hit["juan"], term, kwic_rows,
+                                               size=len(seg.texts[doc]), local=True)
+                else:
+                    async with semaphore:
+                        kwic = await get_json("/search/kwic", {"work": hit["work"], "juan": hit["juan"], "q": q,
+                                                               "note": 1, "mark": 0, "sort": "location"})
+                    kwics = [{"linehead": kwic_linehead(hit["work"], r.get("vol"), r.get("lb")), "kwic": r.get("kwic")}
+                             for r in kwic.get("results", [])[:kwic_rows]]
+                if context:
+                    contexts = await asyncio.gather(*(lines_around(k["linehead"]) for k in kwics if k["linehead"]))
+                    for k, lines in zip([k for k in kwics if k["linehead"]], contexts):
+                        k["lines"] = lines
+                item["kwics"] = kwics
+            except Exception as e:
+                item["error"] = str(e)
+            return rank, item
+
+        results: list[dict | None] = [None] * len(hits)
+        for done, job in enumerate(asyncio.as_completed([one(i, hit) for i, hit in enumerate(hits)]), 1):
+            rank, item = await job
+            results[rank] = item
+            if ctx is not None:
+                await ctx.report_progress(done, len(hits), dumps(item).decode())
+
+        return success_response(project({
+            "query_string": q,
+            "num_found": data.get("num_found", 0),
+            "total_term_hits": data.get("total_term_hits"),
+            "time": time.perf_counter() - started,
+            "results": results,
+        }, select))
+    except Exception as e:
+        return error_response(f"CBETA 檢索管線失敗: {str(e)}")
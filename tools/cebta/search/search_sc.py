@@ -1,7 +1,15 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex, get_index
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._zhconv import to_traditional
+
+
+def _local_hits(index: CorpusIndex, term: str) -> int:
+    return sum(n for _, _, n in index.count(term))
 
 
 @__mcp_server__.tool
@@ -11,11 +19,12 @@ async def cbeta_search_sc(
     rows: Annotated[int, Field(description="回傳筆數")] = 10,
     start: Annotated[int, Field(description="起始位置")] = 0,
     order: Annotated[str | None, Field(description="排序方式")] = None,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔，如 'converted,hits'；'-' 開頭表示排除，如 '-q'")] = None,
 ) -> dict:
     """
     📘 CBETA 簡體/繁體搜尋工具
     
-    支持簡體或繁體中文輸入，CBETA 會自動處理簡繁轉換，無需手動轉換。
+    支持簡體或繁體中文輸入，查詢字串先在本地轉為繁體（CBETA 用字），無需手動轉換。
     
     📥 請求範例：
     - q: "四圣谛" → 用簡體搜尋「四聖諦」
@@ -25,24 +34,30 @@ async def cbeta_search_sc(
     📤 回應範例：
     {
         "q": "四圣谛",
+        "converted": "四聖諦",
         "hits": 41
     }
     
     🏷️ 說明：
     此工具適合用戶使用簡體中文輸入時，自動匹配繁體佛典內容。
+    簡繁兩種寫法轉換後相同，共用同一筆快取；若已設定本地索引（CBETA_INDEX_DIR），
+    命中數直接由本地索引計算（全索引掃描在執行緒池進行）。
     """
     try:
-        query_params = {"q": q, "rows": rows, "start": start}
+        converted = to_traditional(q)
+        index = get_index()
+        if index is not None and converted.strip().isalnum():
+            hits = await _offload.run(_local_hits, index, converted.strip(), size=index.scan_size, local=True)
+            return success_response(project({"q": q, "converted": converted, "hits": hits}, select))
+
+        query_params = {"q": converted, "rows": rows, "start": start}
         if fields:
             query_params["fields"] = fields
         if order:
             query_params["order"] = order
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/sc", params=query_params)
-            resp.raise_for_status()
-            data = resp.json()
+        data = await get_json("/search/sc", query_params)
 
-        return success_response({"q": q, "hits": data.get("hits", 0)})
+        return success_response(project({"q": q, "converted": converted, "hits": data.get("hits", 0)}, select))
     except Exception as e:
         return error_response(f"CBETA SC 搜尋失敗: {str(e)}")
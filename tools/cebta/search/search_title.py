@@ -1,7 +1,8 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -9,6 +10,7 @@ async def search_title(
     q: Annotated[str, Field(description="搜尋經名關鍵字，至少三個字，如 '觀無量壽經'、'法華經'")],
     rows: Annotated[int, Field(description="每頁筆數")] = 20,
     start: Annotated[int, Field(description="起始位置")] = 0,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.content'；'-' 開頭表示排除，如 '-results.highlight'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典標題（經名）搜尋工具
@@ -52,10 +54,8 @@ async def search_title(
         return error_response("搜尋關鍵字至少需三個字以上")
 
     try:
+        q = to_traditional(q)
         params = {"q": q, "rows": rows, "start": start}
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/title", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        return success_response(await get_json("/search/title", params, select=select))
     except Exception as e:
         return error_response(f"標題搜尋失敗: {str(e)}")
@@ -1,7 +1,8 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
@@ -13,6 +14,7 @@ async def cbeta_similar_search(
     score_min: Annotated[int, Field(description="最低匹配分數")] = 16,
     facet: Annotated[int, Field(description="是否回傳 facet：0=否，1=是")] = 0,
     cache: Annotated[int, Field(description="是否使用快取：1=是")] = 1,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.work,results.score,results.text'；'-' 開頭表示排除，如 '-SQL,-cache_key'")] = None,
 ) -> dict:
     """
     📘 CBETA 相似句搜尋工具
@@ -53,10 +55,8 @@ async def cbeta_similar_search(
     使用 Smith-Waterman 局部比對演算法，gain 為匹配加分，penalty 為錯配扣分。
     """
     try:
+        q = to_traditional(q)
         params = {"q": q, "k": k, "gain": gain, "penalty": penalty, "score_min": score_min, "facet": facet, "cache": cache}
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/similar", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        return success_response(await get_json("/search/similar", params, timeout=30.0, select=select))
     except Exception as e:
         return error_response(f"CBETA 相似搜尋失敗: {str(e)}")
@@ -0,0 +1,106 @@
+import time
+from itertools import islice
+from typing import Annotated
+from pydantic import Field
+from main import __mcp_server__, success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._corpus import CorpusIndex, get_index
+from tools.cebta._projection import project
+from tools.cebta._suffix_array import ORDERS, available, count, occurrences
+from tools.cebta._zhconv import to_traditional
+
+# 每筆命中定位、排序的工作量估計，供 _offload.run(size=...) 使用
+_HIT_COST = 64
+
+
+def _page(index: CorpusIndex, q: str, order: str, start: int, rows: int, around: int) -> list[dict]:
+    results = []
+    for occ in islice(occurrences(index, q, order), start, start + rows):
+        text = occ.seg.texts[occ.doc]
+        d = occ.seg.docs[occ.doc]
+        results.append({
+            "work": d.work,
+            "juan": d.juan,
+            "vol": d.vol,
+            "linehead": occ.seg.linehead_at(occ.doc, occ.offset),
+            "offset": occ.offset,
+            "context": text[max(0, occ.offset - around):occ.offset + len(q) + around],
+        })
+    return results
+
+
+@__mcp_server__.tool
+async def cbeta_substring_count(
+    q: Annotated[str, Field(description="任意子字串（不分詞、不支援查詢語法），如 '如是我聞'、'般若波羅蜜多'")],
+    rows: Annotated[int, Field(description="回傳的出現位置筆數；0 表示只計數")] = 20,
+    start: Annotated[int, Field(description="起始位置（用於分頁）")] = 0,
+    order: Annotated[str, Field(description="位置排序：'suffix'=依其後文字排序，'location'=依卷與位置排序")] = "suffix",
+    around: Annotated[int, Field(description="出現位置前後各取幾字")] = 10,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'num_found,results.linehead,results.offset'；'-' 開頭表示排除，如 '-results.context'")] = None,
+) -> dict:
+    """
+    📘 CBETA 子字串精確計數工具
+
+    在本地語料的後綴陣列上計算任意子字串的確切出現次數，並列出出現位置（可換回行首 linehead）。
+    與 cbeta_fulltext_search 不同，不經分詞或 bigram 近似，次數為逐字精確比對的結果。
+
+    📥 請求範例：
+    - q: "如是我聞" → 全部語料中「如是我聞」的出現次數與前 20 處位置
+    - q: "般若波羅蜜多", rows: 0 → 只回傳次數
+    - q: "善男子", order: "location", start: 20 → 依卷序列出第 21～40 處
+
+    📤 回應範例：
+    {
+        "q": "如是我聞",
+        "num_found": 3,
+        "time": 0.0004,
+        "results": [
+            {
+                "work": "T0001",
+                "juan": 1,
+                "vol": "T01",
+                "linehead": "T01n0001_p0001b11",
+                "offset": 120,
+                "context": "長阿含經卷第一…如是我聞：一時，佛在舍衛國"
+            }
+        ]
+    }
+
+    🏷️ 返回字段說明：
+    - num_found: 出現次數（精確）
+    - time: 查詢耗時（秒）
+    - results[].work / juan / vol: 佛典編號、卷號、冊號
+    - results[].linehead: 出現位置所在的行首
+    - results[].offset: 在該卷全文中的字元位移
+    - results[].context: 前後文
+
+    ⚙️ 需要本地索引（CBETA_INDEX_DIR）並已建立後綴陣列：
+    python -m tools.cebta._suffix_array <index_dir>
+    命中多時（尤其 order='location' 須排序全部命中）定位與排序在執行緒池進行。
+    """
+    if order not in ORDERS:
+        return error_response(f"order 必須為 {', '.join(ORDERS)} 之一")
+    try:
+        started = time.perf_counter()
+        q = to_traditional(q)
+        if not q:
+            return error_response("q 不可為空字串")
+        index = get_index()
+        if index is None:
+            return error_response("子字串計數需要本地索引（CBETA_INDEX_DIR）")
+        if not available(index):
+            return error_response("本地索引尚未建立後綴陣列，請執行 python -m tools.cebta._suffix_array <index_dir>")
+
+        num_found = count(index, q)
+        rows = max(rows, 0)
+        # location 須排序全部命中；suffix 只讀取到本頁為止
+        hits = num_found if order == "location" else min(num_found, start + rows)
+        results = await _offload.run(_page, index, q, order, start, rows, around, size=hits * _HIT_COST, local=True)
+        return success_response(project({
+            "q": q,
+            "num_found": num_found,
+            "time": time.perf_counter() - started,
+            "results": results,
+        }, select))
+    except Exception as e:
+        return error_response(f"CBETA 子字串計數失敗: {str(e)}")
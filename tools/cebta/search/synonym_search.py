@@ -1,12 +1,17 @@
-import httpx
+import time
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._synonyms import get_graph
+from tools.cebta._zhconv import to_traditional
 
 
 @__mcp_server__.tool
 async def synonym_search(
     q: Annotated[str, Field(description="查詢關鍵詞，如 '文殊師利'、'觀世音'")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔，如 'num_found,results'；'-' 開頭表示排除，如 '-time'")] = None,
 ) -> dict:
     """
     📘 CBETA 近義詞搜索工具
@@ -40,11 +45,21 @@ async def synonym_search(
     - time: 查詢耗時（秒）
     - num_found: 找到的近義詞數量
     - results: 近義詞列表
+    
+    ⚡ 若設定了本地近義詞表（CBETA_SYNONYM_TABLE），直接由本地近義詞圖回答，
+    並包含遞移的近義詞（A~B、B~C ⇒ A~C）；表中查無此詞時才呼叫 CBETA API。
     """
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/search/synonym", params={"q": q})
-            resp.raise_for_status()
-            return success_response(resp.json())
+        q = to_traditional(q)
+        graph = get_graph()
+        if graph is not None and q in graph:
+            started = time.perf_counter()
+            synonyms = graph.synonyms(q)
+            return success_response(project({
+                "time": time.perf_counter() - started,
+                "num_found": len(synonyms),
+                "results": synonyms,
+            }, select))
+        return success_response(await get_json("/search/synonym", {"q": q}, select=select))
     except Exception as e:
         return error_response(f"近義詞搜索失敗: {str(e)}")
@@ -0,0 +1,100 @@
+import os
+import asyncio
+import re
+import pathlib
+import tempfile
+from typing import Annotated
+from pydantic import Field
+from fastmcp import Context
+from main import __mcp_server__, success_response, error_response
+from tools.cebta._export import FORMATS, export, list_juans
+from tools.cebta._juan_text import NOTE_MODES
+
+_ID = re.compile(r"^[A-Za-z]{1,3}[0-9A-Za-z]{1,8}$")
+# 同一檔案同時只跑一個匯出，後到的呼叫等前一個結束後再續傳（通常已全部完成）
+_locks: dict[pathlib.Path, asyncio.Lock] = {}
+
+
+def export_dir() -> pathlib.Path:
+    """匯出檔的目錄（CBETA_EXPORT_DIR，預設為系統暫存目錄下的 cbeta-export）。"""
+    return pathlib.Path(os.getenv("CBETA_EXPORT_DIR") or pathlib.Path(tempfile.gettempdir()) / "cbeta-export")
+
+
+@__mcp_server__.tool
+async def cbeta_export_work(
+    work: Annotated[str | None, Field(description="佛典編號，如 'T0001'；省略時以 canon + vol_start/vol_end 指定範圍")] = None,
+    canon: Annotated[str | None, Field(description="藏經 ID，如 'T'（與 vol_start/vol_end 一起使用）")] = None,
+    vol_start: Annotated[int | None, Field(description="開始冊數")] = None,
+    vol_end: Annotated[int | None, Field(description="結束冊數")] = None,
+    format: Annotated[str, Field(description="輸出格式：'jsonl'=每卷一行 JSON（逐行文字），'text'=純文字")] = "jsonl",
+    notes: Annotated[str, Field(description="校勘註解處理：'separate'=另附 notes，'inline'=嵌入正文，'none'=省略")] = "separate",
+    concurrency: Annotated[int, Field(description="同時進行的上游請求數（1～16）")] = 8,
+    ctx: Context | None = None,
+) -> dict:
+    """
+    📘 CBETA 整部佛典匯出工具
+    
+    並行取得整部佛典（或藏經某幾冊內所有佛典）的每一卷，串流寫入伺服器上的檔案，
+    取代逐卷呼叫 get_juan_html。適合離線分析的批次匯出。
+    
+    ⚡ 以 concurrency 限制同時請求數；每卷寫完即記錄檢查點，中斷後以相同參數再呼叫會從斷點續傳，
+    已完成的卷不再下載，失敗的卷會重試。同一檔案的匯出依序進行。請求帶 progressToken 時約每秒送出一次進度通知。
+    檔案寫在 CBETA_EXPORT_DIR（預設為系統暫存目錄下的 cbeta-export），檔名由範圍與格式決定。
+    命令列版本：python -m tools.cebta._export T0001 T0001.jsonl
+    
+    📥 請求範例：
+    - work: "T0001" → 長阿含經 22 卷，寫成 T0001.jsonl
+    - canon: "T", vol_start: 1, vol_end: 2, format: "text" → 大正藏第1～2冊，寫成 T1-2.txt
+    
+    📤 回應範例：
+    {
+        "path": "/tmp/cbeta-export/T0001.jsonl",
+        "format": "jsonl",
+        "juans": 22,
+        "exported": 20,
+        "skipped": 2,
+        "failed": [],
+        "bytes": 1843210,
+        "elapsed": 4.2,
+        "juans_per_second": 4.8,
+        "mb_per_second": 0.44
+    }
+    
+    🏷️ 返回字段說明：
+    - juans: 範圍內的總卷數；exported: 本次寫入的卷數；skipped: 先前已完成而略過的卷數
+    - failed: 本次失敗的卷（再呼叫一次即重試）
+    - bytes: 輸出檔大小；juans_per_second / mb_per_second: 本次吞吐
+    
+    📄 JSONL 每行：{"work", "juan", "title", "lines": [{"linehead", "text", "notes"}], "notes": {...}}
+    """
+    if format not in FORMATS:
+        return error_response(f"format 必須為 {', '.join(FORMATS)} 之一")
+    if notes not in NOTE_MODES:
+        return error_response(f"notes 必須為 {', '.join(NOTE_MODES)} 之一")
+    if not 1 <= concurrency <= 16:
+        return error_response("concurrency 必須介於 1～16")
+    if work:
+        if not _ID.match(work):
+            return error_response(f"佛典編號格式不正確：{work}")
+        name = work
+    elif canon and vol_start is not None and vol_end is not None:
+        if not _ID.match(f"{canon}{vol_start}"):
+            return error_response(f"藏經 ID 格式不正確：{canon}")
+        name = f"{canon}{vol_start}-{vol_end}"
+    else:
+        return error_response("需指定 work，或 canon + vol_start + vol_end")
+
+    try:
+        jobs = await list_juans(work, canon, vol_start, vol_end)
+        if not jobs:
+            return error_response(f"找不到可匯出的卷：{name}")
+
+        out = export_dir() / f"{name}.{'jsonl' if format == 'jsonl' else 'txt'}"
+        async def progress(p: dict) -> None:
+            if ctx is not None:
+                await ctx.report_progress(p["done"], p["total"], f"{p['juans_per_second']:.1f} juans/s")
+
+        async with _locks.setdefault(out, asyncio.Lock()):
+            return success_response(await export(jobs, out, format, notes, concurrency, progress))
+    except Exception as e:
+        return error_response(f"CBETA 匯出失敗: {str(e)}")
@@ -1,15 +1,25 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
-from main import __mcp_server__, success_response, error_response
+from main import __mcp_server__, success_response, raw_success_response, error_response
+from tools.cebta import _offload
+from tools.cebta._http import get_raw, loads
+from tools.cebta._projection import project
+from tools.cebta._juan_text import JuanText, get_juan_text, cache_juan_text, validate_output_options
 
 
-@__mcp_server__.tool
+# format="html" 時原樣轉送上游 JSON（不解碼再編碼），因此不宣告 output schema
+@__mcp_server__.tool(output_schema=None)
 async def get_juan_html(
     work: Annotated[str, Field(description="佛典編號，如 'T0001'、'T1501'")],
     juan: Annotated[int, Field(description="卷號，從 1 開始")],
     work_info: Annotated[int, Field(description="是否回傳佛典資訊：0=否，1=是")] = 0,
     toc: Annotated[int, Field(description="是否回傳目次：0=否，1=是")] = 0,
+    format: Annotated[str, Field(description="輸出格式：'html'=原始 HTML，'text'=純文字，'lines'=逐行 JSON，'paragraphs'=逐段 JSON")] = "html",
+    notes: Annotated[str, Field(description="校勘註解處理（format 非 html 時）：'separate'=另附 notes，'inline'=嵌入正文，'none'=省略")] = "separate",
+    max_chars: Annotated[int | None, Field(description="單次回傳的字數上限（中文約 1 字 ≈ 1 token），需搭配非 html 格式")] = None,
+    cursor: Annotated[int, Field(description="分段讀取位置，填入上次回傳的 window.next_cursor")] = 0,
+    linehead: Annotated[str | None, Field(description="從指定行首開始讀取，如 'T01n0001_p0001a04'（優先於 cursor）")] = None,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.juan,results.html,window'；'-' 開頭表示排除，如 '-toc'")] = None,
 ) -> dict:
     """
     📘 CBETA 卷 HTML 內容抓取工具
@@ -20,6 +30,9 @@ async def get_juan_html(
     📥 請求範例：
     - work: "T0001", juan: 1 → 長阿含經第1卷
     - work: "T0001", juan: 1, work_info: 1, toc: 1 → 同時返回佛典資訊與目次
+    - work: "T0001", juan: 1, format: "text" → 只回傳去除標記的純文字（註解另附）
+    - work: "T0001", juan: 1, format: "lines", notes: "inline" → 逐行 JSON，註解嵌入正文
+    - work: "T0001", juan: 1, format: "text", max_chars: 2000 → 只回傳前 2000 字與續讀 cursor
     
     📤 回應範例：
     {
@@ -46,14 +59,64 @@ async def get_juan_html(
     - work_info: 佛典資訊（當 work_info=1 時返回）
     - toc: 目次結構（當 toc=1 時返回）
     
+    📄 非 html 格式時，results[] 改為：
+    - text / lines[{linehead, text, notes}] / paragraphs[{linehead, text}]：依 format 而定
+    - notes: 註解字典（僅 notes="separate" 時返回）
+    同一卷的解析結果會在伺服器端快取，切換格式不需重新下載。
+    
+    📑 分段讀取（max_chars）：以整行為單位切出不超過字數上限的區間，並回傳
+    window: {cursor, next_cursor, start_linehead, end_linehead, total_chars}。
+    next_cursor 為 null 代表已讀到卷尾；否則以 cursor=next_cursor 再次呼叫即可續讀。
+    
     🔧 用途：可用於閱讀器前端渲染、段落分析、結構轉換等。
     """
+    invalid = validate_output_options(format, notes)
+    if invalid:
+        return error_response(invalid)
+    if (max_chars is not None or linehead) and format == "html":
+        return error_response("分段讀取（max_chars / linehead）需搭配 format='text'、'lines' 或 'paragraphs'")
+    if max_chars is not None and max_chars <= 0:
+        return error_response("max_chars 必須大於 0")
+
+    def render(juan_text: JuanText) -> dict:
+        if max_chars is None and not linehead:
+            return {"juan": juan, "format": format, **juan_text.render(format, notes)}
+        limit = max_chars if max_chars is not None else juan_text.line_index(notes)[1][-1]
+        start, end, next_cursor = juan_text.window(notes, limit, cursor, linehead)
+        offsets = juan_text.line_index(notes)[1]
+        return {
+            "juan": juan,
+            "format": format,
+            **juan_text.render(format, notes, start, end),
+            "window": {
+                "cursor": offsets[start],
+                "next_cursor": next_cursor,
+                "start_linehead": juan_text.lines[start].linehead if start < end else None,
+                "end_linehead": juan_text.lines[end - 1].linehead if start < end else None,
+                "total_chars": offsets[-1],
+            },
+        }
+
     try:
-        url = "https://api.cbetaonline.cn/juans"
+        if format != "html" and not work_info and not toc:
+            juan_text = get_juan_text(work, juan)
+            if juan_text is not None:
+                return success_response(project({"num_found": 1, "results": [render(juan_text)]}, select))
+
+        url = "/juans"
         params = {"work": work, "juan": juan, "work_info": work_info, "toc": toc}
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        raw = await get_raw(url, params, timeout=30.0)
+        if format == "html" and not select:
+            return raw_success_response(raw)
+
+        data = await _offload.run(loads, raw, size=len(raw))
+        if format == "html":
+            return success_response(project(data, select))
+        results = []
+        for item in data.get("results", []):
+            html = item.get("html", "") if isinstance(item, dict) else str(item)
+            results.append(render(await cache_juan_text(work, juan, html)))
+        data["results"] = results
+        return success_response(project(data, select))
     except Exception as e:
         return error_response(f"CBETA API 請求失敗: {str(e)}")
@@ -1,7 +1,10 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._corpus import get_index
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._juan_text import extract_html, validate_output_options
 
 
 @__mcp_server__.tool
@@ -11,6 +14,9 @@ async def get_cbeta_lines(
     linehead_end: Annotated[str | None, Field(description="行段結束行號")] = None,
     before: Annotated[int | None, Field(description="額外取得前幾行（搭配 linehead 使用）")] = None,
     after: Annotated[int | None, Field(description="額外取得後幾行（搭配 linehead 使用）")] = None,
+    format: Annotated[str, Field(description="輸出格式：'html'=原始 HTML，'text'=每行純文字")] = "html",
+    notes: Annotated[str, Field(description="校勘註解處理（format='text' 時）：'separate'=另附 notes，'inline'=嵌入正文，'none'=省略")] = "separate",
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.linehead,results.text'；'-' 開頭表示排除，如 '-results.notes'")] = None,
 ) -> dict:
     """
     📘 CBETA 指定行段文字取得工具
@@ -26,6 +32,7 @@ async def get_cbeta_lines(
     - linehead: "T01n0001_p0001a04" → 取得該單行
     - linehead: "T01n0001_p0001a04", before: 2, after: 3 → 取得該行及前2後3行
     - linehead_start: "T01n0001_p0001a04", linehead_end: "T01n0001_p0001a10" → 取得行段範圍
+    - linehead: "T01n0001_p0001a04", format: "text", notes: "inline" → 純文字，註解嵌入正文
     
     📤 回應範例：
     {
@@ -46,9 +53,18 @@ async def get_cbeta_lines(
     - linehead: 行首位置標識
     - html: 該行 HTML 內容（含註解錨點）
     - notes: 註解內容字典（key 為註解 ID，value 為註解文字）
+    - text: 去除標記後的行文字（format="text" 時取代 html）
     
     🔗 行首格式說明：T01n0001_p0001a04 = 大正藏第1冊第1經第1頁a欄第4行
+    
+    ⚡ 若已設定本地索引（CBETA_INDEX_DIR），notes 字典由本地註解索引提供，與 search_cbeta_notes 同源。
     """
+    invalid = validate_output_options(format, notes)
+    if invalid:
+        return error_response(invalid)
+    if format not in ("html", "text"):
+        return error_response("format 必須為 html 或 text")
+
     params = {}
     if linehead:
         params["linehead"] = linehead
@@ -62,9 +78,22 @@ async def get_cbeta_lines(
         params["after"] = after
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get("https://api.cbetaonline.cn/lines", params=params)
-            resp.raise_for_status()
-            return success_response(resp.json())
+        data = await get_json("/lines", params)
+
+        index = get_index()
+        if index is not None:
+            for item in data.get("results", []):
+                local_notes = index.notes_for_line(item.get("linehead") or "")
+                if local_notes is not None:
+                    item["notes"] = local_notes
+
+        if format == "text":
+            results = []
+            for item in data.get("results", []):
+                line_text = extract_html(item.get("html", ""), item.get("notes"), item.get("linehead"))
+                rendered = line_text.render("text", notes)
+                results.append({"linehead": item.get("linehead"), **rendered})
+            data["results"] = results
+        return success_response(project(data, select))
     except Exception as e:
         return error_response(f"CBETA 行文擷取失敗: {str(e)}")
@@ -1,12 +1,13 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
 
 
 @__mcp_server__.tool
 async def get_cbeta_toc(
     work: Annotated[str, Field(description="佛典編號，如 'T0001'、'T1501'、'X0600'")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'results.mulu.title,results.mulu.juan'；'-' 開頭表示排除，如 '-results.mulu.children'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典目次查詢工具
@@ -56,10 +57,7 @@ async def get_cbeta_toc(
     - children: 子目次節點
     """
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            # API path: /works/toc (not /toc)
-            response = await client.get("https://api.cbetaonline.cn/works/toc", params={"work": work})
-            response.raise_for_status()
-            return success_response(response.json())
+        # API path: /works/toc (not /toc)
+        return success_response(await get_json("/works/toc", {"work": work}, select=select))
     except Exception as e:
         return error_response(f"取得 CBETA 目次失敗: {str(e)}")
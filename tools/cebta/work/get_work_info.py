@@ -2,11 +2,22 @@ import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+
+WORK_INFO_FIELDS = (
+    "work", "title", "byline", "creators", "category", "orig_category",
+    "time_dynasty", "time_from", "time_to", "cjk_chars", "en_words",
+    "file", "juan_start", "places",
+)
+# 解碼上游回應時只保留上述欄位
+_UPSTREAM_SELECT = "num_found," + ",".join(f"results.{name}" for name in WORK_INFO_FIELDS)
 
 
 @__mcp_server__.tool
 async def get_cbeta_work_info(
     work: Annotated[str, Field(description="佛典編號，如 'T1501'、'T0001'、'X0600'")],
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔，如 'title,byline'；'-' 開頭表示排除，如 '-places'")] = None,
 ) -> dict:
     """
     📘 CBETA 佛典資訊查詢工具
@@ -47,33 +58,15 @@ async def get_cbeta_work_info(
     - juan_start: 起始卷
     - places: 翻譯地點（含經緯度）
     """
-    url = "https://api.cbetaonline.cn/works"
+    url = "/works"
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(url, params={"work": work})
-            resp.raise_for_status()
-            data = resp.json()
+        data = await get_json(url, {"work": work}, select=_UPSTREAM_SELECT)
 
         if data.get("num_found", 0) == 0:
             return error_response(f"查無佛典：{work}")
 
-        result = data["results"][0]
-        return success_response({
-            "work": result.get("work"),
-            "title": result.get("title"),
-            "byline": result.get("byline"),
-            "creators": result.get("creators"),
-            "category": result.get("category"),
-            "orig_category": result.get("orig_category"),
-            "time_dynasty": result.get("time_dynasty"),
-            "time_from": result.get("time_from"),
-            "time_to": result.get("time_to"),
-            "cjk_chars": result.get("cjk_chars"),
-            "en_words": result.get("en_words"),
-            "file": result.get("file"),
-            "juan_start": result.get("juan_start"),
-            "places": result.get("places"),
-        })
+        result = project(data["results"][0], ",".join(WORK_INFO_FIELDS), fill_missing=True)
+        return success_response(project(result, select))
     except httpx.HTTPError as e:
         return error_response(f"取得佛典資料失敗：{str(e)}")
     except Exception as e:
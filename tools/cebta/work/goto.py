@@ -1,7 +1,8 @@
-import httpx
 from typing import Annotated
 from pydantic import Field
 from main import __mcp_server__, success_response, error_response
+from tools.cebta._http import fetch, loads
+from tools.cebta._projection import project
 
 
 @__mcp_server__.tool
@@ -14,6 +15,7 @@ async def cbeta_goto(
     col: Annotated[str | None, Field(description="欄位：'a'、'b'、'c'")] = None,
     line: Annotated[int | None, Field(description="行數")] = None,
     linehead: Annotated[str | None, Field(description="行首引用，如 'T01n0001_p0066c25'（優先使用）")] = None,
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，如 'url'")] = None,
 ) -> dict:
     """
     📘 CBETA 經文位置跳轉工具
@@ -37,7 +39,6 @@ async def cbeta_goto(
     
     ⚠️ 注意：若提供 linehead，則其他參數將被忽略。
     """
-    base_url = "https://api.cbetaonline.cn/juans/goto"
     query_params = {}
 
     if linehead:
@@ -59,16 +60,14 @@ async def cbeta_goto(
             query_params["line"] = line
 
     try:
-        async with httpx.AsyncClient(timeout=20.0, follow_redirects=False) as client:
-            response = await client.get(base_url, params=query_params)
-            response.raise_for_status()
-            if "location" in response.headers:
-                return success_response({"url": response.headers["location"]})
+        response = await fetch("/juans/goto", query_params, follow_redirects=False)
+        if "location" in response.headers:
+            return success_response(project({"url": response.headers["location"]}, select))
 
-            data = response.json()
-            if isinstance(data, dict) and "url" in data:
-                return success_response({"url": data["url"]})
+        data = loads(response.content)
+        if isinstance(data, dict) and "url" in data:
+            return success_response(project({"url": data["url"]}, select))
 
-            return success_response(data)
+        return success_response(project(data, select))
     except Exception as e:
         return error_response(f"CBETA 跳轉失敗：{str(e)}")
@@ -0,0 +1,115 @@
+import re
+import asyncio
+from typing import Annotated
+from pydantic import Field
+from main import __mcp_server__, success_response, error_response
+from tools.cebta._corpus import get_index
+from tools.cebta._http import get_json
+from tools.cebta._projection import project
+from tools.cebta._juan_text import extract_html, NOTE_MODES
+from tools.cebta.work.get_work_info import _UPSTREAM_SELECT
+
+READER_URL = "https://cbetaonline.cn/zh/"
+# T01n0001_p0066c25 → 藏經 T、經號 0001；經號可帶字母後綴（如 T03n0150A）
+_LINEHEAD = re.compile(r"^([A-Z]+)[0-9]+n([A-Z]?[0-9]+[A-Za-z]?)_p[0-9a-z]+[a-z][0-9]+$")
+
+
+def work_of_linehead(linehead: str) -> str | None:
+    """由行首取出佛典編號，格式不符時回傳 None。"""
+    m = _LINEHEAD.match(linehead)
+    return m.group(1) + m.group(2) if m else None
+
+
+async def _work_info(work: str) -> dict:
+    data = await get_json("/works", {"work": work}, select=_UPSTREAM_SELECT)
+    return data["results"][0] if data.get("num_found", 0) else {}
+
+
+@__mcp_server__.tool
+async def cbeta_read_passage(
+    linehead: Annotated[str, Field(description="行首引用，如 'T01n0001_p0066c25'")],
+    before: Annotated[int, Field(description="額外取得前幾行（0～50）")] = 2,
+    after: Annotated[int, Field(description="額外取得後幾行（0～50）")] = 2,
+    notes: Annotated[str, Field(description="校勘註解處理：'separate'=另附 notes，'inline'=嵌入正文，'none'=省略")] = "separate",
+    select: Annotated[str | None, Field(description="回傳欄位選擇器，逗號分隔路徑，如 'title,lines.text'；'-' 開頭表示排除，如 '-notes'")] = None,
+) -> dict:
+    """
+    📘 CBETA 引文閱讀工具（跳轉 + 行文 + 佛典資訊）
+    
+    給一個行首引用，一次取得所在佛典的題名、作譯者、該行前後文與註解，
+    取代 cbeta_goto → get_cbeta_lines → get_cbeta_work_info 三次依序呼叫。
+    
+    ⚡ 行文與佛典資訊同時向上游查詢，並與 get_cbeta_lines / get_cbeta_work_info 共用回應快取；
+    閱讀網址由行首直接組出，不需 /juans/goto 往返。已設定本地索引時，notes 由本地註解索引提供。
+    
+    📥 請求範例：
+    - linehead: "T01n0001_p0066c25" → 該行及前後各 2 行
+    - linehead: "T01n0001_p0001a04", before: 0, after: 5, notes: "inline"
+    
+    📤 回應範例：
+    {
+        "work": "T0001",
+        "title": "長阿含經",
+        "byline": "後秦 佛陀耶舍共竺佛念譯",
+        "linehead": "T01n0001_p0001a04",
+        "url": "https://cbetaonline.cn/zh/T01n0001_p0001a04",
+        "lines": [
+            {"linehead": "T01n0001_p0001a03", "text": "長安釋僧肇述"},
+            {"linehead": "T01n0001_p0001a04", "text": "世眾食五百佛時……", "target": true}
+        ],
+        "notes": {"0001000": "〔長安〕－【宋】"}
+    }
+    
+    🏷️ 返回字段說明：
+    - work / title / byline: 佛典編號、題名、作譯者
+    - url: CBETA Online 閱讀網址
+    - lines: 各行純文字；target=true 為引用的那一行
+    - notes: 註解內容（notes="separate" 時）
+    """
+    work = work_of_linehead(linehead)
+    if work is None:
+        return error_response(f"行首格式不正確：{linehead}（應如 T01n0001_p0066c25）")
+    if not (0 <= before <= 50 and 0 <= after <= 50):
+        return error_response("before / after 必須介於 0～50")
+    if notes not in NOTE_MODES:
+        return error_response(f"notes 必須為 {', '.join(NOTE_MODES)} 之一")
+
+    params: dict = {"linehead": linehead}
+    if before:
+        params["before"] = before
+    if after:
+        params["after"] = after
+
+    try:
+        data, info = await asyncio.gather(get_json("/lines", params), _work_info(work))
+        if not data.get("results"):
+            return error_response(f"查無此行：{linehead}")
+
+        index = get_index()
+        lines, used_notes = [], {}
+        for item in data["results"]:
+            line_notes = item.get("notes")
+            if index is not None:
+                local_notes = index.notes_for_line(item.get("linehead") or "")
+                if local_notes is not None:
+                    line_notes = local_notes
+            rendered = extract_html(item.get("html", ""), line_notes, item.get("linehead")).render("text", notes)
+            line = {"linehead": item.get("linehead"), "text": rendered["text"]}
+            if item.get("linehead") == linehead:
+                line["target"] = True
+            lines.append(line)
+            used_notes.update(rendered.get("notes") or {})
+
+        result = {
+            "work": work,
+            "title": info.get("title"),
+            "byline": info.get("byline"),
+            "linehead": linehead,
+            "url": READER_URL + linehead,
+            "lines": lines,
+        }
+        if notes == "separate":
+            result["notes"] = used_notes
+        return success_response(project(result, select))
+    except Exception as e:
+        return error_response(f"CBETA 引文讀取失敗: {str(e)}")